@@ -9,6 +9,14 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'clave_por_defecto_segura')
 
+# 🗄️ Pool de conexiones y conexión compartida por petición
+from models import database
+database.init_app(app)
+
+# 🪪 Usuario, tutor y escuela de la sesión (una consulta por petición)
+from utils import principal
+principal.init_app(app)
+
 # 📦 Importar Blueprints
 from routes.inicio import inicio_bp
 from routes.iniciar_sesion import iniciar_sesion_bp
@@ -35,6 +43,18 @@ app.register_blueprint(ubicacion_bp)
 app.register_blueprint(inscripcion_bp)
 app.register_blueprint(panel_admin_bp)
 
+# 🛠️ Comandos de mantenimiento (flask --app app reconciliar-contadores)
+from utils import comandos
+comandos.init_app(app)
+
+# 📚 Catálogos en memoria (ciclo activo, grados, tipos de documento, escuelas)
+from models import catalogo_model
+catalogo_model.calentar()
+
+# 🔎 Filtros de existencia para CURP y correo
+from models import existencia_model
+existencia_model.calentar()
+
 # 🏁 Ejecutar servidor
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
\ No newline at end of file
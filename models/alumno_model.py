@@ -1,5 +1,19 @@
-from models.database import get_connection
+from models.database import get_connection, lectura_en_replica, registrar_consulta, ejecutar_consulta, al_confirmar
+from models import existencia_model, escucha_bd
+from models.cargador import cargador
+from models.cache import obtener, guardar, descartar, invalidar
 from psycopg2 import DatabaseError
+import os
+
+ESPACIO_ALUMNOS_TUTOR = 'alumnos_tutor'
+ALUMNOS_TUTOR_TTL = float(os.getenv('ALUMNOS_TUTOR_TTL', 300))
+CANAL_ALUMNOS_TUTOR = 'alumnos_tutor_cambio'
+
+# Solo la llave: se resuelve con el índice (tutor_id, alumno_id) sin leer la tabla
+IDS_ALUMNOS_DE_TUTOR = registrar_consulta(
+    'ids_alumnos_de_tutor',
+    "SELECT alumno_id FROM alumno_tutor WHERE tutor_id = %s"
+)
 
 # 📝 Registrar nuevo alumno
 def registrar_alumno(nombre, apellido_paterno, apellido_materno, curp, fecha_nacimiento, sexo, direccion, municipio, entidad, telefono, nacionalidad, escuela_procedencia, creado_por_usuario_id):
@@ -27,6 +41,8 @@ def registrar_alumno(nombre, apellido_paterno, apellido_materno, curp, fecha_nac
         # ✅ CORRECCIÓN: Acceso como diccionario
         alumno_id = resultado['alumno_id']
         conn.commit()
+        if curp:
+            existencia_model.registrar_alta('curp', curp)
         
         print(f"✅ Alumno registrado exitosamente con ID: {alumno_id}")
         return alumno_id
@@ -52,6 +68,7 @@ def vincular_alumno_a_tutor(alumno_id, tutor_id, es_representante=True, contacto
             VALUES (%s, %s, %s, %s)
         """, (alumno_id, tutor_id, es_representante, contacto_orden))
         conn.commit()
+        al_confirmar(lambda: descartar(ESPACIO_ALUMNOS_TUTOR, str(tutor_id)))
         print(f"✅ Alumno {alumno_id} vinculado con tutor {tutor_id}")
         return True
     except DatabaseError as e:
@@ -66,6 +83,7 @@ def vincular_alumno_a_tutor(alumno_id, tutor_id, es_representante=True, contacto
 # 🔍 Obtener alumno por CURP
 def obtener_alumno_por_curp(curp):
     """Obtener alumno por CURP - retorna dict o None"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -76,11 +94,13 @@ def obtener_alumno_por_curp(curp):
         print(f"Error al obtener alumno por CURP: {str(e)}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 # 👨‍👧 Obtener todos los alumnos de un tutor
 def obtener_alumnos_por_tutor(tutor_id):
     """Obtener alumnos de un tutor - retorna lista de dicts"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -103,31 +123,102 @@ def obtener_alumnos_por_tutor(tutor_id):
         print(f"Error al obtener alumnos del tutor: {str(e)}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+# 🔐 Obtener ids de los alumnos de un tutor (para autorizar)
+def obtener_ids_alumnos_de_tutor(tutor_id, refrescar=False):
+    """
+    Obtener los alumno_id vinculados a un tutor - retorna frozenset o None si falla la BD.
+    Se guarda ALUMNOS_TUTOR_TTL segundos en el cache; cualquier cambio en
+    alumno_tutor lo descarta en todos los nodos por LISTEN/NOTIFY. Sin escucha
+    activa se lee siempre de la BD.
+    """
+    escucha_bd.asegurar()
+    con_escucha = escucha_bd.conectado()
+    if con_escucha and not refrescar:
+        ids = obtener(ESPACIO_ALUMNOS_TUTOR, str(tutor_id))
+        if ids is not None:
+            return ids
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, IDS_ALUMNOS_DE_TUTOR, (tutor_id,))
+        ids = frozenset(fila['alumno_id'] for fila in cursor.fetchall())
+    except DatabaseError as e:
+        print(f"Error al obtener alumnos del tutor: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+    if con_escucha:
+        guardar(ESPACIO_ALUMNOS_TUTOR, str(tutor_id), ids, ALUMNOS_TUTOR_TTL)
+    return ids
+
+# 👦 Obtener datos básicos de un alumno
+def obtener_alumno_por_id(alumno_id):
+    """Obtener alumno por ID (mismas columnas que obtener_alumnos_por_tutor) - retorna dict o None"""
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT a.alumno_id,
+                   a.nombre || ' ' || a.apellido_paterno || ' ' || a.apellido_materno AS nombre_completo,
+                   a.curp,
+                   a.fecha_nacimiento,
+                   a.sexo,
+                   a.municipio,
+                   a.entidad
+            FROM alumnos a
+            WHERE a.alumno_id = %s
+        """, (alumno_id,))
+        alumno = cursor.fetchone()
+        return alumno
+    except DatabaseError as e:
+        print(f"Error al obtener alumno: {str(e)}")
+        return None
+    finally:
+        if conn:
+            conn.close()
 
 # ✅ Validar si CURP ya está registrado
 def curp_existe(curp):
     """Validar si CURP existe - retorna True/False"""
+    # Filtro de Bloom: un negativo es definitivo y no toca la BD
+    if not existencia_model.posiblemente_existe('curp', curp):
+        return False
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM alumnos WHERE curp = %s", (curp,))
         existe = cursor.fetchone() is not None
+        existencia_model.anotar_confirmacion('curp', existe)
         return existe
     except DatabaseError as e:
         print(f"Error al validar CURP: {str(e)}")
         return False
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
-# 🧾 Obtener resumen escolar del alumno
-def obtener_resumen_escolar(alumno_id):
-    """Obtener resumen escolar del alumno - retorna dict o None"""
+# 🧾 Obtener resumen escolar de varios alumnos (una sola consulta)
+@lectura_en_replica
+def obtener_resumen_escolar_many(alumno_ids):
+    """Obtener la inscripción más reciente de cada alumno - retorna dict alumno_id -> dict"""
+    alumno_ids = list(dict.fromkeys(alumno_ids))
+    if not alumno_ids:
+        return {}
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT c.nombre AS ciclo,
+            SELECT DISTINCT ON (i.alumno_id)
+                   i.alumno_id,
+                   c.nombre AS ciclo,
                    g.descripcion AS grado,
                    gr.nombre_grupo AS grupo,
                    e.turno,
@@ -137,14 +228,28 @@ def obtener_resumen_escolar(alumno_id):
             INNER JOIN grados g ON i.grado_id = g.grado_id
             LEFT JOIN grupos gr ON i.grupo_id = gr.grupo_id
             INNER JOIN escuelas e ON i.escuela_id = e.escuela_id
-            WHERE i.alumno_id = %s
-            ORDER BY i.fecha_solicitud DESC
-            LIMIT 1
-        """, (alumno_id,))
-        resumen = cursor.fetchone()
-        return resumen
+            WHERE i.alumno_id = ANY(%s)
+            ORDER BY i.alumno_id, i.fecha_solicitud DESC
+        """, (alumno_ids,))
+        return {fila.pop('alumno_id'): fila for fila in cursor.fetchall()}
     except DatabaseError as e:
-        print(f"Error al obtener resumen escolar: {str(e)}")
-        return None
+        print(f"Error al obtener resúmenes escolares: {str(e)}")
+        return {}
     finally:
-        conn.close()
\ No newline at end of file
+        if conn:
+            conn.close()
+
+# 🧾 Obtener resumen escolar del alumno
+def obtener_resumen_escolar(alumno_id):
+    """Obtener resumen escolar del alumno - retorna dict o None (agrupado con los demás alumnos de la petición)"""
+    return cargador(obtener_resumen_escolar_many).cargar(alumno_id)
+
+
+# ===== INVALIDACIÓN ENTRE NODOS (LISTEN/NOTIFY) =====
+
+def _al_reconectar():
+    # Mientras no se escuchaba pudo perderse algún aviso
+    invalidar(ESPACIO_ALUMNOS_TUTOR)
+
+
+escucha_bd.suscribir(CANAL_ALUMNOS_TUTOR, lambda tutor_id: descartar(ESPACIO_ALUMNOS_TUTOR, tutor_id), _al_reconectar)
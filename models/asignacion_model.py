@@ -0,0 +1,205 @@
+"""
+Asignación por preferencias de las solicitudes pendientes de un ciclo, para
+cuando la demanda de las escuelas supera su cupo.
+
+Cada solicitud ordena sus escuelas: la de la inscripción primero y después
+las de preferencias_inscripcion. Las escuelas dan prioridad a los alumnos de
+su mismo municipio y desempatan con un sorteo sembrado (la misma semilla
+repite el mismo resultado). Solo entran las solicitudes con la documentación
+completa; el cupo de cada escuela es cupo_total menos sus aceptados.
+
+Todo corre en una transacción: se bloquean las solicitudes, se leen en
+arreglos compactos con un cursor del lado del servidor, se asigna en memoria
+(utils/aceptacion_diferida) y se escribe por bloques con UPDATE ... FROM
+unnest(). Las aceptadas quedan sin grupo para la colocación automática.
+"""
+from models.database import get_connection, RegistroCursor
+from models import catalogo_model
+from models.inscripcion_model import invalidar_estadisticas
+from utils.aceptacion_diferida import aceptacion_diferida, claves_con_sorteo
+from psycopg2 import DatabaseError
+from array import array
+from collections import Counter
+import json
+import os
+import random
+import secrets
+import time
+
+ASIGNACION_ITERSIZE = int(os.getenv('ASIGNACION_ITERSIZE', 20000))     # filas por viaje al leer
+ASIGNACION_LOTE_ESCRITURA = int(os.getenv('ASIGNACION_LOTE_ESCRITURA', 50000))  # filas por UPDATE
+MOTIVO_SIN_LUGAR = "Sin lugar en las escuelas solicitadas (asignación por preferencias)"
+
+# Una fila por (solicitud, escuela) en orden de preferencia
+PREFERENCIAS_CANDIDATAS = """
+    SELECT
+        i.inscripcion_id,
+        o.escuela_id,
+        (a.municipio IS NOT NULL AND a.municipio = e.municipio) AS cercana
+    FROM inscripciones i
+    INNER JOIN alumnos a ON a.alumno_id = i.alumno_id
+    LEFT JOIN progreso_documentos pd ON pd.alumno_id = i.alumno_id
+    CROSS JOIN LATERAL (
+        SELECT 1 AS orden, i.escuela_id
+        UNION ALL
+        SELECT pi.orden, pi.escuela_id
+        FROM preferencias_inscripcion pi
+        WHERE pi.inscripcion_id = i.inscripcion_id
+    ) o
+    INNER JOIN escuelas e ON e.escuela_id = o.escuela_id AND e.activo = TRUE
+    WHERE i.ciclo_id = %s
+      AND i.status IN ('pendiente', 'en_revision')
+      AND COALESCE(pd.requeridos - pd.subidos, contar_bits(mascara_documentos_requeridos())) <= 0
+    ORDER BY i.inscripcion_id, o.orden
+"""
+
+
+def _por_bloques(*columnas):
+    for inicio in range(0, len(columnas[0]), ASIGNACION_LOTE_ESCRITURA):
+        yield tuple(list(c[inicio:inicio + ASIGNACION_LOTE_ESCRITURA]) for c in columnas)
+
+
+def asignar_por_preferencias(ciclo_id=None, semilla=None, simular=False, rechazar_sin_lugar=False, revisado_por=None):
+    """
+    Asignar escuela a las solicitudes pendientes del ciclo (activo por
+    defecto). Con simular=True se calcula sin guardar; con
+    rechazar_sin_lugar las que no alcanzan lugar se rechazan (si no, siguen
+    pendientes). Retorna dict con el resumen (semilla, solicitudes,
+    sin_documentos, sin_escuela_activa, asignadas, por_opcion, sin_lugar,
+    segundos) o None si falla.
+    """
+    if not ciclo_id:
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    if semilla is None:
+        semilla = secrets.randbits(32)
+    inicio_reloj = time.monotonic()
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        # Nadie revisa estas solicitudes mientras se asignan
+        cursor.execute("""
+            SELECT
+                COUNT(*) AS pendientes,
+                COUNT(*) FILTER (WHERE faltantes > 0) AS sin_documentos
+            FROM (
+                SELECT COALESCE(
+                    (SELECT pd.requeridos - pd.subidos FROM progreso_documentos pd WHERE pd.alumno_id = i.alumno_id),
+                    contar_bits(mascara_documentos_requeridos())
+                ) AS faltantes
+                FROM inscripciones i
+                WHERE i.ciclo_id = %s AND i.status IN ('pendiente', 'en_revision')
+                ORDER BY i.inscripcion_id
+                FOR UPDATE
+            ) t
+        """, (ciclo_id,))
+        f = cursor.fetchone()
+        pendientes, sin_documentos = f['pendientes'], f['sin_documentos']
+
+        cursor.execute("""
+            SELECT e.escuela_id, GREATEST(e.cupo_total - COALESCE(c.aceptados, 0), 0) AS cupos
+            FROM escuelas e
+            LEFT JOIN contadores_escuela c ON c.escuela_id = e.escuela_id AND c.ciclo_id = %s
+            WHERE e.activo = TRUE
+            ORDER BY e.escuela_id
+        """, (ciclo_id,))
+        escuela_ids = array('l')
+        cupos = array('l')
+        indice_escuela = {}
+        for f in cursor.fetchall():
+            indice_escuela[f['escuela_id']] = len(escuela_ids)
+            escuela_ids.append(f['escuela_id'])
+            cupos.append(f['cupos'])
+
+        # Preferencias en CSR: las de la solicitud k van de inicio[k] a inicio[k + 1]
+        inscripcion_ids = array('l')
+        inicio = array('l', [0])
+        escuelas = array('l')
+        clases = array('b')
+        lector = conn.cursor(name='asignacion_preferencias', cursor_factory=RegistroCursor)
+        lector.itersize = ASIGNACION_ITERSIZE
+        lector.execute(PREFERENCIAS_CANDIDATAS, (ciclo_id,))
+        for f in lector:
+            if not inscripcion_ids or inscripcion_ids[-1] != f.inscripcion_id:
+                if inscripcion_ids:
+                    inicio.append(len(escuelas))
+                inscripcion_ids.append(f.inscripcion_id)
+            escuelas.append(indice_escuela[f.escuela_id])
+            clases.append(0 if f.cercana else 1)
+        lector.close()
+        if inscripcion_ids:
+            inicio.append(len(escuelas))
+
+        claves = claves_con_sorteo(inicio, clases, random.Random(semilla))
+        asignada = aceptacion_diferida(inicio, escuelas, claves, cupos)
+
+        aceptadas, escuela_aceptada, sin_lugar = array('l'), array('l'), array('l')
+        por_opcion = Counter()
+        for k, opcion in enumerate(asignada):
+            if opcion < 0:
+                sin_lugar.append(inscripcion_ids[k])
+                continue
+            aceptadas.append(inscripcion_ids[k])
+            escuela_aceptada.append(escuela_ids[escuelas[inicio[k] + opcion]])
+            por_opcion[opcion + 1] += 1
+
+        resumen = {
+            'ciclo_id': ciclo_id,
+            'semilla': semilla,
+            'solicitudes': len(inscripcion_ids),
+            'sin_documentos': sin_documentos,
+            # Con documentos pero sin ninguna de sus escuelas activa
+            'sin_escuela_activa': pendientes - sin_documentos - len(inscripcion_ids),
+            'asignadas': len(aceptadas),
+            'por_opcion': dict(sorted(por_opcion.items())),
+            'sin_lugar': len(sin_lugar),
+            'rechazadas': len(sin_lugar) if rechazar_sin_lugar else 0,
+            'simulada': simular,
+        }
+
+        if simular:
+            conn.rollback()
+        else:
+            for ids, escuelas_bloque in _por_bloques(aceptadas, escuela_aceptada):
+                cursor.execute("""
+                    UPDATE inscripciones i
+                    SET status = 'aceptado',
+                        escuela_id = a.escuela_id,
+                        grupo_id = NULL,
+                        revisado_por = %s,
+                        fecha_revision = CURRENT_TIMESTAMP,
+                        motivo_rechazo = NULL
+                    FROM unnest(%s::INTEGER[], %s::INTEGER[]) AS a(inscripcion_id, escuela_id)
+                    WHERE i.inscripcion_id = a.inscripcion_id
+                """, (revisado_por, ids, escuelas_bloque))
+            if rechazar_sin_lugar:
+                for (ids,) in _por_bloques(sin_lugar):
+                    cursor.execute("""
+                        UPDATE inscripciones
+                        SET status = 'rechazado',
+                            grupo_id = NULL,
+                            revisado_por = %s,
+                            fecha_revision = CURRENT_TIMESTAMP,
+                            motivo_rechazo = %s
+                        WHERE inscripcion_id = ANY(%s::INTEGER[])
+                    """, (revisado_por, MOTIVO_SIN_LUGAR, ids))
+            # La semilla queda registrada para poder repetir el sorteo
+            cursor.execute("""
+                INSERT INTO audit_logs (usuario_id, tabla_afectada, accion, detalles)
+                VALUES (%s, 'inscripciones', 'asignacion_por_preferencias', %s::jsonb)
+            """, (revisado_por, json.dumps(resumen)))
+            conn.commit()
+            invalidar_estadisticas()
+
+        resumen['segundos'] = round(time.monotonic() - inicio_reloj, 2)
+        print(f"✅ Asignación por preferencias (semilla {semilla}): {resumen['asignadas']} de {resumen['solicitudes']} solicitudes en {resumen['segundos']} s")
+        return resumen
+    except DatabaseError as e:
+        print(f"❌ Error en la asignación por preferencias: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
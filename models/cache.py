@@ -0,0 +1,323 @@
+"""
+Cache de dos niveles para resultados costosos de models/ (estadísticas, tableros):
+
+  1. local: LRU en memoria del proceso, acotado por bytes
+  2. compartido: archivo SQLite del nodo (modo WAL) que leen todos los workers,
+     así un cálculo se hace una vez por nodo y no una vez por worker
+
+Los valores se guardan serializados con pickle (+ zlib a partir de
+CACHE_COMPRIMIR_DESDE bytes) y ambos niveles desalojan por tamaño. El nivel
+local vive a lo más CACHE_LOCAL_TTL segundos para que una invalidación hecha
+en otro worker se note pronto.
+
+CACHE_BACKEND: 'sqlite' (ambos niveles, por defecto), 'local' o 'ninguno'.
+
+Uso:
+    @cacheado('estadisticas', ttl=60)
+    def obtener_estadisticas_inscripciones(escuela_id=None): ...
+
+    al_confirmar(lambda: invalidar('estadisticas'))
+"""
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite').lower()
+CACHE_TTL = float(os.getenv('CACHE_TTL', 60))
+CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 5))
+CACHE_LOCAL_MAX_BYTES = int(os.getenv('CACHE_LOCAL_MAX_BYTES', 8 * 1024 * 1024))
+CACHE_SQLITE_RUTA = os.getenv(
+    'CACHE_SQLITE_RUTA',
+    str(Path(__file__).resolve().parent.parent / 'cache' / 'sigeprimaria_cache.sqlite3')
+)
+CACHE_SQLITE_MAX_BYTES = int(os.getenv('CACHE_SQLITE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_COMPRIMIR_DESDE = int(os.getenv('CACHE_COMPRIMIR_DESDE', 1024))
+
+_NADA = object()
+
+_metricas = {
+    'aciertos_local': 0,
+    'aciertos_compartido': 0,
+    'fallos': 0,
+    'guardados': 0,
+    'desalojos_local': 0,
+    'invalidaciones': 0,
+    'errores_compartido': 0,
+}
+_metricas_lock = threading.Lock()
+
+
+def _contar(nombre, n=1):
+    with _metricas_lock:
+        _metricas[nombre] += n
+
+
+def _serializar(valor):
+    datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(datos) >= CACHE_COMPRIMIR_DESDE:
+        return b'z' + zlib.compress(datos, 1)
+    return b'p' + datos
+
+
+def _deserializar(blob):
+    if blob[:1] == b'z':
+        return pickle.loads(zlib.decompress(memoryview(blob)[1:]))
+    return pickle.loads(memoryview(blob)[1:])
+
+
+class CacheLocal:
+    """LRU en memoria del proceso, acotado por el tamaño serializado de los valores"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()   # clave -> (blob, expira)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            blob, expira = entrada
+            if expira <= time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return blob
+
+    def guardar(self, clave, blob, ttl):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._quitar(clave)
+            self._datos[clave] = (blob, time.monotonic() + ttl)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, (viejo, _) = self._datos.popitem(last=False)
+                self._bytes -= len(viejo)
+                _contar('desalojos_local')
+
+    def borrar(self, clave):
+        with self._lock:
+            self._quitar(clave)
+
+    def borrar_prefijo(self, prefijo):
+        with self._lock:
+            for clave in [c for c in self._datos if c.startswith(prefijo)]:
+                self._quitar(clave)
+
+    def _quitar(self, clave):
+        entrada = self._datos.pop(clave, None)
+        if entrada is not None:
+            self._bytes -= len(entrada[0])
+
+    def resumen(self):
+        return {'entradas': len(self._datos), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+class CacheSQLite:
+    """
+    Nivel compartido por los workers del nodo. Una conexión por hilo y proceso;
+    las lecturas no bloquean a las escrituras (WAL). Desaloja primero lo
+    caducado y después lo menos usado hasta quedar bajo max_bytes.
+    """
+
+    def __init__(self, ruta, max_bytes):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._hilo = threading.local()
+
+    def _conexion(self):
+        conn = getattr(self._hilo, 'conn', None)
+        if conn is None or self._hilo.pid != os.getpid():
+            Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    clave TEXT PRIMARY KEY,
+                    valor BLOB NOT NULL,
+                    expira REAL NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    usado REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_usado ON cache(usado)")
+            self._hilo.conn = conn
+            self._hilo.pid = os.getpid()
+        return conn
+
+    def obtener(self, clave):
+        conn = self._conexion()
+        fila = conn.execute("SELECT valor, expira, usado FROM cache WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        valor, expira, usado = fila
+        ahora = time.time()
+        if expira <= ahora:
+            return None
+        if ahora - usado > 30:
+            # Marca de uso aproximada: evita una escritura por cada lectura
+            conn.execute("UPDATE cache SET usado = ? WHERE clave = ?", (ahora, clave))
+        return valor
+
+    def guardar(self, clave, blob, ttl):
+        if len(blob) > self.max_bytes:
+            return
+        conn = self._conexion()
+        ahora = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (clave, valor, expira, tamano, usado) VALUES (?, ?, ?, ?, ?)",
+            (clave, blob, ahora + ttl, len(blob), ahora)
+        )
+        self._desalojar(conn, ahora)
+
+    def _desalojar(self, conn, ahora):
+        conn.execute("DELETE FROM cache WHERE expira <= ?", (ahora,))
+        total = conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM cache").fetchone()[0]
+        while total > self.max_bytes:
+            viejas = conn.execute("SELECT clave, tamano FROM cache ORDER BY usado LIMIT 16").fetchall()
+            if not viejas:
+                break
+            conn.executemany("DELETE FROM cache WHERE clave = ?", [(c,) for c, _ in viejas])
+            total -= sum(t for _, t in viejas)
+
+    def borrar(self, clave):
+        self._conexion().execute("DELETE FROM cache WHERE clave = ?", (clave,))
+
+    def borrar_prefijo(self, prefijo):
+        # Rango sobre la llave primaria: [prefijo, prefijo + U+FFFF)
+        self._conexion().execute(
+            "DELETE FROM cache WHERE clave >= ? AND clave < ?", (prefijo, prefijo + '\uffff')
+        )
+
+    def resumen(self):
+        entradas, total = self._conexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM cache"
+        ).fetchone()
+        return {'ruta': self.ruta, 'entradas': entradas, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+_local = CacheLocal(CACHE_LOCAL_MAX_BYTES) if CACHE_BACKEND in ('sqlite', 'local') else None
+_compartido = CacheSQLite(CACHE_SQLITE_RUTA, CACHE_SQLITE_MAX_BYTES) if CACHE_BACKEND == 'sqlite' else None
+
+
+def _clave(espacio, clave):
+    if len(clave) > 200:
+        clave = hashlib.blake2b(clave.encode(), digest_size=16).hexdigest()
+    return f"{espacio}:{clave}"
+
+
+def obtener(espacio, clave, defecto=None):
+    """Valor guardado o `defecto`; primero el nivel local y luego el compartido"""
+    completa = _clave(espacio, clave)
+    if _local is not None:
+        blob = _local.obtener(completa)
+        if blob is not None:
+            _contar('aciertos_local')
+            return _deserializar(blob)
+    if _compartido is not None:
+        try:
+            blob = _compartido.obtener(completa)
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache compartido no disponible: {e}")
+            _contar('errores_compartido')
+            blob = None
+        if blob is not None:
+            _contar('aciertos_compartido')
+            _local.guardar(completa, blob, CACHE_LOCAL_TTL)
+            return _deserializar(blob)
+    _contar('fallos')
+    return defecto
+
+
+def guardar(espacio, clave, valor, ttl=None):
+    """Guardar en ambos niveles; el local caduca a lo más en CACHE_LOCAL_TTL"""
+    if _local is None:
+        return
+    ttl = CACHE_TTL if ttl is None else ttl
+    completa = _clave(espacio, clave)
+    blob = _serializar(valor)
+    _local.guardar(completa, blob, min(ttl, CACHE_LOCAL_TTL) if _compartido is not None else ttl)
+    if _compartido is not None:
+        try:
+            _compartido.guardar(completa, blob, ttl)
+        except sqlite3.Error as e:
+            print(f"⚠️ No se pudo guardar en el cache compartido: {e}")
+            _contar('errores_compartido')
+    _contar('guardados')
+
+
+def invalidar(espacio):
+    """Descartar todo el espacio en este worker y en el nivel compartido del nodo"""
+    prefijo = f"{espacio}:"
+    if _local is not None:
+        _local.borrar_prefijo(prefijo)
+    if _compartido is not None:
+        try:
+            _compartido.borrar_prefijo(prefijo)
+        except sqlite3.Error as e:
+            print(f"⚠️ No se pudo invalidar el cache compartido: {e}")
+            _contar('errores_compartido')
+    _contar('invalidaciones')
+
+
+def descartar(espacio, clave):
+    """Descartar una sola llave en este worker y en el nivel compartido del nodo"""
+    completa = _clave(espacio, clave)
+    if _local is not None:
+        _local.borrar(completa)
+    if _compartido is not None:
+        try:
+            _compartido.borrar(completa)
+        except sqlite3.Error as e:
+            print(f"⚠️ No se pudo invalidar el cache compartido: {e}")
+            _contar('errores_compartido')
+    _contar('invalidaciones')
+
+
+def cacheado(espacio, ttl=None):
+    """
+    Decorador para funciones de models/: la llave sale del nombre de la función
+    y sus argumentos. Los None (errores de BD en los modelos) no se guardan.
+    """
+    def decorador(f):
+        prefijo = f"{f.__module__}.{f.__qualname__}"
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            clave = f"{prefijo}{args!r}{sorted(kwargs.items())!r}"
+            valor = obtener(espacio, clave, _NADA)
+            if valor is not _NADA:
+                return valor
+            valor = f(*args, **kwargs)
+            if valor is not None:
+                guardar(espacio, clave, valor, ttl)
+            return valor
+        return decorated_function
+    return decorador
+
+
+def obtener_metricas_cache():
+    """Aciertos/fallos del worker actual y ocupación de ambos niveles"""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    consultas = metricas['aciertos_local'] + metricas['aciertos_compartido'] + metricas['fallos']
+    metricas['tasa_aciertos'] = round((consultas - metricas['fallos']) / consultas, 3) if consultas else None
+    metricas['backend'] = CACHE_BACKEND
+    metricas['pid'] = os.getpid()
+    metricas['local'] = _local.resumen() if _local is not None else None
+    try:
+        metricas['compartido'] = _compartido.resumen() if _compartido is not None else None
+    except sqlite3.Error as e:
+        metricas['compartido'] = {'error': str(e)}
+    return metricas
@@ -0,0 +1,79 @@
+"""
+Cargadores por lotes de la petición actual (estilo DataLoader).
+
+Las páginas con varios alumnos piden lo mismo para cada uno; en lugar de una
+consulta por alumno, el cargador junta las llaves y llama una sola vez a la
+variante *_many del modelo (que consulta con `= ANY(%s)`). Lo ya cargado se
+reutiliza durante el resto de la petición.
+
+    checklists = cargador(obtener_checklist_documental_many)
+    checklists.anticipar(h['alumno_id'] for h in hijos)
+    for hijo in hijos:
+        checklist = checklists.cargar(hijo['alumno_id'])   # 1 consulta en total
+
+Las funciones por lotes reciben una lista de llaves y devuelven un dict
+llave -> resultado; las llaves que falten se resuelven como None.
+"""
+from flask import g, has_app_context
+
+
+class CargadorPorLotes:
+    """Junta llaves y las resuelve con una sola llamada a `funcion_lote`"""
+
+    def __init__(self, funcion_lote):
+        self.funcion_lote = funcion_lote
+        self._resultados = {}
+        self._pendientes = {}    # dict como conjunto ordenado
+
+    def anticipar(self, llaves):
+        """Apuntar llaves que se pedirán; se cargan juntas en el siguiente cargar()"""
+        for llave in llaves:
+            if llave not in self._resultados:
+                self._pendientes.setdefault(llave)
+
+    def cargar(self, llave):
+        if llave not in self._resultados:
+            self._pendientes.setdefault(llave)
+            self._despachar()
+        return self._resultados.get(llave)
+
+    def cargar_varios(self, llaves):
+        llaves = list(llaves)
+        self.anticipar(llaves)
+        self._despachar()
+        return [self._resultados.get(llave) for llave in llaves]
+
+    def olvidar(self, llave=None):
+        """Descartar lo cargado (todo o una llave) tras una escritura"""
+        if llave is None:
+            self._resultados.clear()
+        else:
+            self._resultados.pop(llave, None)
+
+    def _despachar(self):
+        if not self._pendientes:
+            return
+        llaves = list(self._pendientes)
+        self._pendientes.clear()
+        encontrados = self.funcion_lote(llaves) or {}
+        for llave in llaves:
+            self._resultados[llave] = encontrados.get(llave)
+
+
+def cargador(funcion_lote):
+    """Cargador de `funcion_lote` para la petición actual (uno nuevo fuera de una petición)"""
+    if not has_app_context():
+        return CargadorPorLotes(funcion_lote)
+    cargadores = g.setdefault('_cargadores', {})
+    actual = cargadores.get(funcion_lote)
+    if actual is None:
+        actual = cargadores[funcion_lote] = CargadorPorLotes(funcion_lote)
+    return actual
+
+
+def olvidar(funcion_lote, llave=None):
+    """Invalidar lo que la petición actual ya cargó con `funcion_lote`"""
+    if has_app_context():
+        actual = g.get('_cargadores', {}).get(funcion_lote)
+        if actual is not None:
+            actual.olvidar(llave)
@@ -0,0 +1,185 @@
+"""
+Catálogos en memoria del proceso: ciclo activo, grados, tipos de documento
+y escuelas activas. Cambian muy poco y se leían en casi cada petición.
+
+Cada worker guarda su copia y la invalida al recibir un NOTIFY en el canal
+'catalogos_cambio' (triggers notificar_cambio_catalogo en sigueprimaria.sql;
+el payload es el nombre de la tabla). Si el hilo de LISTEN no está conectado
+las copias caducan tras CATALOGO_TTL_SIN_ESCUCHA segundos; con él, tras
+CATALOGO_TTL como respaldo.
+"""
+from models.database import (
+    get_connection, registrar_consulta, ejecutar_consulta, leer_de_primaria, RegistroCursor
+)
+from models import escucha_bd
+from psycopg2 import DatabaseError
+import os
+import threading
+import time
+
+CATALOGO_TTL = float(os.getenv('CATALOGO_TTL', 600))
+CATALOGO_TTL_SIN_ESCUCHA = float(os.getenv('CATALOGO_TTL_SIN_ESCUCHA', 10))
+CANAL_CATALOGOS = 'catalogos_cambio'
+
+CICLO_ACTIVO = registrar_consulta('ciclo_activo', """
+    SELECT ciclo_id, nombre, fecha_inicio, fecha_fin, activo, inscripciones_abiertas
+    FROM ciclos
+    WHERE activo = TRUE
+    LIMIT 1
+""")
+
+GRADOS = registrar_consulta('catalogo_grados', """
+    SELECT grado_id, nivel, descripcion
+    FROM grados
+    ORDER BY nivel
+""")
+
+TIPOS_DOCUMENTO = registrar_consulta('catalogo_tipos_documento', """
+    SELECT tipo_doc_id, codigo, nombre, descripcion, requerido
+    FROM tipos_documento
+    WHERE activo = TRUE
+    ORDER BY requerido DESC, nombre
+""")
+
+ESCUELAS_ACTIVAS = registrar_consulta('catalogo_escuelas_activas', """
+    SELECT escuela_id, cct, nombre, municipio, entidad, turno, cupo_total
+    FROM escuelas
+    WHERE activo = TRUE
+    ORDER BY nombre
+""")
+
+# catálogo -> (consulta, solo la primera fila); tabla -> catálogos que invalida
+_CATALOGOS = {
+    'ciclo_activo': (CICLO_ACTIVO, True),
+    'grados': (GRADOS, False),
+    'tipos_documento': (TIPOS_DOCUMENTO, False),
+    'escuelas_activas': (ESCUELAS_ACTIVAS, False),
+}
+_TABLAS = {
+    'ciclos': ('ciclo_activo',),
+    'grados': ('grados',),
+    'tipos_documento': ('tipos_documento',),
+    'escuelas': ('escuelas_activas',),
+}
+
+_cache = {}          # catálogo -> (valor, cargado_en, cargado_con_escucha)
+_generacion = {}     # catálogo -> contador de invalidaciones
+_indices = {}        # (catálogo, llave, campo) -> (filas de origen, dict)
+_lock = threading.Lock()
+_pid = [None]        # proceso dueño de la copia (para detectar forks)
+
+
+def _cargar(nombre):
+    consulta, una_fila = _CATALOGOS[nombre]
+    with _lock:
+        generacion = _generacion.get(nombre, 0)
+    con_escucha = escucha_bd.conectado()
+    conn = None
+    try:
+        with leer_de_primaria():
+            conn = get_connection()
+            cursor = conn.cursor(cursor_factory=RegistroCursor)
+            ejecutar_consulta(cursor, consulta)
+            valor = cursor.fetchone() if una_fila else tuple(cursor.fetchall())
+    except DatabaseError as e:
+        print(f"Error al cargar catálogo {nombre}: {e}")
+        return None if una_fila else ()
+    finally:
+        if conn:
+            conn.close()
+
+    with _lock:
+        # Si llegó una invalidación mientras se consultaba, no guardar lo leído
+        if _generacion.get(nombre, 0) == generacion:
+            _cache[nombre] = (valor, time.monotonic(), con_escucha)
+    return valor
+
+
+def _obtener(nombre):
+    _asegurar_escucha()
+    entrada = _cache.get(nombre)
+    if entrada is not None:
+        valor, cargado_en, con_escucha = entrada
+        # Sin escucha activa (al cargar o ahora) pudo perderse una invalidación
+        ttl = CATALOGO_TTL if con_escucha and escucha_bd.conectado() else CATALOGO_TTL_SIN_ESCUCHA
+        if time.monotonic() - cargado_en < ttl:
+            return valor
+    return _cargar(nombre)
+
+
+def _indice(nombre, llave, campo):
+    """dict fila[llave] -> fila[campo] de un catálogo; se rehace solo cuando el catálogo se recarga"""
+    filas = _obtener(nombre)
+    actual = _indices.get((nombre, llave, campo))
+    if actual is None or actual[0] is not filas:
+        actual = (filas, {fila[llave]: fila[campo] for fila in filas or ()})
+        _indices[(nombre, llave, campo)] = actual
+    return actual[1]
+
+
+def obtener_ciclo_activo():
+    """Ciclo escolar activo (fila) o None"""
+    return _obtener('ciclo_activo')
+
+
+def obtener_ciclo_activo_id():
+    ciclo = _obtener('ciclo_activo')
+    return ciclo['ciclo_id'] if ciclo else None
+
+
+def obtener_grados():
+    """Grados ordenados por nivel"""
+    return _obtener('grados')
+
+
+def obtener_tipos_documento():
+    """Tipos de documento activos, requeridos primero"""
+    return _obtener('tipos_documento')
+
+
+def obtener_tipo_doc_ids_por_codigo():
+    """dict codigo -> tipo_doc_id de los tipos de documento activos"""
+    return _indice('tipos_documento', 'codigo', 'tipo_doc_id')
+
+
+def obtener_escuelas_activas():
+    """Escuelas activas ordenadas por nombre (sin cupos: esos cambian con cada inscripción)"""
+    return _obtener('escuelas_activas')
+
+
+def invalidar(tabla=None):
+    """Descartar los catálogos que dependen de `tabla` (todos si es None)"""
+    nombres = _TABLAS.get(tabla, ()) if tabla else tuple(_CATALOGOS)
+    with _lock:
+        for nombre in nombres:
+            _cache.pop(nombre, None)
+            _generacion[nombre] = _generacion.get(nombre, 0) + 1
+
+
+def calentar():
+    """Cargar todos los catálogos y arrancar la escucha (al iniciar el worker)"""
+    _asegurar_escucha()
+    escucha_bd.escuchando(CANAL_CATALOGOS, espera=2)
+    for nombre in _CATALOGOS:
+        _cargar(nombre)
+    print(f"📚 Catálogos en memoria: {', '.join(n for n in _CATALOGOS if n in _cache)}")
+
+
+# ===== INVALIDACIÓN ENTRE WORKERS (LISTEN/NOTIFY) =====
+
+def _asegurar_escucha():
+    """Tras un fork el hijo descarta la copia heredada (pudo perder avisos) y arranca su escucha"""
+    pid = os.getpid()
+    if _pid[0] != pid:
+        with _lock:
+            if _pid[0] not in (None, pid):
+                _cache.clear()
+            _pid[0] = pid
+    escucha_bd.asegurar()
+
+
+def _al_reconectar():
+    invalidar()
+
+
+escucha_bd.suscribir(CANAL_CATALOGOS, lambda tabla: invalidar(tabla or None), _al_reconectar)
@@ -0,0 +1,188 @@
+"""
+Colocación automática de las inscripciones aceptadas sin grupo.
+
+Cada escuela se coloca en una transacción corta: se bloquean sus aceptadas
+sin grupo, se toma el candado de asignar_lugar_grupo de cada grado (en el
+mismo orden que las aceptaciones, para que no se crucen) y sus grupos; el
+reparto se calcula en memoria (utils/reparto_grupos) y se escribe con un solo
+UPDATE. Para todo el estado se recorren las escuelas una por una.
+"""
+from models.database import get_connection, reintentar_conflictos, ERRORES_CONFLICTO, RegistroCursor
+from models import catalogo_model
+from models.inscripcion_model import invalidar_estadisticas
+from utils.reparto_grupos import repartir
+from psycopg2 import DatabaseError
+from collections import defaultdict
+
+
+def contar_aceptados_sin_grupo(escuela_id, ciclo_id=None):
+    """Aceptadas de la escuela que esperan grupo (por grado: {grado_id: n})"""
+    if not ciclo_id:
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT grado_id, COUNT(*) AS n
+            FROM inscripciones
+            WHERE escuela_id = %s AND ciclo_id = %s
+              AND status = 'aceptado' AND grupo_id IS NULL
+            GROUP BY grado_id
+        """, (escuela_id, ciclo_id))
+        return {f['grado_id']: f['n'] for f in cursor.fetchall()}
+    except DatabaseError as e:
+        print(f"Error al contar aceptados sin grupo: {e}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+
+@reintentar_conflictos
+def colocar_aceptados_escuela(escuela_id, ciclo_id=None, simular=False):
+    """
+    Colocar en los grupos de su grado las aceptadas sin grupo de la escuela
+    (ciclo activo por defecto), equilibrando tamaño, sexo y edad. Si no caben
+    todas se quedan sin grupo las últimas en ser aceptadas. Con simular=True
+    se calcula sin guardar. Retorna dict con 'colocadas', 'sin_lugar' y
+    'por_grupo' ({grupo_id: n}), o None si falla.
+    """
+    if not ciclo_id:
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
+
+        cursor.execute("""
+            SELECT i.inscripcion_id, i.grado_id, i.fecha_revision, i.fecha_solicitud,
+                   a.sexo, a.fecha_nacimiento
+            FROM inscripciones i
+            INNER JOIN alumnos a ON i.alumno_id = a.alumno_id
+            WHERE i.escuela_id = %s AND i.ciclo_id = %s
+              AND i.status = 'aceptado' AND i.grupo_id IS NULL
+            ORDER BY i.inscripcion_id
+            FOR UPDATE OF i
+        """, (escuela_id, ciclo_id))
+        alumnos_por_grado = defaultdict(list)
+        for f in cursor.fetchall():
+            alumnos_por_grado[f.grado_id].append(f)
+        if not alumnos_por_grado:
+            conn.rollback()
+            return {'colocadas': 0, 'sin_lugar': 0, 'por_grupo': {}}
+        grados = sorted(alumnos_por_grado)
+
+        cursor.execute("""
+            SELECT pg_advisory_xact_lock(%s, hashtext('asignar_lugar:' || %s || ':' || grado_id))
+            FROM unnest(%s::INTEGER[]) AS grado_id
+        """, (escuela_id, ciclo_id, grados))
+        cursor.execute("""
+            SELECT grupo_id, grado_id, cupo, alumnos_inscritos
+            FROM grupos
+            WHERE escuela_id = %s AND ciclo_id = %s AND grado_id = ANY(%s)
+            ORDER BY grupo_id
+            FOR UPDATE
+        """, (escuela_id, ciclo_id, grados))
+        grupos = {
+            g.grupo_id: {'grupo_id': g.grupo_id, 'grado_id': g.grado_id, 'cupo': g.cupo,
+                         'inscritos': g.alumnos_inscritos, 'por_sexo': {}}
+            for g in cursor.fetchall()
+        }
+        # Composición actual de los grupos (los ya colocados no se mueven)
+        cursor.execute("""
+            SELECT i.grupo_id, a.sexo, COUNT(*) AS n
+            FROM inscripciones i
+            INNER JOIN alumnos a ON i.alumno_id = a.alumno_id
+            WHERE i.escuela_id = %s AND i.ciclo_id = %s
+              AND i.status = 'aceptado' AND i.grupo_id = ANY(%s)
+            GROUP BY i.grupo_id, a.sexo
+        """, (escuela_id, ciclo_id, list(grupos)))
+        for f in cursor.fetchall():
+            grupos[f.grupo_id]['por_sexo'][f.sexo or '-'] = f.n
+
+        asignaciones = []
+        sin_lugar = 0
+        for grado_id in grados:
+            # Primero las aceptadas antes
+            alumnos = sorted(
+                alumnos_por_grado[grado_id],
+                key=lambda f: (f.fecha_revision is None, f.fecha_revision or f.fecha_solicitud, f.inscripcion_id)
+            )
+            colocadas, sobrantes = repartir(
+                [(f.inscripcion_id, f.sexo, f.fecha_nacimiento) for f in alumnos],
+                [g for g in grupos.values() if g['grado_id'] == grado_id]
+            )
+            asignaciones.extend(colocadas)
+            sin_lugar += len(sobrantes)
+
+        por_grupo = defaultdict(int)
+        for _, grupo_id in asignaciones:
+            por_grupo[grupo_id] += 1
+
+        if simular or not asignaciones:
+            conn.rollback()
+        else:
+            cursor.execute("""
+                UPDATE inscripciones i
+                SET grupo_id = c.grupo_id
+                FROM unnest(%s::INTEGER[], %s::INTEGER[]) AS c(inscripcion_id, grupo_id)
+                WHERE i.inscripcion_id = c.inscripcion_id
+            """, ([a[0] for a in asignaciones], [a[1] for a in asignaciones]))
+            conn.commit()
+            invalidar_estadisticas()
+            print(f"✅ Escuela {escuela_id}: {len(asignaciones)} alumno(s) colocados en {len(por_grupo)} grupo(s), {sin_lugar} sin lugar")
+        return {'colocadas': len(asignaciones), 'sin_lugar': sin_lugar, 'por_grupo': dict(por_grupo)}
+    except ERRORES_CONFLICTO:
+        if conn:
+            conn.rollback()
+        raise
+    except DatabaseError as e:
+        print(f"❌ Error al colocar aceptados de la escuela {escuela_id}: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+def colocar_aceptados(ciclo_id=None, simular=False):
+    """
+    Colocar las aceptadas sin grupo de todas las escuelas del ciclo, una
+    escuela por transacción. Retorna dict con 'escuelas', 'colocadas',
+    'sin_lugar' y 'fallidas' (escuelas que no se pudieron colocar), o None si
+    no se pudo leer la lista de escuelas.
+    """
+    if not ciclo_id:
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT escuela_id
+            FROM inscripciones
+            WHERE ciclo_id = %s AND status = 'aceptado' AND grupo_id IS NULL
+            ORDER BY escuela_id
+        """, (ciclo_id,))
+        escuelas = [f['escuela_id'] for f in cursor.fetchall()]
+    except DatabaseError as e:
+        print(f"❌ Error al buscar escuelas con aceptados sin grupo: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+    totales = {'escuelas': len(escuelas), 'colocadas': 0, 'sin_lugar': 0, 'fallidas': 0}
+    for escuela_id in escuelas:
+        try:
+            resultado = colocar_aceptados_escuela(escuela_id, ciclo_id, simular=simular)
+        except ERRORES_CONFLICTO:
+            resultado = None
+        if resultado is None:
+            totales['fallidas'] += 1
+            continue
+        totales['colocadas'] += resultado['colocadas']
+        totales['sin_lugar'] += resultado['sin_lugar']
+    return totales
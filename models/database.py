@@ -1,16 +1,1202 @@
 import psycopg2
+from psycopg2 import errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
+from flask import g, has_app_context, has_request_context, session, request, render_template, jsonify
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from operator import itemgetter
+import itertools
 import os
+import random
+import re
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connection():
-    return psycopg2.connect(
+# ⚙️ Configuración del pool (por proceso/worker)
+POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+POOL_ESPERA = float(os.getenv('DB_POOL_TIMEOUT', 5))           # segundos esperando una conexión libre
+POOL_INACTIVIDAD = float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))  # segundos antes de cerrar conexiones ociosas
+POOL_VERIFICACION = float(os.getenv('DB_POOL_HEALTHCHECK', 30))   # segundos ociosa antes de verificar con SELECT 1
+
+# 📌 Sentencias preparadas (desactivar con DB_PREPARED_STATEMENTS=0 detrás de pgbouncer en modo transacción)
+USAR_PREPARADAS = os.getenv('DB_PREPARED_STATEMENTS', '1').lower() not in ('0', 'false', 'no')
+
+# 📖 Réplica de lectura (opcional) y ventana de "leer lo propio" tras una escritura
+REPLICA_DSN = os.getenv('DB_REPLICA_DSN', '').strip()
+REPLICA_VENTANA = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+# 🚰 Recorridos con cursor del lado del servidor: filas por viaje (FETCH)
+RECORRIDO_ITERSIZE = int(os.getenv('DB_ITERSIZE', 2000))
+
+# 📊 Instrumentación: misma sentencia desde la misma función N veces en una petición = N+1
+UMBRAL_N_MAS_UNO = int(os.getenv('DB_N_MAS_UNO_UMBRAL', 3))
+MAX_SENTENCIAS_METRICAS = 500
+
+# ⏱️ Límites por clase de ruta: (statement_timeout, lock_timeout) en milisegundos
+LIMITES_BD = {
+    'ajax': (int(os.getenv('DB_TIMEOUT_AJAX_MS', 2000)), int(os.getenv('DB_LOCK_TIMEOUT_AJAX_MS', 500))),
+    'normal': (int(os.getenv('DB_TIMEOUT_MS', 8000)), int(os.getenv('DB_LOCK_TIMEOUT_MS', 2000))),
+    'reporte': (int(os.getenv('DB_TIMEOUT_REPORTE_MS', 30000)), int(os.getenv('DB_LOCK_TIMEOUT_REPORTE_MS', 5000))),
+    'lote': (int(os.getenv('DB_TIMEOUT_LOTE_MS', 900000)), int(os.getenv('DB_LOCK_TIMEOUT_LOTE_MS', 30000))),
+}
+
+# 🔁 Reintentos de transacciones cortas que chocan con otras (serialización, deadlock, lock_timeout)
+REINTENTOS_CONFLICTO = int(os.getenv('DB_REINTENTOS_CONFLICTO', 5))
+REINTENTO_ESPERA_BASE = float(os.getenv('DB_REINTENTO_ESPERA_BASE', 0.02))  # segundos; se duplica en cada intento
+REINTENTO_ESPERA_MAX = float(os.getenv('DB_REINTENTO_ESPERA_MAX', 0.5))
+VENTANA_RENDIMIENTO = 60   # segundos para calcular completadas por segundo
+
+# 🔌 Circuit breaker de la primaria (por proceso/worker)
+CIRCUITO_VENTANA = int(os.getenv('DB_CIRCUITO_VENTANA', 20))                  # últimas N sentencias evaluadas
+CIRCUITO_MINIMO = int(os.getenv('DB_CIRCUITO_MINIMO', 10))                    # muestras antes de poder abrir
+CIRCUITO_PROPORCION = float(os.getenv('DB_CIRCUITO_PROPORCION_FALLOS', 0.5))  # fallos/ventana que abren el circuito
+CIRCUITO_LENTO = float(os.getenv('DB_CIRCUITO_LENTO', 0.8))                   # fracción del statement_timeout que cuenta como fallo
+CIRCUITO_ENFRIAMIENTO = float(os.getenv('DB_CIRCUITO_ENFRIAMIENTO', 15))      # segundos abierto antes de probar
+
+
+class PoolAgotado(psycopg2.OperationalError):
+    """No se obtuvo una conexión libre del pool dentro del tiempo de espera"""
+
+
+class TransaccionAbortada(psycopg2.DatabaseError):
+    """Una sentencia falló dentro de la unidad de trabajo sin que el modelo lo reportara"""
+
+
+class BaseDatosNoDisponible(Exception):
+    """
+    El circuito de la base de datos está abierto: se falla de inmediato sin
+    esperar a PostgreSQL. No hereda de DatabaseError para que los modelos no
+    la conviertan en None/[] y llegue al manejador de la página degradada.
+    """
+
+
+class ConexionPG(psycopg2.extensions.connection):
+    """Conexión física que recuerda qué consultas con nombre ya preparó y sus límites de tiempo"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preparadas = set()
+        self.dudosas = set()
+        self.limites = None
+        self.limites_provisionales = False
+
+    def commit(self):
+        super().commit()
+        self.limites_provisionales = False
+
+    def rollback(self):
+        super().rollback()
+        if self.limites_provisionales:
+            # El SET se hizo dentro de la transacción revertida
+            self.limites = None
+            self.limites_provisionales = False
+
+
+def _parametros_conexion():
+    return dict(
         host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
         database=os.getenv('DB_NAME'),
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD'),
+        connection_factory=ConexionPG,
+        cursor_factory=RealDictCursor
+    )
+
+
+def _parametros_replica():
+    return dict(
+        dsn=REPLICA_DSN,
+        connection_factory=ConexionPG,
         cursor_factory=RealDictCursor
     )
 
+
+def conexion_dedicada():
+    """Conexión física fuera del pool, para hilos de fondo (p. ej. LISTEN); quien la abre la cierra"""
+    return psycopg2.connect(**_parametros_conexion())
+
+
+class _EntradaPool:
+    """Conexión física administrada por el pool"""
+    __slots__ = ('conn', 'ultimo_uso')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ultimo_uso = time.monotonic()
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones PostgreSQL con límite mínimo/máximo,
+    verificación de salud y cierre de conexiones ociosas.
+    Cada proceso (worker) crea el suyo; ver obtener_pool().
+    """
+
+    def __init__(self, minimo, maximo, espera=POOL_ESPERA, inactividad=POOL_INACTIVIDAD,
+                 verificacion=POOL_VERIFICACION, solo_lectura=False, **parametros):
+        self.minimo = minimo
+        self.solo_lectura = solo_lectura
+        self.maximo = max(maximo, minimo, 1)
+        self.espera = espera
+        self.inactividad = inactividad
+        self.verificacion = verificacion
+        self.parametros = parametros
+        self.pid = os.getpid()
+        self._libres = []  # pila LIFO: las más recientes arriba, las ociosas al fondo
+        self._en_uso = 0
+        self._condicion = threading.Condition()
+
+    def _conectar(self):
+        conn = psycopg2.connect(**self.parametros)
+        if self.solo_lectura:
+            conn.readonly = True
+        return _EntradaPool(conn)
+
+    def _cerrar(self, entrada):
+        try:
+            entrada.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _sana(self, entrada):
+        """Verifica la conexión si estuvo ociosa más de `verificacion` segundos"""
+        conn = entrada.conn
+        if conn.closed:
+            return False
+        if time.monotonic() - entrada.ultimo_uso < self.verificacion:
+            return True
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.autocommit = False
+            return True
+        except psycopg2.Error:
+            return False
+
+    def obtener(self):
+        """Obtener una conexión; espera hasta `espera` segundos si el pool está lleno"""
+        limite = time.monotonic() + self.espera
+        with self._condicion:
+            while not self._libres and self._en_uso >= self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise PoolAgotado(f"Sin conexiones libres en el pool (máximo {self.maximo})")
+                self._condicion.wait(restante)
+            entrada = self._libres.pop() if self._libres else None
+            self._en_uso += 1
+
+        if entrada is not None and not self._sana(entrada):
+            self._cerrar(entrada)
+            entrada = None
+
+        if entrada is None:
+            try:
+                entrada = self._conectar()
+            except Exception:
+                with self._condicion:
+                    self._en_uso -= 1
+                    self._condicion.notify()
+                raise
+        return entrada
+
+    def devolver(self, entrada):
+        """Regresar una conexión al pool, descartando transacciones abiertas"""
+        conn = entrada.conn
+        if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._cerrar(entrada)
+
+        ahora = time.monotonic()
+        with self._condicion:
+            self._en_uso -= 1
+            if not conn.closed:
+                entrada.ultimo_uso = ahora
+                self._libres.append(entrada)
+            self._reciclar_ociosas(ahora)
+            self._condicion.notify()
+
+    def _reciclar_ociosas(self, ahora):
+        # Se cierran desde el fondo de la pila, respetando el mínimo configurado
+        while (len(self._libres) + self._en_uso > self.minimo and self._libres
+               and ahora - self._libres[0].ultimo_uso > self.inactividad):
+            self._cerrar(self._libres.pop(0))
+
+    def cerrar_todo(self):
+        with self._condicion:
+            while self._libres:
+                self._cerrar(self._libres.pop())
+
+
+PRIMARIA = 'primaria'
+REPLICA = 'replica'
+
+_pools = {}
+_pool_lock = threading.Lock()
+# Conexiones heredadas del proceso padre: se conservan sin cerrar para no
+# terminar las sesiones del padre al recolectarse en el hijo.
+_pools_heredados = []
+
+
+def obtener_pool(destino=PRIMARIA):
+    """Pool del proceso actual; se recrea tras un fork (un pool por worker)"""
+    pool = _pools.get(destino)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        pool = _pools.get(destino)
+        if pool is not None and pool.pid != os.getpid():
+            _pools_heredados.append(pool)
+            pool = None
+        if pool is None:
+            if destino == REPLICA:
+                pool = PoolConexiones(POOL_MIN, POOL_MAX, solo_lectura=True, **_parametros_replica())
+            else:
+                pool = PoolConexiones(POOL_MIN, POOL_MAX, **_parametros_conexion())
+            _pools[destino] = pool
+        return pool
+
+
+# ===== INSTRUMENTACIÓN SQL =====
+
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_RE_EJECUTAR = re.compile(r'^(?:PREPARE \w+ AS .*; )?EXECUTE (\w+)', re.S)
+
+_metricas_lock = threading.Lock()
+_metricas_rutas = {}
+_metricas_sentencias = {}
+_alertas_n_mas_uno = {}
+_colectores = ContextVar('colectores_sql', default=())
+
+
+def normalizar_sql(sql):
+    """Texto de la sentencia sin espacios extra ni literales; EXECUTE se agrupa por nombre"""
+    if not isinstance(sql, str):
+        sql = sql.decode() if isinstance(sql, bytes) else str(sql)
+    sql = _RE_ESPACIOS.sub(' ', sql).strip()
+    ejecutada = _RE_EJECUTAR.match(sql)
+    if ejecutada:
+        return f"EXECUTE {ejecutada.group(1)}"
+    return _RE_LITERALES.sub('?', sql)
+
+
+def _funcion_llamadora():
+    """Primera función de models/ (fuera de este módulo) en la pila; si no hay, la primera fuera de aquí"""
+    frame = sys._getframe(3)
+    primera = None
+    while frame is not None:
+        modulo = frame.f_globals.get('__name__', '')
+        if modulo != __name__ and not modulo.startswith(('psycopg2', 'contextlib')):
+            origen = f"{modulo}.{frame.f_code.co_name}"
+            if modulo.startswith('models.'):
+                return origen
+            primera = primera or origen
+        frame = frame.f_back
+    return primera or '?'
+
+
+def _anotar_sentencia(sql, duracion, filas):
+    registro = (normalizar_sql(sql), duracion, filas, _funcion_llamadora())
+    if has_app_context():
+        g.setdefault('_sentencias_sql', []).append(registro)
+    for colector in _colectores.get():
+        colector.append(registro)
+
+
+class CursorInstrumentado:
+    """
+    Cursor que mide cada sentencia: texto normalizado, duración, filas y función
+    de models/ que la emitió. Si recibe un circuito le reporta cada resultado.
+    """
+
+    def __init__(self, cursor, circuito=None, lento=None):
+        self._cursor = cursor
+        self._circuito = circuito
+        self._lento = lento
+
+    def execute(self, sql, params=None):
+        return self._medir(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, params_lista):
+        return self._medir(self._cursor.executemany, sql, params_lista)
+
+    def _medir(self, metodo, sql, params):
+        if self._circuito is not None:
+            self._circuito.permitir()
+        fallo = False
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, params)
+        except psycopg2.extensions.TransactionRollbackError:
+            # Serialización o deadlock: la BD respondió de inmediato; quien llama reintenta
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Timeouts, bloqueos y conexiones caídas; los errores de datos no cuentan
+            fallo = True
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            _anotar_sentencia(sql, duracion, self._cursor.rowcount)
+            if self._circuito is not None:
+                self._circuito.registrar(fallo or (self._lento is not None and duracion > self._lento))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # itersize, arraysize, etc. van al cursor real
+        if nombre.startswith('_'):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._cursor, nombre, valor)
+
+
+def acumular_metricas_peticion(exc=None):
+    """Agregar las sentencias de la petición por ruta y por sentencia, y detectar patrones N+1"""
+    sentencias = g.pop('_sentencias_sql', None)
+    if not sentencias:
+        return
+    ruta = request.endpoint or request.path
+    total = sum(duracion for _, duracion, _, _ in sentencias)
+
+    repeticiones = {}
+    for sql, _, _, origen in sentencias:
+        repeticiones[(sql, origen)] = repeticiones.get((sql, origen), 0) + 1
+    n_mas_uno = [(clave, veces) for clave, veces in repeticiones.items() if veces >= UMBRAL_N_MAS_UNO]
+
+    with _metricas_lock:
+        m = _metricas_rutas.setdefault(ruta, {'peticiones': 0, 'consultas': 0, 'max_consultas': 0,
+                                             'tiempo_total_ms': 0.0, 'max_tiempo_ms': 0.0})
+        m['peticiones'] += 1
+        m['consultas'] += len(sentencias)
+        m['max_consultas'] = max(m['max_consultas'], len(sentencias))
+        m['tiempo_total_ms'] += total * 1000
+        m['max_tiempo_ms'] = max(m['max_tiempo_ms'], total * 1000)
+
+        for sql, duracion, filas, origen in sentencias:
+            e = _metricas_sentencias.get(sql)
+            if e is None:
+                if len(_metricas_sentencias) >= MAX_SENTENCIAS_METRICAS:
+                    continue
+                e = _metricas_sentencias[sql] = {'llamadas': 0, 'tiempo_total_ms': 0.0, 'max_ms': 0.0,
+                                                 'filas': 0, 'origenes': set()}
+            e['llamadas'] += 1
+            e['tiempo_total_ms'] += duracion * 1000
+            e['max_ms'] = max(e['max_ms'], duracion * 1000)
+            e['filas'] += max(filas, 0)
+            e['origenes'].add(origen)
+
+        for (sql, origen), veces in n_mas_uno:
+            clave = (ruta, origen, sql)
+            a = _alertas_n_mas_uno.setdefault(clave, {'peticiones': 0, 'max_repeticiones': 0})
+            a['peticiones'] += 1
+            a['max_repeticiones'] = max(a['max_repeticiones'], veces)
+
+    for (sql, origen), veces in n_mas_uno:
+        print(f"⚠️ Posible N+1 en {ruta}: {origen} ejecutó {veces} veces: {sql[:120]}")
+
+
+def _sql_legible(sql):
+    """Para EXECUTE de una consulta registrada se muestra su SQL"""
+    if sql.startswith('EXECUTE '):
+        definicion = _consultas.get(sql[len('EXECUTE '):])
+        if definicion:
+            return f"{sql}: {normalizar_sql(definicion[0])}"
+    return sql
+
+
+def obtener_metricas_sql():
+    """Agregados del proceso actual (cada worker lleva los suyos)"""
+    with _metricas_lock:
+        sentencias = sorted(_metricas_sentencias.items(), key=lambda kv: kv[1]['tiempo_total_ms'], reverse=True)
+        metricas = {
+            'pid': os.getpid(),
+            'rutas': {
+                ruta: dict(m, promedio_consultas=round(m['consultas'] / m['peticiones'], 2),
+                           promedio_ms=round(m['tiempo_total_ms'] / m['peticiones'], 2))
+                for ruta, m in _metricas_rutas.items()
+            },
+            'sentencias': [
+                dict(e, sql=_sql_legible(sql), origenes=sorted(e['origenes']),
+                     promedio_ms=round(e['tiempo_total_ms'] / e['llamadas'], 3))
+                for sql, e in sentencias
+            ],
+            'n_mas_uno': [
+                dict(a, ruta=ruta, origen=origen, sql=sql)
+                for (ruta, origen, sql), a in _alertas_n_mas_uno.items()
+            ],
+            'circuito': _circuito.resumen(),
+        }
+    metricas['reintentos'] = _resumen_reintentos()
+    return metricas
+
+
+@contextmanager
+def presupuesto_consultas(maximo):
+    """
+    Afirmar que el bloque no ejecuta más de `maximo` sentencias SQL.
+    Pensado para pruebas:
+        with presupuesto_consultas(3):
+            client.get('/panel-tutor')
+    """
+    sentencias = []
+    token = _colectores.set(_colectores.get() + (sentencias,))
+    try:
+        yield sentencias
+    finally:
+        _colectores.reset(token)
+    if len(sentencias) > maximo:
+        detalle = '\n'.join(f"  {origen}: {sql[:100]}" for sql, _, _, origen in sentencias)
+        raise AssertionError(f"Se ejecutaron {len(sentencias)} sentencias SQL (presupuesto: {maximo}):\n{detalle}")
+
+
+# ===== LÍMITES DE TIEMPO Y CIRCUIT BREAKER =====
+
+def presupuesto_bd(clase):
+    """
+    Decorador de rutas: clase de límites de tiempo para las sentencias de la
+    petición ('ajax', 'normal', 'reporte' o 'lote' para comandos de
+    mantenimiento, ver LIMITES_BD).
+
+    Uso:
+        @inscripcion_bp.route("/verificar-elegibilidad/...")
+        @presupuesto_bd('ajax')
+        def verificar_elegibilidad(...):
+    """
+    if clase not in LIMITES_BD:
+        raise ValueError(f"Clase de presupuesto desconocida: {clase}")
+
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            if has_app_context():
+                g._presupuesto_bd = clase
+            return f(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def clase_presupuesto():
+    if has_app_context():
+        return g.get('_presupuesto_bd', 'normal')
+    return 'normal'
+
+
+def _aplicar_limites(conn):
+    """Ajustar statement_timeout/lock_timeout de la conexión física a la clase de la ruta actual"""
+    limites = LIMITES_BD[clase_presupuesto()]
+    if conn.limites == limites:
+        return limites
+    estado = conn.info.transaction_status
+    if estado == TRANSACTION_STATUS_INERROR:
+        return conn.limites or limites
+    sql = "SET statement_timeout = %s; SET lock_timeout = %s"
+    with conn.cursor() as cursor:
+        if estado == TRANSACTION_STATUS_IDLE:
+            conn.autocommit = True
+            try:
+                cursor.execute(sql, limites)
+            finally:
+                conn.autocommit = False
+            conn.limites_provisionales = False
+        else:
+            # A media transacción: si se revierte, ConexionPG olvida estos límites
+            cursor.execute(sql, limites)
+            conn.limites_provisionales = True
+    conn.limites = limites
+    return limites
+
+
+class CircuitoBD:
+    """
+    Circuit breaker por proceso. Cuenta como fallo los errores operacionales
+    (timeouts, bloqueos, conexión caída) y las sentencias que rozan su
+    statement_timeout. Con suficientes fallos en la ventana se abre: las
+    peticiones fallan de inmediato durante el enfriamiento; después pasa una
+    sola sentencia de prueba que decide si se cierra o se vuelve a abrir.
+    """
+    CERRADO = 'cerrado'
+    ABIERTO = 'abierto'
+    SEMIABIERTO = 'semiabierto'
+
+    def __init__(self, ventana, minimo, proporcion, enfriamiento):
+        self.minimo = minimo
+        self.proporcion = proporcion
+        self.enfriamiento = enfriamiento
+        self.estado = self.CERRADO
+        self.aperturas = 0
+        self._resultados = deque(maxlen=ventana)
+        self._abierto_hasta = 0.0
+        self._sonda = False
+        self._lock = threading.Lock()
+
+    def _rechazar(self):
+        restante = max(0.0, self._abierto_hasta - time.monotonic())
+        raise BaseDatosNoDisponible(f"Base de datos no disponible (reintento en {restante:.0f}s)")
+
+    def verificar(self):
+        """Antes de pedir una conexión: falla rápido si está abierto (no consume la sonda)"""
+        if self.estado == self.ABIERTO and time.monotonic() < self._abierto_hasta:
+            self._rechazar()
+
+    def permitir(self):
+        """Antes de cada sentencia; en semiabierto solo deja pasar una sonda a la vez"""
+        if self.estado == self.CERRADO:
+            return
+        with self._lock:
+            if self.estado == self.ABIERTO:
+                if time.monotonic() < self._abierto_hasta:
+                    self._rechazar()
+                self.estado = self.SEMIABIERTO
+                self._sonda = False
+            if self.estado == self.SEMIABIERTO:
+                if self._sonda:
+                    self._rechazar()
+                self._sonda = True
+
+    def registrar(self, fallo):
+        with self._lock:
+            if self.estado == self.SEMIABIERTO:
+                self._sonda = False
+                if fallo:
+                    self._abrir()
+                else:
+                    self.estado = self.CERRADO
+                    self._resultados.clear()
+                    print("✅ Circuito de BD cerrado: la sonda respondió bien")
+                return
+            if self.estado == self.ABIERTO:
+                # Una conexión fallida tras el enfriamiento cuenta como sonda fallida
+                if fallo and time.monotonic() >= self._abierto_hasta:
+                    self._abrir()
+                return
+            self._resultados.append(fallo)
+            total = len(self._resultados)
+            if total >= self.minimo and sum(self._resultados) >= self.proporcion * total:
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = self.ABIERTO
+        self.aperturas += 1
+        self._abierto_hasta = time.monotonic() + self.enfriamiento
+        self._resultados.clear()
+        print(f"🔌 Circuito de BD abierto por {self.enfriamiento:.0f}s (apertura #{self.aperturas})")
+
+    def resumen(self):
+        return {
+            'estado': self.estado,
+            'aperturas': self.aperturas,
+            'fallos_en_ventana': sum(self._resultados),
+            'muestras_en_ventana': len(self._resultados),
+        }
+
+
+_circuito = CircuitoBD(CIRCUITO_VENTANA, CIRCUITO_MINIMO, CIRCUITO_PROPORCION, CIRCUITO_ENFRIAMIENTO)
+
+
+def respuesta_degradada(e):
+    """Manejador de BaseDatosNoDisponible: 503 con página degradada, o JSON en rutas AJAX"""
+    cabeceras = {'Retry-After': str(int(CIRCUITO_ENFRIAMIENTO))}
+    if clase_presupuesto() == 'ajax' or request.is_json:
+        return jsonify({
+            'error': 'servicio_degradado',
+            'mensaje': 'El servicio está saturado, intenta de nuevo en unos segundos'
+        }), 503, cabeceras
+    return render_template('servicio_degradado.html', reintentar=CIRCUITO_ENFRIAMIENTO), 503, cabeceras
+
+
+# ===== FILAS COMPACTAS =====
+
+_clases_registro = {}
+_clases_lock = threading.Lock()
+_API_REGISTRO = frozenset(('get', 'keys', 'values', 'items'))
+
+
+class Registro(tuple):
+    """
+    Fila inmutable compacta: una tupla con los valores y una clase compartida
+    por todas las filas con las mismas columnas. Se lee como fila.nombre o
+    fila['nombre'] (plantillas y rutas) sin guardar un dict por fila.
+    """
+    __slots__ = ()
+    _columnas = ()
+    _indices = {}
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            try:
+                clave = self._indices[clave]
+            except KeyError:
+                raise KeyError(clave) from None
+        return tuple.__getitem__(self, clave)
+
+    def get(self, clave, defecto=None):
+        indice = self._indices.get(clave)
+        return defecto if indice is None else tuple.__getitem__(self, indice)
+
+    def keys(self):
+        return self._columnas
+
+    def values(self):
+        return tuple(tuple.__iter__(self))
+
+    def items(self):
+        return zip(self._columnas, tuple.__iter__(self))
+
+    def __contains__(self, clave):
+        return clave in self._indices
+
+    def __iter__(self):
+        # Como un dict: iterar da los nombres de columna (dict(fila) funciona)
+        return iter(self._columnas)
+
+    def como_dict(self):
+        return dict(zip(self._columnas, tuple.__iter__(self)))
+
+    def __repr__(self):
+        campos = ', '.join(f'{k}={v!r}' for k, v in self.items())
+        return f'Registro({campos})'
+
+    def __reduce__(self):
+        return (_reconstruir_registro, (self._columnas, tuple(tuple.__iter__(self))))
+
+
+def clase_registro(columnas):
+    """Clase Registro para un conjunto de columnas; se crea una sola vez por forma de consulta"""
+    clase = _clases_registro.get(columnas)
+    if clase is None:
+        with _clases_lock:
+            clase = _clases_registro.get(columnas)
+            if clase is None:
+                atributos = {
+                    '__slots__': (),
+                    '_columnas': columnas,
+                    '_indices': {nombre: i for i, nombre in enumerate(columnas)},
+                }
+                for i, nombre in enumerate(columnas):
+                    if nombre.isidentifier() and not nombre.startswith('_') and nombre not in _API_REGISTRO:
+                        atributos[nombre] = property(itemgetter(i))
+                clase = type('Registro', (Registro,), atributos)
+                _clases_registro[columnas] = clase
+    return clase
+
+
+def _reconstruir_registro(columnas, valores):
+    return tuple.__new__(clase_registro(columnas), valores)
+
+
+class RegistroCursor(psycopg2.extensions.cursor):
+    """Cursor que entrega filas Registro en lugar de RealDictRow (para listados grandes)"""
+
+    _clase = None
+
+    def execute(self, sql, params=None):
+        self._clase = None
+        return super().execute(sql, params)
+
+    def executemany(self, sql, params_lista):
+        self._clase = None
+        return super().executemany(sql, params_lista)
+
+    def _clase_actual(self):
+        if self._clase is None:
+            self._clase = clase_registro(tuple(d[0] for d in self.description))
+        return self._clase
+
+    def fetchone(self):
+        fila = super().fetchone()
+        return None if fila is None else tuple.__new__(self._clase_actual(), fila)
+
+    def fetchmany(self, size=None):
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        if not filas:
+            return []
+        clase = self._clase_actual()
+        return [tuple.__new__(clase, fila) for fila in filas]
+
+    def fetchall(self):
+        filas = super().fetchall()
+        if not filas:
+            return []
+        clase = self._clase_actual()
+        return [tuple.__new__(clase, fila) for fila in filas]
+
+    def __iter__(self):
+        # super().__iter__() devuelve este mismo cursor: se avanza con __next__
+        # de psycopg2 (en cursores con nombre hace FETCH de itersize filas).
+        # En cursores con nombre description llega hasta la primera fila.
+        siguiente = super().__next__
+        clase = None
+        while True:
+            try:
+                fila = siguiente()
+            except StopIteration:
+                return
+            if clase is None:
+                clase = self._clase_actual()
+            yield tuple.__new__(clase, fila)
+
+
+class ConexionBD:
+    """
+    Conexión obtenida del pool con la misma interfaz que usan los modelos.
+    close() la regresa al pool; si es la conexión compartida de la petición
+    la conserva hasta el teardown, pero al soltarla el último modelo que la
+    pidió termina la transacción de lectura abierta: si no, el snapshot y los
+    candados AccessShare duran toda la respuesta (en streaming, toda la
+    transferencia). Dentro de una unidad de trabajo commit/rollback/close se
+    difieren hasta que termina la unidad.
+    """
+
+    def __init__(self, entrada, pool, compartida=False, destino=PRIMARIA):
+        self._entrada = entrada
+        self._pool = pool
+        self.compartida = compartida
+        self.usos = 0       # get_connection() sin close() sobre la compartida (modelos anidados)
+        self.destino = destino
+        self.en_unidad = False
+        self.solo_rollback = False
+        self.al_confirmar = []
+        self.al_revertir = []
+
+    @property
+    def closed(self):
+        return self._entrada is None or self._entrada.conn.closed
+
+    def cursor(self, *args, **kwargs):
+        conn = self._entrada.conn
+        statement_timeout, _ = _aplicar_limites(conn)
+        if self.destino != PRIMARIA:
+            return CursorInstrumentado(conn.cursor(*args, **kwargs))
+        lento = statement_timeout * CIRCUITO_LENTO / 1000 if statement_timeout else None
+        return CursorInstrumentado(conn.cursor(*args, **kwargs), _circuito, lento)
+
+    def commit(self):
+        if self.en_unidad:
+            return
+        self._entrada.conn.commit()
+        _registrar_escritura()
+
+    def rollback(self):
+        if self.en_unidad:
+            # La transacción completa se revierte al terminar la unidad
+            self.solo_rollback = True
+            return
+        self._entrada.conn.rollback()
+
+    def close(self):
+        if self._entrada is None or self.en_unidad:
+            return
+        if self.compartida:
+            self.usos = max(0, self.usos - 1)
+            conn = self._entrada.conn
+            if conn.closed:
+                return
+            estado = conn.info.transaction_status
+            # Un modelo que escribió ya confirmó; lo abierto aquí es lectura o un
+            # error. Con otro modelo aún usándola (anidado) no se toca su transacción
+            if estado == TRANSACTION_STATUS_INERROR or (self.usos == 0 and estado != TRANSACTION_STATUS_IDLE):
+                conn.rollback()
+        else:
+            self.liberar()
+
+    def liberar(self):
+        if self._entrada is not None:
+            entrada, self._entrada = self._entrada, None
+            self._pool.devolver(entrada)
+
+    def __getattr__(self, nombre):
+        if self._entrada is None:
+            raise psycopg2.InterfaceError("La conexión ya fue regresada al pool")
+        return getattr(self._entrada.conn, nombre)
+
+
+# ===== CONSULTAS CON NOMBRE (PREPARE/EXECUTE) =====
+
+_consultas = {}
+
+
+def registrar_consulta(nombre, sql):
+    """
+    Declarar una consulta frecuente una sola vez (a nivel de módulo).
+    Se prepara con PREPARE la primera vez que se usa en cada conexión del
+    pool y después se ejecuta con EXECUTE, evitando reanalizar y replanificar.
+    Retorna el nombre para usarlo con ejecutar_consulta().
+    Como siempre se ejecuta con parámetros, un % literal se escribe %%.
+    """
+    total = sql.count('%s')
+    partes = sql.split('%s')
+    posicional = partes[0] + ''.join(f"${i}{parte}" for i, parte in enumerate(partes[1:], start=1))
+    definicion = (sql, posicional, total)
+    if _consultas.get(nombre, definicion) != definicion:
+        raise ValueError(f"La consulta '{nombre}' ya fue registrada con otro SQL")
+    _consultas[nombre] = definicion
+    return nombre
+
+
+def ejecutar_consulta(cursor, nombre, params=()):
+    """Ejecutar una consulta registrada; usa el SQL normal si las preparadas están desactivadas"""
+    sql, posicional, total = _consultas[nombre]
+    params = tuple(params)
+    conn = cursor.connection
+    preparadas = getattr(conn, 'preparadas', None)
+    if not USAR_PREPARADAS or preparadas is None:
+        cursor.execute(sql, params)
+        return cursor
+
+    # Si un PREPARE + EXECUTE anterior falló no se sabe si el PREPARE quedó
+    if nombre in conn.dudosas:
+        cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (nombre,))
+        if cursor.fetchone():
+            preparadas.add(nombre)
+        conn.dudosas.discard(nombre)
+
+    ejecutar = f"EXECUTE {nombre} ({', '.join(['%s'] * total)})" if total else f"EXECUTE {nombre}"
+    if nombre in preparadas:
+        cursor.execute(ejecutar, params)
+        return cursor
+
+    # PREPARE y primer EXECUTE en un solo viaje al servidor
+    try:
+        cursor.execute(f"PREPARE {nombre} AS {posicional}; {ejecutar}", params)
+    except psycopg2.Error:
+        conn.dudosas.add(nombre)
+        raise
+    preparadas.add(nombre)
+    return cursor
+
+
+# ===== RUTEO A LA RÉPLICA DE LECTURA =====
+
+_lectura_replica = ContextVar('lectura_replica', default=False)
+
+
+def lectura_en_replica(f):
+    """
+    Declarar una función de models/ como de solo lectura y tolerante al
+    retraso de replicación: sus consultas pueden atenderse desde la réplica
+    (DB_REPLICA_DSN). Sin réplica configurada no cambia nada.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = _lectura_replica.set(True)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _lectura_replica.reset(token)
+    return decorated_function
+
+
+@contextmanager
+def leer_de_primaria():
+    """Forzar la primaria dentro del bloque aunque se llame desde una función @lectura_en_replica"""
+    token = _lectura_replica.set(False)
+    try:
+        yield
+    finally:
+        _lectura_replica.reset(token)
+
+
+def _registrar_escritura():
+    """Recordar en la sesión el último commit para leer lo propio desde la primaria"""
+    if REPLICA_DSN and has_request_context():
+        session['_bd_escritura'] = time.time()
+
+
+def _usar_replica():
+    if not REPLICA_DSN or not _lectura_replica.get():
+        return False
+    if has_request_context():
+        ultima = session.get('_bd_escritura')
+        if ultima and time.time() - ultima < REPLICA_VENTANA:
+            return False
+    return True
+
+
+_replica_caida_hasta = 0.0
+
+
+def _nueva_conexion(destino, compartida):
+    """Conexión del pool indicado; si la réplica no responde se lee de la primaria"""
+    global _replica_caida_hasta
+    if destino == REPLICA:
+        if time.monotonic() >= _replica_caida_hasta:
+            try:
+                pool = obtener_pool(REPLICA)
+                return ConexionBD(pool.obtener(), pool, compartida=compartida, destino=REPLICA)
+            except psycopg2.OperationalError as e:
+                _replica_caida_hasta = time.monotonic() + 30
+                print(f"⚠️ Réplica no disponible, leyendo de la primaria: {e}")
+        if compartida:
+            primaria = g.get(f'_conexion_{PRIMARIA}')
+            if primaria is not None and not primaria.closed:
+                return primaria
+    _circuito.verificar()
+    pool = obtener_pool(PRIMARIA)
+    try:
+        entrada = pool.obtener()
+    except psycopg2.OperationalError:
+        # No conectar (o pool agotado) también alimenta al circuito
+        _circuito.registrar(True)
+        raise
+    return ConexionBD(entrada, pool, compartida=compartida)
+
+
+_unidad_actual = ContextVar('unidad_de_trabajo', default=None)
+
+
+def get_connection():
+    """
+    Obtener una conexión del pool.
+    Dentro de una petición Flask todas las llamadas comparten la misma conexión
+    (guardada en `g`), que se regresa al pool en el teardown.
+    Dentro de unidad_de_trabajo() se entrega la conexión de la unidad.
+    Las funciones marcadas con @lectura_en_replica usan la réplica salvo que
+    la sesión haya escrito hace menos de DB_REPLICA_STICKY_SECONDS.
+    """
+    conn = _unidad_actual.get()
+    if conn is not None and not conn.closed:
+        return conn
+
+    destino = PRIMARIA
+    if _usar_replica():
+        destino = REPLICA
+
+    if has_app_context():
+        conn = g.get(f'_conexion_{destino}')
+        if conn is None or conn.closed:
+            conn = _nueva_conexion(destino, compartida=True)
+            setattr(g, f'_conexion_{conn.destino}', conn)
+        conn.usos += 1
+        return conn
+
+    return _nueva_conexion(destino, compartida=False)
+
+
+@contextmanager
+def unidad_de_trabajo():
+    """
+    Transacción que abarca varias llamadas a models/.
+    Las funciones de los modelos se unen automáticamente: sus commit() se
+    difieren y un rollback() marca la unidad para revertirse. Al salir se
+    hace un único COMMIT, o ROLLBACK si hubo excepción o algún modelo falló.
+    Las unidades anidadas se unen a la exterior.
+
+    Uso:
+        with unidad_de_trabajo():
+            usuario_id = registrar_usuario(...)
+            registrar_tutor(usuario_id, ...)
+    """
+    conn = _unidad_actual.get()
+    if conn is not None and not conn.closed:
+        yield conn
+        return
+
+    conn = get_connection()
+    if conn.info.transaction_status == TRANSACTION_STATUS_INERROR:
+        conn.rollback()
+    conn.en_unidad = True
+    conn.solo_rollback = False
+    token = _unidad_actual.set(conn)
+    confirmar = False
+    confirmada = False
+    try:
+        yield conn
+        confirmar = True
+    finally:
+        _unidad_actual.reset(token)
+        conn.en_unidad = False
+        try:
+            if conn.closed:
+                pass
+            elif not confirmar or conn.solo_rollback:
+                conn.rollback()
+            elif conn.info.transaction_status == TRANSACTION_STATUS_INERROR:
+                conn.rollback()
+                raise TransaccionAbortada("La unidad de trabajo se revirtió por un error previo")
+            else:
+                conn.commit()
+                confirmada = True
+                for accion in conn.al_confirmar:
+                    accion()
+        finally:
+            if not confirmada:
+                for accion in conn.al_revertir:
+                    try:
+                        accion()
+                    except Exception as e:
+                        print(f"⚠️ Error al deshacer efecto de la unidad de trabajo: {e}")
+            conn.solo_rollback = False
+            conn.al_confirmar = []
+            conn.al_revertir = []
+            conn.close()
+
+
+def al_confirmar(accion):
+    """
+    Ejecutar `accion` cuando los datos escritos ya sean visibles para otros:
+    al hacer COMMIT la unidad de trabajo en curso, o de inmediato fuera de una
+    (el modelo la llama después de su propio commit). Si la unidad se revierte
+    la acción se descarta. Pensado para invalidar caches.
+    """
+    conn = _unidad_actual.get()
+    if conn is not None and conn.en_unidad and not conn.closed:
+        conn.al_confirmar.append(accion)
+    else:
+        accion()
+
+
+def al_revertir(accion):
+    """
+    Ejecutar `accion` si la unidad de trabajo en curso no llega a confirmarse
+    (ROLLBACK, TransaccionAbortada o COMMIT fallido); se descarta si confirma.
+    Pensado para deshacer efectos fuera de la BD, como archivos ya escritos.
+    Fuera de una unidad no hace nada: el modelo maneja su propia transacción.
+    """
+    conn = _unidad_actual.get()
+    if conn is not None and conn.en_unidad and not conn.closed:
+        conn.al_revertir.append(accion)
+
+
+# ===== REINTENTOS ANTE CONFLICTOS DE CONCURRENCIA =====
+
+ERRORES_CONFLICTO = (errors.SerializationFailure, errors.DeadlockDetected, errors.LockNotAvailable)
+
+_metricas_reintentos = {}
+
+
+def _anotar_reintento(nombre, campo, segundos=None):
+    with _metricas_lock:
+        m = _metricas_reintentos.get(nombre)
+        if m is None:
+            m = _metricas_reintentos[nombre] = {
+                'llamadas': 0, 'completadas': 0, 'conflictos': 0, 'agotadas': 0,
+                'tiempo_total_ms': 0.0, 'recientes': deque(),
+            }
+        m[campo] += 1
+        if segundos is not None:
+            ahora = time.monotonic()
+            m['tiempo_total_ms'] += segundos * 1000
+            m['recientes'].append(ahora)
+            while m['recientes'] and ahora - m['recientes'][0] > VENTANA_RENDIMIENTO:
+                m['recientes'].popleft()
+
+
+def _resumen_reintentos():
+    ahora = time.monotonic()
+    with _metricas_lock:
+        resumen = {}
+        for nombre, m in _metricas_reintentos.items():
+            recientes = sum(1 for t in m['recientes'] if ahora - t <= VENTANA_RENDIMIENTO)
+            resumen[nombre] = {
+                'llamadas': m['llamadas'],
+                'completadas': m['completadas'],
+                'conflictos': m['conflictos'],
+                'agotadas': m['agotadas'],
+                'promedio_ms': round(m['tiempo_total_ms'] / m['completadas'], 2) if m['completadas'] else None,
+                'por_segundo': round(recientes / VENTANA_RENDIMIENTO, 2),
+            }
+        return resumen
+
+
+def reintentar_conflictos(f):
+    """
+    Repetir una función de models/ cuando su transacción choca con otra
+    (serialización, deadlock o lock_timeout), con espera exponencial y
+    jitter. La función hace su propio rollback y deja propagar el error de
+    conflicto; si se agotan los intentos el error llega a quien la llamó.
+    Dentro de unidad_de_trabajo no se reintenta: la transacción es de la unidad.
+    Las llamadas, conflictos y completadas por segundo se ven en /admin/metricas-sql.
+    """
+    nombre = f"{f.__module__}.{f.__name__}"
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        _anotar_reintento(nombre, 'llamadas')
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            try:
+                resultado = f(*args, **kwargs)
+            except ERRORES_CONFLICTO as e:
+                _anotar_reintento(nombre, 'conflictos')
+                conn = _unidad_actual.get()
+                intento += 1
+                if (conn is not None and conn.en_unidad) or intento >= REINTENTOS_CONFLICTO:
+                    _anotar_reintento(nombre, 'agotadas')
+                    raise
+                espera = min(REINTENTO_ESPERA_MAX, REINTENTO_ESPERA_BASE * 2 ** (intento - 1))
+                print(f"🔁 {f.__name__}: conflicto ({type(e).__name__}), intento {intento + 1} tras esperar hasta {espera * 1000:.0f} ms")
+                time.sleep(random.uniform(0, espera))
+                continue
+            _anotar_reintento(nombre, 'completadas', time.monotonic() - inicio)
+            return resultado
+    return decorated_function
+
+
+# ===== RECORRIDOS CON CURSOR DEL LADO DEL SERVIDOR =====
+
+_recorridos = itertools.count(1)
+
+
+def recorrer_consulta(sql, params=(), itersize=None):
+    """
+    Iterar el resultado de una consulta grande con un cursor con nombre: el
+    servidor entrega `itersize` filas por viaje y la memoria del worker no
+    crece con el total. Las filas llegan como Registro.
+
+    Usa una conexión propia del pool, no la compartida de la petición: el
+    recorrido puede seguir después de que la vista regresó (respuestas en
+    streaming). La conexión vuelve al pool al agotar, cerrar o abandonar el
+    generador. Primaria o réplica se decide al llamar, así que respeta
+    @lectura_en_replica de la función de models/ que lo llama.
+    """
+    destino = REPLICA if _usar_replica() else PRIMARIA
+    return _recorrer(sql, tuple(params), itersize or RECORRIDO_ITERSIZE, destino)
+
+
+def _recorrer(sql, params, itersize, destino):
+    conn = _nueva_conexion(destino, compartida=False)
+    try:
+        cursor = conn.cursor(name=f'recorrido_{next(_recorridos)}', cursor_factory=RegistroCursor)
+        cursor.itersize = itersize
+        cursor.execute(sql, params)
+        yield from cursor
+    finally:
+        conn.close()
+
+
+def cerrar_conexion_peticion(exc=None):
+    """Regresar al pool las conexiones compartidas de la petición"""
+    for destino in (PRIMARIA, REPLICA):
+        conn = g.pop(f'_conexion_{destino}', None)
+        if conn is not None:
+            conn.liberar()
+
+
+def init_app(app):
+    """Registrar el ciclo de vida de la conexión por petición, la instrumentación SQL y la página degradada"""
+    app.teardown_request(acumular_metricas_peticion)
+    app.teardown_appcontext(cerrar_conexion_peticion)
+    app.register_error_handler(BaseDatosNoDisponible, respuesta_degradada)
@@ -1,7 +1,22 @@
-from models.database import get_connection
+from models.database import get_connection, registrar_consulta, ejecutar_consulta, lectura_en_replica, recorrer_consulta
+from models import catalogo_model
+from models.cargador import cargador, olvidar
 from psycopg2 import DatabaseError
+from psycopg2.extras import execute_values
 from datetime import datetime
 
+DOCUMENTOS_DE_ALUMNOS = registrar_consulta('documentos_de_alumnos', """
+    SELECT alumno_id, tipo_doc_id, documento_id, status, fecha_subida, observaciones
+    FROM documento_alumno
+    WHERE alumno_id = ANY(%s)
+""")
+
+PROGRESO_DE_ALUMNOS = registrar_consulta('progreso_de_alumnos', """
+    SELECT alumno_id, requeridos, subidos, validados, mascara_entregados, mascara_validados
+    FROM progreso_documentos
+    WHERE alumno_id = ANY(%s)
+""")
+
 # 📄 Registrar documento entregado por alumno
 def registrar_documento(alumno_id, tipo_doc_id, fecha_entrega, observaciones, archivo_url=None, uploaded_by=None):
     """Registrar documento de alumno - retorna documento_id o None"""
@@ -27,6 +42,8 @@ def registrar_documento(alumno_id, tipo_doc_id, fecha_entrega, observaciones, ar
         
         documento_id = resultado['documento_id']
         conn.commit()
+        olvidar(obtener_checklist_documental_many, alumno_id)
+        olvidar(obtener_progreso_documentos_many, alumno_id)
         
         print(f"✅ Documento registrado exitosamente con ID: {documento_id}")
         return documento_id
@@ -40,9 +57,52 @@ def registrar_documento(alumno_id, tipo_doc_id, fecha_entrega, observaciones, ar
         if conn:
             conn.close()
 
+# 📦 Registrar varios documentos de un alumno en una sola sentencia
+def registrar_documentos_lote(alumno_id, documentos, uploaded_by=None):
+    """
+    Registrar (o reemplazar) documentos con archivo ya guardado - retorna cuántos o None.
+    documentos: lista de (tipo_doc_id, archivo_url, nombre_archivo, mime_type)
+    """
+    if not documentos:
+        return 0
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO documento_alumno (
+                alumno_id, tipo_doc_id, archivo_url,
+                nombre_archivo, mime_type, uploaded_by, status
+            )
+            VALUES %s
+            ON CONFLICT (alumno_id, tipo_doc_id)
+            DO UPDATE SET
+                archivo_url = EXCLUDED.archivo_url,
+                nombre_archivo = EXCLUDED.nombre_archivo,
+                mime_type = EXCLUDED.mime_type,
+                fecha_subida = NOW()
+        """, [
+            (alumno_id, tipo_doc_id, archivo_url, nombre_archivo, mime_type, uploaded_by)
+            for tipo_doc_id, archivo_url, nombre_archivo, mime_type in documentos
+        ], template="(%s, %s, %s, %s, %s, %s, 'pendiente')")
+        conn.commit()
+        olvidar(obtener_checklist_documental_many, alumno_id)
+        olvidar(obtener_progreso_documentos_many, alumno_id)
+        return len(documentos)
+    except DatabaseError as e:
+        print(f"❌ Error al registrar documentos: {type(e).__name__}: {str(e)}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
 # 📂 Obtener todos los documentos entregados por un alumno
+@lectura_en_replica
 def obtener_documentos_por_alumno(alumno_id):
     """Obtener documentos de un alumno - retorna lista de dicts"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -67,11 +127,13 @@ def obtener_documentos_por_alumno(alumno_id):
         print(f"Error al obtener documentos: {str(e)}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 # ✅ Validar si un documento ya fue entregado
 def documento_entregado(alumno_id, tipo_doc_id):
     """Validar si documento fue entregado - retorna True/False"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -86,45 +148,101 @@ def documento_entregado(alumno_id, tipo_doc_id):
         print(f"Error al validar documento: {str(e)}")
         return False
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+# 📋 Obtener checklist documental de varios alumnos (una sola consulta)
+@lectura_en_replica
+def obtener_checklist_documental_many(alumno_ids):
+    """Obtener checklists de varios alumnos - retorna dict alumno_id -> lista de dicts"""
+    alumno_ids = list(dict.fromkeys(alumno_ids))
+    if not alumno_ids:
+        return {}
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, DOCUMENTOS_DE_ALUMNOS, (alumno_ids,))
+        entregados = {(d['alumno_id'], d['tipo_doc_id']): d for d in cursor.fetchall()}
+    except DatabaseError as e:
+        print(f"Error al obtener checklists: {str(e)}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+    # Tipos activos del catálogo en memoria, ya ordenados (requerido DESC, nombre)
+    tipos = catalogo_model.obtener_tipos_documento()
+    checklists = {}
+    for alumno_id in alumno_ids:
+        checklist = []
+        for td in tipos:
+            da = entregados.get((alumno_id, td['tipo_doc_id']))
+            checklist.append({
+                'tipo_doc_id': td['tipo_doc_id'],
+                'codigo': td['codigo'],
+                'tipo_documento': td['nombre'],
+                'descripcion': td['descripcion'],
+                'requerido': td['requerido'],
+                'estado': 'Entregado' if da else 'Pendiente',
+                'status': da['status'] if da else None,
+                'fecha_subida': da['fecha_subida'] if da else None,
+                'observaciones': da['observaciones'] if da else None,
+            })
+        checklists[alumno_id] = checklist
+    return checklists
 
 # 📋 Obtener checklist documental del alumno
 def obtener_checklist_documental(alumno_id):
-    """Obtener checklist documental - retorna lista de dicts"""
+    """Obtener checklist documental - retorna lista de dicts (agrupada con los demás alumnos de la petición)"""
+    return cargador(obtener_checklist_documental_many).cargar(alumno_id) or []
+
+# 📈 Obtener el progreso documental de varios alumnos (tabla progreso_documentos)
+@lectura_en_replica
+def obtener_progreso_documentos_many(alumno_ids):
+    """Obtener progreso de varios alumnos - retorna dict alumno_id -> dict"""
+    alumno_ids = list(dict.fromkeys(alumno_ids))
+    if not alumno_ids:
+        return {}
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                td.tipo_doc_id,
-                td.codigo,
-                td.nombre AS tipo_documento,
-                td.descripcion,
-                td.requerido,
-                CASE WHEN da.documento_id IS NOT NULL THEN 'Entregado' ELSE 'Pendiente' END AS estado,
-                da.status,
-                da.fecha_subida,
-                da.observaciones
-            FROM tipos_documento td
-            LEFT JOIN documento_alumno da ON da.tipo_doc_id = td.tipo_doc_id AND da.alumno_id = %s
-            WHERE td.activo = TRUE
-            ORDER BY td.requerido DESC, td.nombre
-        """, (alumno_id,))
-        checklist = cursor.fetchall()
-        return checklist
+        ejecutar_consulta(cursor, PROGRESO_DE_ALUMNOS, (alumno_ids,))
+        return {p['alumno_id']: p for p in cursor.fetchall()}
     except DatabaseError as e:
-        print(f"Error al obtener checklist: {str(e)}")
-        return []
+        print(f"Error al obtener progreso documental: {str(e)}")
+        return {}
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+# 📈 Obtener el progreso documental del alumno
+def obtener_progreso_documentos(alumno_id):
+    """Obtener requeridos/subidos/validados y máscaras del alumno - retorna dict o None"""
+    return cargador(obtener_progreso_documentos_many).cargar(alumno_id)
+
+# 📊 Obtener resumen documental de varios alumnos
+def resumen_documental_many(alumno_ids):
+    """Obtener resúmenes documentales - retorna dict alumno_id -> resumen"""
+    progresos = cargador(obtener_progreso_documentos_many)
+    alumno_ids = list(alumno_ids)
+    return {
+        alumno_id: _resumir_progreso(progreso)
+        for alumno_id, progreso in zip(alumno_ids, progresos.cargar_varios(alumno_ids))
+    }
 
 # 📊 Obtener resumen documental del alumno
 def resumen_documental(alumno_id):
     """Obtener resumen de documentos entregados vs totales"""
-    checklist = obtener_checklist_documental(alumno_id)
-    
-    entregados = sum(1 for doc in checklist if doc['estado'] == 'Entregado')
-    total = len(checklist)
+    return _resumir_progreso(obtener_progreso_documentos(alumno_id))
+
+def _resumir_progreso(progreso):
+    # Tipos activos del catálogo en memoria contra la máscara de entregados
+    mascara = progreso['mascara_entregados'] if progreso else 0
+    tipos = catalogo_model.obtener_tipos_documento()
+    entregados = sum(1 for td in tipos if mascara >> td['tipo_doc_id'] & 1)
+    total = len(tipos)
     
     return {
         "entregados": entregados, 
@@ -151,6 +269,8 @@ def eliminar_documento(documento_id, usuario_id):
         
         resultado = cursor.fetchone()
         conn.commit()
+        olvidar(obtener_checklist_documental_many)
+        olvidar(obtener_progreso_documentos_many)
         
         if resultado:
             print(f"✅ Documento {documento_id} eliminado exitosamente")
@@ -183,6 +303,7 @@ def actualizar_observaciones_documento(documento_id, observaciones):
         """, (observaciones, documento_id))
         
         conn.commit()
+        olvidar(obtener_checklist_documental_many)
         return True
         
     except DatabaseError as e:
@@ -196,19 +317,42 @@ def actualizar_observaciones_documento(documento_id, observaciones):
 
 # 📋 Obtener tipos de documentos requeridos
 def obtener_tipos_documentos_requeridos():
-    """Obtener lista de documentos requeridos"""
+    """Obtener lista de documentos requeridos (catálogo en memoria)"""
+    return catalogo_model.obtener_tipos_documento()
+
+@lectura_en_replica
+def recorrer_documentos_pendientes(escuela_id=None):
+    """
+    Documentos pendientes de revisar (vista_documentos_pendientes) para
+    exportar, de una escuela o de todas: generador con cursor del lado del servidor
+    """
+    query = "SELECT * FROM vista_documentos_pendientes"
+    params = []
+    if escuela_id:
+        query += " WHERE escuela_id = %s"
+        params.append(escuela_id)
+    query += " ORDER BY escuela_id, alumno_id, tipo_doc_id"
+    return recorrer_consulta(query, params)
+
+def reconciliar_progreso():
+    """
+    Recalcular progreso_documentos desde documento_alumno (corrige
+    desviaciones de los triggers). Retorna cuántas filas corrigió o None.
+    """
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT tipo_doc_id, codigo, nombre, descripcion, requerido
-            FROM tipos_documento
-            WHERE activo = TRUE
-            ORDER BY requerido DESC, nombre
-        """)
-        return cursor.fetchall()
+        cursor.execute("SELECT reconciliar_progreso_documentos() AS corregidas")
+        corregidas = cursor.fetchone()['corregidas']
+        conn.commit()
+        olvidar(obtener_progreso_documentos_many)
+        return corregidas
     except DatabaseError as e:
-        print(f"Error al obtener tipos de documentos: {e}")
-        return []
+        if conn:
+            conn.rollback()
+        print(f"Error al reconciliar progreso documental: {e}")
+        return None
     finally:
-        conn.close()
\ No newline at end of file
+        if conn:
+            conn.close()
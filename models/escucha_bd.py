@@ -0,0 +1,107 @@
+"""
+Un hilo LISTEN por proceso/worker, compartido por los módulos de models/ que
+necesitan avisos de PostgreSQL (NOTIFY). Cada módulo se suscribe a su canal
+con un manejador del payload y, opcionalmente, una función para cuando la
+conexión se recupera tras una caída (los avisos de ese intervalo se perdieron).
+
+Tras un fork el hijo arranca su propio hilo en el primer uso.
+"""
+from models.database import conexion_dedicada
+import os
+import select
+import threading
+import time
+
+_suscripciones = {}     # canal -> [(manejador, al_reconectar)]
+_lock = threading.Lock()
+_estado = {'pid': None, 'conectado': False, 'canales': frozenset()}
+
+
+def suscribir(canal, manejador, al_reconectar=None):
+    """Registrar `manejador(payload)` para los NOTIFY de `canal`"""
+    with _lock:
+        _suscripciones.setdefault(canal, []).append((manejador, al_reconectar))
+
+
+def asegurar():
+    """Arrancar el hilo de este proceso si aún no existe"""
+    pid = os.getpid()
+    if _estado['pid'] == pid:
+        return
+    with _lock:
+        if _estado['pid'] == pid:
+            return
+        _estado.update(pid=pid, conectado=False, canales=frozenset())
+    threading.Thread(target=_escuchar, name='listen-bd', daemon=True).start()
+
+
+def conectado():
+    return _estado['pid'] == os.getpid() and _estado['conectado']
+
+
+def escuchando(canal, espera=0):
+    """¿El canal ya tiene LISTEN activo? Espera hasta `espera` segundos"""
+    asegurar()
+    limite = time.monotonic() + espera
+    while True:
+        if _estado['conectado'] and canal in _estado['canales']:
+            return True
+        if time.monotonic() >= limite:
+            return False
+        time.sleep(0.05)
+
+
+def _despachar(canal, payload):
+    for manejador, _ in list(_suscripciones.get(canal, ())):
+        try:
+            manejador(payload)
+        except Exception as e:
+            print(f"⚠️ Error atendiendo NOTIFY de {canal}: {e}")
+
+
+def _escuchar():
+    espera = 1
+    reconexion = False
+    while True:
+        conn = None
+        try:
+            conn = conexion_dedicada()
+            conn.autocommit = True
+            cursor = conn.cursor()
+            canales = set(_suscripciones)
+            for canal in canales:
+                cursor.execute(f"LISTEN {canal}")
+            _estado['canales'] = frozenset(canales)
+            _estado['conectado'] = True
+            if reconexion:
+                # Mientras no se escuchaba pudo perderse algún NOTIFY
+                for suscriptores in list(_suscripciones.values()):
+                    for _, al_reconectar in suscriptores:
+                        if al_reconectar is not None:
+                            al_reconectar()
+            reconexion = True
+            espera = 1
+            while True:
+                # Canales suscritos después de conectar (se revisa cada segundo)
+                nuevos = set(_suscripciones) - canales
+                if nuevos:
+                    for canal in nuevos:
+                        cursor.execute(f"LISTEN {canal}")
+                    canales |= nuevos
+                    _estado['canales'] = frozenset(canales)
+                if select.select([conn], [], [], 1) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    _despachar(aviso.channel, aviso.payload)
+        except Exception as e:
+            reconexion = True
+            print(f"⚠️ Escucha de PostgreSQL interrumpida, reintentando en {espera}s: {e}")
+        finally:
+            _estado['conectado'] = False
+            _estado['canales'] = frozenset()
+            if conn is not None and not conn.closed:
+                conn.close()
+        time.sleep(espera)
+        espera = min(espera * 2, 60)
@@ -1,65 +1,73 @@
-from models.database import get_connection
+from models.database import get_connection, registrar_consulta, ejecutar_consulta, lectura_en_replica, RegistroCursor, recorrer_consulta
+from models import catalogo_model
+from models.cache import cacheado
+from models.inscripcion_model import ESPACIO_ESTADISTICAS, invalidar_estadisticas
 from psycopg2 import DatabaseError
 
+ESCUELA_POR_DIRECTOR = registrar_consulta('escuela_por_director', """
+    SELECT 
+        e.escuela_id,
+        e.cct,
+        e.nombre,
+        e.direccion,
+        e.municipio,
+        e.entidad,
+        e.turno,
+        e.zona_escolar,
+        e.cupo_total,
+        e.telefono,
+        e.correo_contacto,
+        e.activo
+    FROM escuelas e
+    WHERE e.director_usuario_id = %s
+    AND e.activo = TRUE
+    LIMIT 1
+""")
+
 def obtener_escuela_por_director(usuario_id):
     """Obtener la escuela asignada a un director"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                e.escuela_id,
-                e.cct,
-                e.nombre,
-                e.direccion,
-                e.municipio,
-                e.entidad,
-                e.turno,
-                e.zona_escolar,
-                e.cupo_total,
-                e.telefono,
-                e.correo_contacto,
-                e.activo
-            FROM escuelas e
-            WHERE e.director_usuario_id = %s
-            AND e.activo = TRUE
-            LIMIT 1
-        """, (usuario_id,))
+        ejecutar_consulta(cursor, ESCUELA_POR_DIRECTOR, (usuario_id,))
         return cursor.fetchone()
     except DatabaseError as e:
         print(f"Error al obtener escuela del director: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@cacheado(ESPACIO_ESTADISTICAS, ttl=60)
+@lectura_en_replica
 def obtener_estadisticas_escuela(escuela_id, ciclo_id=None):
     """Obtener estadísticas de una escuela específica"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         
         # Si no se proporciona ciclo, usar el activo
         if not ciclo_id:
-            cursor.execute("SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1")
-            ciclo = cursor.fetchone()
-            ciclo_id = ciclo['ciclo_id'] if ciclo else None
+            ciclo_id = catalogo_model.obtener_ciclo_activo_id()
         
         if not ciclo_id:
             return None
         
+        # Contadores mantenidos por triggers: una fila por (escuela, ciclo)
         cursor.execute("""
             SELECT 
-                COUNT(*) FILTER (WHERE i.status = 'pendiente') AS pendientes,
-                COUNT(*) FILTER (WHERE i.status = 'en_revision') AS en_revision,
-                COUNT(*) FILTER (WHERE i.status = 'aceptado') AS aceptados,
-                COUNT(*) FILTER (WHERE i.status = 'rechazado') AS rechazados,
-                COUNT(*) AS total_solicitudes,
+                COALESCE(ce.pendientes, 0) AS pendientes,
+                COALESCE(ce.en_revision, 0) AS en_revision,
+                COALESCE(ce.aceptados, 0) AS aceptados,
+                COALESCE(ce.rechazados, 0) AS rechazados,
+                COALESCE(ce.pendientes + ce.en_revision + ce.aceptados + ce.rechazados, 0) AS total_solicitudes,
                 e.cupo_total,
-                (e.cupo_total - COUNT(*) FILTER (WHERE i.status = 'aceptado')) AS cupos_disponibles
+                (e.cupo_total - COALESCE(ce.aceptados, 0)) AS cupos_disponibles
             FROM escuelas e
-            LEFT JOIN inscripciones i ON e.escuela_id = i.escuela_id AND i.ciclo_id = %s
+            LEFT JOIN contadores_escuela ce ON ce.escuela_id = e.escuela_id AND ce.ciclo_id = %s
             WHERE e.escuela_id = %s
-            GROUP BY e.escuela_id, e.cupo_total
         """, (ciclo_id, escuela_id))
         
         return cursor.fetchone()
@@ -67,19 +75,20 @@ def obtener_estadisticas_escuela(escuela_id, ciclo_id=None):
         print(f"Error al obtener estadísticas: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@lectura_en_replica
 def obtener_grupos_escuela(escuela_id, ciclo_id=None):
     """Obtener todos los grupos de una escuela"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
         
         # Si no se proporciona ciclo, usar el activo
         if not ciclo_id:
-            cursor.execute("SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1")
-            ciclo = cursor.fetchone()
-            ciclo_id = ciclo['ciclo_id'] if ciclo else None
+            ciclo_id = catalogo_model.obtener_ciclo_activo_id()
         
         cursor.execute("""
             SELECT 
@@ -103,36 +112,82 @@ def obtener_grupos_escuela(escuela_id, ciclo_id=None):
         print(f"Error al obtener grupos: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
-def obtener_alumnos_por_grupo(grupo_id):
-    """Obtener lista de alumnos inscritos en un grupo"""
+@lectura_en_replica
+def obtener_grupo(grupo_id, escuela_id):
+    """Datos de un grupo de la escuela (None si no existe o es de otra escuela)"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
-                a.alumno_id,
-                a.nombre || ' ' || a.apellido_paterno || ' ' || a.apellido_materno AS nombre_completo,
-                a.curp,
-                a.fecha_nacimiento,
-                EXTRACT(YEAR FROM AGE(a.fecha_nacimiento)) AS edad,
-                t.nombre || ' ' || t.apellido_paterno AS tutor_nombre,
-                t.telefono AS tutor_telefono,
-                i.fecha_solicitud
-            FROM inscripciones i
-            INNER JOIN alumnos a ON i.alumno_id = a.alumno_id
-            LEFT JOIN alumno_tutor at ON a.alumno_id = at.alumno_id AND at.es_representante = TRUE
-            LEFT JOIN tutores t ON at.tutor_id = t.tutor_id
-            WHERE i.grupo_id = %s AND i.status = 'aceptado'
-            ORDER BY a.apellido_paterno, a.apellido_materno, a.nombre
-        """, (grupo_id,))
+                gr.grupo_id,
+                gr.nombre_grupo,
+                gr.cupo,
+                gr.alumnos_inscritos,
+                g.nivel AS grado_nivel,
+                g.descripcion AS grado_descripcion,
+                u.nombre || ' ' || u.apellido_paterno AS docente_nombre,
+                c.nombre AS ciclo_nombre
+            FROM grupos gr
+            INNER JOIN grados g ON gr.grado_id = g.grado_id
+            INNER JOIN ciclos c ON gr.ciclo_id = c.ciclo_id
+            LEFT JOIN usuarios u ON gr.docente_usuario_id = u.usuario_id
+            WHERE gr.grupo_id = %s AND gr.escuela_id = %s
+        """, (grupo_id, escuela_id))
+        return cursor.fetchone()
+    except DatabaseError as e:
+        print(f"Error al obtener grupo: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+# 🧑‍🎓 Lista de un grupo (pantalla y exportación)
+SQL_ALUMNOS_POR_GRUPO = """
+    SELECT 
+        a.alumno_id,
+        a.nombre || ' ' || a.apellido_paterno || ' ' || a.apellido_materno AS nombre_completo,
+        a.curp,
+        a.fecha_nacimiento,
+        EXTRACT(YEAR FROM AGE(a.fecha_nacimiento)) AS edad,
+        t.nombre || ' ' || t.apellido_paterno AS tutor_nombre,
+        t.telefono AS tutor_telefono,
+        i.fecha_solicitud
+    FROM inscripciones i
+    INNER JOIN alumnos a ON i.alumno_id = a.alumno_id
+    LEFT JOIN alumno_tutor at ON a.alumno_id = at.alumno_id AND at.es_representante = TRUE
+    LEFT JOIN tutores t ON at.tutor_id = t.tutor_id
+    WHERE i.grupo_id = %s AND i.status = 'aceptado' {condicion}
+    ORDER BY a.apellido_paterno, a.apellido_materno, a.nombre
+"""
+
+@lectura_en_replica
+def obtener_alumnos_por_grupo(grupo_id):
+    """Obtener lista de alumnos inscritos en un grupo"""
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
+        cursor.execute(SQL_ALUMNOS_POR_GRUPO.format(condicion=''), (grupo_id,))
         return cursor.fetchall()
     except DatabaseError as e:
         print(f"Error al obtener alumnos del grupo: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+@lectura_en_replica
+def recorrer_alumnos_por_grupo(grupo_id, escuela_id):
+    """Lista del grupo como generador (exportación y página en streaming); vacía si el grupo no es de la escuela"""
+    return recorrer_consulta(
+        SQL_ALUMNOS_POR_GRUPO.format(condicion='AND i.escuela_id = %s'),
+        (grupo_id, escuela_id)
+    )
 
 def crear_grupo(escuela_id, grado_id, ciclo_id, nombre_grupo, cupo, docente_usuario_id=None):
     """Crear un nuevo grupo en la escuela"""
@@ -208,4 +263,27 @@ def actualizar_grupo(grupo_id, nombre_grupo=None, cupo=None, docente_usuario_id=
         return False
     finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+def reconciliar_contadores():
+    """
+    Recalcular contadores_escuela desde inscripciones y grupos (corrige
+    desviaciones de los triggers). Retorna cuántas filas corrigió o None.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT reconciliar_contadores_escuela() AS corregidas")
+        corregidas = cursor.fetchone()['corregidas']
+        conn.commit()
+        invalidar_estadisticas()
+        return corregidas
+    except DatabaseError as e:
+        if conn:
+            conn.rollback()
+        print(f"Error al reconciliar contadores: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
@@ -0,0 +1,166 @@
+"""
+Filtros de existencia (Bloom) para alumnos.curp y usuarios.correo.
+
+Un "no está en el filtro" es definitivo y se responde sin tocar la BD; un
+"quizá" se confirma con la consulta indexada de siempre. Cada worker construye
+sus filtros al iniciar y los mantiene al día con los NOTIFY del canal
+'existencia_alta' (trigger notificar_alta_existencia; el payload lleva solo
+la huella SHA-256, no el dato). Mientras un filtro no esté construido, o
+tras perder la escucha, todas las preguntas van a la BD.
+
+La unicidad la garantizan los UNIQUE de la BD: el filtro solo ahorra lecturas.
+"""
+from models.database import get_connection, leer_de_primaria, al_confirmar
+from models import escucha_bd
+from utils.filtro_bloom import FiltroBloom
+from psycopg2 import DatabaseError, extensions
+import os
+import threading
+
+CANAL_EXISTENCIA = 'existencia_alta'
+FILTRO_TASA_ERROR = float(os.getenv('FILTRO_EXISTENCIA_TASA_ERROR', 0.01))
+FILTRO_CAPACIDAD_MINIMA = int(os.getenv('FILTRO_EXISTENCIA_CAPACIDAD_MINIMA', 10000))
+
+# tipo -> (tabla, columna)
+_FUENTES = {
+    'curp': ('alumnos', 'curp'),
+    'correo': ('usuarios', 'correo'),
+}
+
+_filtros = {}          # tipo -> FiltroBloom completo y al día
+_construyendo = {}     # tipo -> huellas recibidas mientras se construye
+_lock = threading.Lock()
+_pid = [None]
+_metricas = {tipo: {'negativos': 0, 'confirmados': 0, 'falsos_positivos': 0, 'sin_filtro': 0} for tipo in _FUENTES}
+
+
+def _construir(tipo):
+    """Leer la columna completa y publicar el filtro (solo si ya se escuchan las altas)"""
+    if not escucha_bd.escuchando(CANAL_EXISTENCIA, espera=2):
+        print(f"⚠️ Filtro de {tipo} sin construir: no hay escucha de altas")
+        return False
+    tabla, columna = _FUENTES[tipo]
+    with _lock:
+        if tipo in _construyendo:
+            return False
+        _construyendo[tipo] = []
+
+    conn = None
+    filtro = None
+    try:
+        with leer_de_primaria():
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla}")
+            total = cursor.fetchone()['total']
+            filtro = FiltroBloom(max(FILTRO_CAPACIDAD_MINIMA, total * 2), FILTRO_TASA_ERROR)
+            # Cursor del lado del servidor: no cargar la tabla completa en memoria
+            with conn.cursor(name=f'filtro_{tipo}', cursor_factory=extensions.cursor) as lector:
+                lector.itersize = 5000
+                lector.execute(f"SELECT {columna} FROM {tabla} WHERE {columna} IS NOT NULL")
+                for (valor,) in lector:
+                    filtro.agregar(valor)
+    except DatabaseError as e:
+        print(f"Error al construir filtro de {tipo}: {e}")
+        filtro = None
+    finally:
+        if conn:
+            conn.close()
+        with _lock:
+            pendientes = _construyendo.pop(tipo, [])
+            if filtro is not None:
+                for huella in pendientes:
+                    filtro.agregar_huella(huella)
+                _filtros[tipo] = filtro
+    if filtro is not None:
+        print(f"🔎 Filtro de {tipo}: {filtro.elementos} valores, {filtro.resumen()['bytes']} bytes")
+    return filtro is not None
+
+
+def _reconstruir_en_segundo_plano(*tipos):
+    for tipo in tipos:
+        threading.Thread(target=_construir, args=(tipo,), name=f'filtro-{tipo}', daemon=True).start()
+
+
+def _asegurar():
+    """Tras un fork el hijo descarta los filtros heredados (pudo perder altas) y los reconstruye"""
+    pid = os.getpid()
+    if _pid[0] == pid:
+        return
+    with _lock:
+        if _pid[0] == pid:
+            return
+        heredado = _pid[0] is not None
+        _pid[0] = pid
+        if heredado:
+            _filtros.clear()
+            _construyendo.clear()
+    escucha_bd.asegurar()
+    if heredado:
+        _reconstruir_en_segundo_plano(*_FUENTES)
+
+
+def _agregar(tipo, huella):
+    with _lock:
+        filtro = _filtros.get(tipo)
+        if filtro is not None:
+            filtro.agregar_huella(huella)
+        if tipo in _construyendo:
+            _construyendo[tipo].append(huella)
+    if filtro is not None and filtro.saturado and tipo not in _construyendo:
+        # Reemplazarlo por uno más grande; mientras tanto el actual sigue sirviendo
+        _reconstruir_en_segundo_plano(tipo)
+
+
+def _al_recibir_alta(payload):
+    tipo, _, huella_hex = (payload or '').partition(':')
+    if tipo in _FUENTES and huella_hex:
+        _agregar(tipo, bytes.fromhex(huella_hex))
+
+
+def _al_reconectar():
+    # Pudo perderse un alta: dejar de confiar en los filtros hasta reconstruirlos
+    with _lock:
+        _filtros.clear()
+    _reconstruir_en_segundo_plano(*_FUENTES)
+
+
+escucha_bd.suscribir(CANAL_EXISTENCIA, _al_recibir_alta, _al_reconectar)
+
+
+def posiblemente_existe(tipo, valor):
+    """False = seguro no existe (no hace falta ir a la BD); True = confirmar en la BD"""
+    _asegurar()
+    filtro = _filtros.get(tipo)
+    if filtro is None:
+        _metricas[tipo]['sin_filtro'] += 1
+        return True
+    if valor in filtro:
+        return True
+    _metricas[tipo]['negativos'] += 1
+    return False
+
+
+def anotar_confirmacion(tipo, existe):
+    """Resultado de la consulta a la BD tras un 'quizá' del filtro"""
+    _metricas[tipo]['confirmados' if existe else 'falsos_positivos'] += 1
+
+
+def registrar_alta(tipo, valor):
+    """Agregar al filtro de este worker en cuanto se confirme el INSERT (los demás lo reciben por NOTIFY)"""
+    huella = FiltroBloom.huella(valor)
+    al_confirmar(lambda: _agregar(tipo, huella))
+
+
+def calentar():
+    """Construir los filtros al iniciar el worker"""
+    _asegurar()
+    for tipo in _FUENTES:
+        _construir(tipo)
+
+
+def resumen():
+    return {
+        tipo: dict(_metricas[tipo], filtro=_filtros[tipo].resumen() if tipo in _filtros else None)
+        for tipo in _FUENTES
+    }
@@ -1,8 +1,90 @@
-from models.database import get_connection
+from models.database import get_connection, registrar_consulta, ejecutar_consulta, lectura_en_replica, RegistroCursor, al_confirmar, recorrer_consulta, reintentar_conflictos, ERRORES_CONFLICTO
+from models import catalogo_model, documento_model
+from models.cache import cacheado, invalidar
+from utils.flujo import FilasEnFlujo
 from psycopg2 import DatabaseError
+from datetime import datetime, timedelta
+import base64
+import json
+import os
 
-def crear_inscripcion(alumno_id, escuela_id, ciclo_id, grado_id, usuario_responsable):
-    """Crear nueva solicitud de inscripción - retorna inscripcion_id o None"""
+# 📄 Paginación por llave de los listados de inscripciones
+INSCRIPCIONES_POR_PAGINA = int(os.getenv('INSCRIPCIONES_POR_PAGINA', 50))
+INSCRIPCIONES_CONTEO_EXACTO_HASTA = int(os.getenv('INSCRIPCIONES_CONTEO_EXACTO_HASTA', 5000))
+
+# 🗃️ Espacio del cache para los tableros de estadísticas
+ESPACIO_ESTADISTICAS = 'estadisticas'
+
+def invalidar_estadisticas():
+    """Descartar estadísticas cacheadas cuando la escritura se confirme"""
+    al_confirmar(lambda: invalidar(ESPACIO_ESTADISTICAS))
+
+# 📌 Consultas frecuentes (preparadas una vez por conexión)
+PUEDE_INSCRIBIRSE = registrar_consulta('puede_inscribirse', """
+    SELECT puede_inscribirse, mensaje 
+    FROM puede_inscribirse(%s, %s, %s)
+""")
+
+ASIGNAR_LUGAR = registrar_consulta('asignar_lugar_grupo', """
+    SELECT grupo_id, resultado
+    FROM asignar_lugar_grupo(%s, %s, %s, %s)
+""")
+
+ACEPTAR_SIN_GRUPO = registrar_consulta('aceptar_sin_grupo', """
+    SELECT aceptar_sin_grupo(%s, %s, %s) AS resultado
+""")
+
+REVISAR_LOTE = registrar_consulta('revisar_inscripciones_lote', """
+    SELECT inscripcion_id, resultado, grupo_id, nombre_grupo
+    FROM revisar_inscripciones_lote(%s::INTEGER[], %s::TEXT, %s::INTEGER, %s::INTEGER, %s::TEXT, %s::INTEGER)
+""")
+
+ELEGIBILIDAD = registrar_consulta('elegibilidad_inscripcion', """
+    SELECT alumno_id, escuela_id, puede_inscribirse, mensaje, cupos_disponibles, documentos_faltantes
+    FROM elegibilidad_inscripcion(%s, %s, %s, %s)
+""")
+
+ELEGIBILIDAD_SOLICITUDES = registrar_consulta('elegibilidad_solicitudes', """
+    WITH solicitudes AS (
+        SELECT inscripcion_id, alumno_id
+        FROM inscripciones
+        WHERE inscripcion_id = ANY(%s)
+          AND escuela_id = %s
+          AND ciclo_id = %s
+    )
+    SELECT s.inscripcion_id, el.puede_inscribirse, el.mensaje, el.cupos_disponibles, el.documentos_faltantes
+    FROM solicitudes s
+    INNER JOIN elegibilidad_inscripcion(
+        ARRAY(SELECT alumno_id FROM solicitudes), ARRAY[%s::INTEGER], %s::INTEGER, TRUE
+    ) el ON el.alumno_id = s.alumno_id
+""")
+
+INSCRIPCION_DETALLE = registrar_consulta('inscripcion_detalle', """
+    SELECT * FROM vista_inscripciones_completa
+    WHERE inscripcion_id = %s
+""")
+
+INSCRIPCIONES_PENDIENTES_ESCUELA = registrar_consulta('inscripciones_pendientes_escuela', """
+    SELECT * FROM vista_inscripciones_completa
+    WHERE status IN ('pendiente', 'en_revision')
+    AND escuela_id = %s
+    ORDER BY fecha_solicitud ASC, inscripcion_id ASC
+    LIMIT %s
+""")
+
+INSCRIPCIONES_PENDIENTES_TODAS = registrar_consulta('inscripciones_pendientes_todas', """
+    SELECT * FROM vista_inscripciones_completa
+    WHERE status IN ('pendiente', 'en_revision')
+    ORDER BY fecha_solicitud ASC, inscripcion_id ASC
+    LIMIT %s
+""")
+
+def crear_inscripcion(alumno_id, escuela_id, ciclo_id, grado_id, usuario_responsable, alternativas=None):
+    """
+    Crear nueva solicitud de inscripción - retorna inscripcion_id o None.
+    alternativas: escuelas de segunda, tercera... opción, en orden (para la
+    asignación por preferencias).
+    """
     conn = None
     try:
         conn = get_connection()
@@ -32,7 +114,14 @@ def crear_inscripcion(alumno_id, escuela_id, ciclo_id, grado_id, usuario_respons
             raise ValueError("No se pudo obtener el inscripcion_id")
         
         inscripcion_id = resultado['inscripcion_id']
+        if alternativas:
+            cursor.execute("""
+                INSERT INTO preferencias_inscripcion (inscripcion_id, orden, escuela_id)
+                SELECT %s, orden + 1, escuela_id
+                FROM unnest(%s::INTEGER[]) WITH ORDINALITY AS a(escuela_id, orden)
+            """, (inscripcion_id, list(alternativas)))
         conn.commit()
+        invalidar_estadisticas()
         
         print(f"✅ Inscripción creada exitosamente con ID: {inscripcion_id}")
         return inscripcion_id
@@ -46,11 +135,13 @@ def crear_inscripcion(alumno_id, escuela_id, ciclo_id, grado_id, usuario_respons
         if conn:
             conn.close()
 
+@lectura_en_replica
 def obtener_inscripciones_por_tutor(tutor_id):
     """Obtener todas las inscripciones de los alumnos de un tutor"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
         cursor.execute("""
             SELECT 
                 i.inscripcion_id,
@@ -79,13 +170,16 @@ def obtener_inscripciones_por_tutor(tutor_id):
         print(f"Error al obtener inscripciones: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@lectura_en_replica
 def obtener_escuelas_disponibles():
-    """Obtener lista de escuelas activas con cupos disponibles"""
+    """Obtener lista de escuelas activas con cupos disponibles (contadores del ciclo activo)"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
         cursor.execute("""
             SELECT 
                 e.escuela_id,
@@ -95,102 +189,47 @@ def obtener_escuelas_disponibles():
                 e.entidad,
                 e.turno,
                 e.cupo_total,
-                COALESCE(est.cupos_disponibles, e.cupo_total) AS cupos_disponibles
+                e.cupo_total - COALESCE(ce.aceptados, 0) AS cupos_disponibles
             FROM escuelas e
-            LEFT JOIN vista_estadisticas_escuela est ON e.escuela_id = est.escuela_id
+            LEFT JOIN contadores_escuela ce ON ce.escuela_id = e.escuela_id AND ce.ciclo_id = %s
             WHERE e.activo = TRUE
             ORDER BY e.nombre
-        """)
+        """, (catalogo_model.obtener_ciclo_activo_id(),))
         return cursor.fetchall()
     except DatabaseError as e:
         print(f"Error al obtener escuelas: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 def obtener_ciclo_activo():
-    """Obtener el ciclo escolar activo"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ciclo_id, nombre, fecha_inicio, fecha_fin, inscripciones_abiertas
-            FROM ciclos 
-            WHERE activo = TRUE
-            LIMIT 1
-        """)
-        return cursor.fetchone()
-    except DatabaseError as e:
-        print(f"Error al obtener ciclo activo: {e}")
-        return None
-    finally:
-        conn.close()
+    """Obtener el ciclo escolar activo (catálogo en memoria)"""
+    return catalogo_model.obtener_ciclo_activo()
 
 def obtener_grados():
-    """Obtener lista de grados disponibles"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT grado_id, nivel, descripcion FROM grados ORDER BY nivel")
-        return cursor.fetchall()
-    except DatabaseError as e:
-        print(f"Error al obtener grados: {e}")
-        return []
-    finally:
-        conn.close()
+    """Obtener lista de grados disponibles (catálogo en memoria)"""
+    return catalogo_model.obtener_grados()
 
 def verificar_documentos_completos(alumno_id):
     """Verificar si el alumno tiene todos los documentos requeridos validados"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Contar documentos requeridos
-        cursor.execute("""
-            SELECT COUNT(*) as total
-            FROM tipos_documento 
-            WHERE requerido = TRUE AND activo = TRUE
-        """)
-        total_requeridos = cursor.fetchone()['total']
-        
-        # Contar documentos validados
-        cursor.execute("""
-            SELECT COUNT(*) as validados
-            FROM documento_alumno da
-            INNER JOIN tipos_documento td ON da.tipo_doc_id = td.tipo_doc_id
-            WHERE da.alumno_id = %s 
-            AND td.requerido = TRUE 
-            AND da.status = 'validado'
-        """, (alumno_id,))
-        total_validados = cursor.fetchone()['validados']
-        
-        return total_validados >= total_requeridos
-        
-    except DatabaseError as e:
-        print(f"Error al verificar documentos: {e}")
-        return False
-    finally:
-        conn.close()
+    progreso = documento_model.obtener_progreso_documentos(alumno_id)
+    return bool(progreso) and progreso['validados'] >= progreso['requeridos']
 
 def puede_inscribirse_alumno(alumno_id, escuela_id):
     """Verificar si un alumno puede inscribirse en una escuela"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         
         # Obtener ciclo activo
-        cursor.execute("SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1")
-        ciclo = cursor.fetchone()
-        if not ciclo:
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+        if not ciclo_id:
             return False, "No hay ciclo escolar activo"
         
-        ciclo_id = ciclo['ciclo_id']
-        
         # Usar la función de PostgreSQL
-        cursor.execute("""
-            SELECT puede_inscribirse, mensaje 
-            FROM puede_inscribirse(%s, %s, %s)
-        """, (alumno_id, escuela_id, ciclo_id))
+        ejecutar_consulta(cursor, PUEDE_INSCRIBIRSE, (alumno_id, escuela_id, ciclo_id))
         
         resultado = cursor.fetchone()
         return resultado['puede_inscribirse'], resultado['mensaje']
@@ -199,54 +238,126 @@ def puede_inscribirse_alumno(alumno_id, escuela_id):
         print(f"Error al verificar elegibilidad: {e}")
         return False, "Error al verificar elegibilidad"
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+def obtener_elegibilidad(alumno_ids, escuela_ids=None):
+    """
+    Elegibilidad de varios alumnos contra varias escuelas (todas las activas si
+    no se indican) en una sola consulta - retorna lista de dicts o None si falla
+    """
+    alumno_ids = list(dict.fromkeys(alumno_ids))
+    ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    if not alumno_ids or not ciclo_id:
+        return []
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, ELEGIBILIDAD, (
+            alumno_ids, list(escuela_ids) if escuela_ids is not None else None, ciclo_id, False
+        ))
+        return cursor.fetchall()
+    except DatabaseError as e:
+        print(f"Error al obtener elegibilidad: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def matriz_elegibilidad(alumno_ids, escuela_ids=None):
+    """
+    Elegibilidad en forma compacta para la página:
+    {'escuelas': [id, ...], 'alumnos': {alumno_id: [[puede, mensaje], ...]}}
+    con una celda por escuela, en el orden de 'escuelas'. None si falla.
+    """
+    filas = obtener_elegibilidad(alumno_ids, escuela_ids)
+    if filas is None:
+        return None
+    escuelas = sorted({f['escuela_id'] for f in filas})
+    alumnos = {}
+    # Las filas llegan ordenadas por alumno y escuela, una por cada par
+    for f in filas:
+        alumnos.setdefault(f['alumno_id'], []).append([f['puede_inscribirse'], f['mensaje']])
+    return {'escuelas': escuelas, 'alumnos': alumnos}
+
+def elegibilidad_solicitudes(inscripcion_ids, escuela_id):
+    """
+    Revisión por lotes del director: ¿se puede aceptar cada solicitud del
+    ciclo activo de su escuela (cupo y documentos)? - retorna dict
+    inscripcion_id -> dict, o None si falla. Las ajenas se omiten.
+    """
+    inscripcion_ids = list(dict.fromkeys(inscripcion_ids))
+    ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    if not inscripcion_ids or not ciclo_id:
+        return {}
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, ELEGIBILIDAD_SOLICITUDES, (
+            inscripcion_ids, escuela_id, ciclo_id, escuela_id, ciclo_id
+        ))
+        return {f['inscripcion_id']: f for f in cursor.fetchall()}
+    except DatabaseError as e:
+        print(f"Error al revisar solicitudes: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
 
+@lectura_en_replica
 def obtener_inscripcion_detalle(inscripcion_id):
     """Obtener detalles completos de una inscripción"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM vista_inscripciones_completa
-            WHERE inscripcion_id = %s
-        """, (inscripcion_id,))
+        ejecutar_consulta(cursor, INSCRIPCION_DETALLE, (inscripcion_id,))
         return cursor.fetchone()
     except DatabaseError as e:
         print(f"Error al obtener detalle de inscripción: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 # ===== FUNCIONES PARA ADMINISTRADOR/DIRECTOR =====
 
-def obtener_inscripciones_pendientes(escuela_id=None):
-    """Obtener inscripciones pendientes de revisión"""
+@lectura_en_replica
+def obtener_inscripciones_pendientes(escuela_id=None, limite=None):
+    """Obtener inscripciones pendientes de revisión (las más antiguas primero, hasta `limite`)"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
         
         if escuela_id:
             # Para directores: solo de su escuela
-            cursor.execute("""
-                SELECT * FROM vista_inscripciones_completa
-                WHERE status IN ('pendiente', 'en_revision')
-                AND escuela_id = %s
-                ORDER BY fecha_solicitud ASC
-            """, (escuela_id,))
+            ejecutar_consulta(cursor, INSCRIPCIONES_PENDIENTES_ESCUELA, (escuela_id, limite))
         else:
             # Para admin SEP: todas las escuelas
-            cursor.execute("""
-                SELECT * FROM vista_inscripciones_completa
-                WHERE status IN ('pendiente', 'en_revision')
-                ORDER BY fecha_solicitud ASC
-            """)
+            ejecutar_consulta(cursor, INSCRIPCIONES_PENDIENTES_TODAS, (limite,))
         
         return cursor.fetchall()
     except DatabaseError as e:
         print(f"Error al obtener inscripciones pendientes: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+@lectura_en_replica
+def recorrer_inscripciones_pendientes(escuela_id=None, limite=None):
+    """Pendientes de revisión (las más antiguas primero) como generador, para plantillas en streaming"""
+    query = "SELECT * FROM vista_inscripciones_completa WHERE status IN ('pendiente', 'en_revision')"
+    params = []
+    if escuela_id:
+        query += " AND escuela_id = %s"
+        params.append(escuela_id)
+    query += " ORDER BY fecha_solicitud ASC, inscripcion_id ASC LIMIT %s"
+    params.append(limite)
+    return recorrer_consulta(query, params)
 
 def cambiar_estado_inscripcion(inscripcion_id, nuevo_estado, revisado_por, motivo_rechazo=None, grupo_id=None):
     """Cambiar el estado de una inscripción (aprobar/rechazar)"""
@@ -273,6 +384,7 @@ def cambiar_estado_inscripcion(inscripcion_id, nuevo_estado, revisado_por, motiv
         """, (nuevo_estado, revisado_por, motivo_rechazo, grupo_id, inscripcion_id))
         
         conn.commit()
+        invalidar_estadisticas()
         print(f"✅ Inscripción {inscripcion_id} actualizada a estado: {nuevo_estado}")
         return True
         
@@ -285,8 +397,110 @@ def cambiar_estado_inscripcion(inscripcion_id, nuevo_estado, revisado_por, motiv
         if conn:
             conn.close()
 
+@reintentar_conflictos
+def aceptar_inscripcion(inscripcion_id, grupo_id, revisado_por, otro_grupo=True):
+    """
+    Aceptar una inscripción apartando un lugar en el grupo (o en otro del mismo
+    grado si se llenó) en una sola transacción corta. Retorna dict con
+    'resultado' ('asignado', 'ya_aceptada', 'sin_cupo', 'no_encontrada') y
+    'grupo_id', o None si falla. Los choques con otras aceptaciones se reintentan.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, ASIGNAR_LUGAR, (inscripcion_id, grupo_id, revisado_por, otro_grupo))
+        asignacion = cursor.fetchone()
+        conn.commit()
+        if asignacion['resultado'] == 'asignado':
+            invalidar_estadisticas()
+            print(f"✅ Inscripción {inscripcion_id} aceptada en el grupo {asignacion['grupo_id']}")
+        return asignacion
+    except ERRORES_CONFLICTO:
+        if conn:
+            conn.rollback()
+        raise
+    except DatabaseError as e:
+        print(f"❌ Error al aceptar inscripción: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+@reintentar_conflictos
+def aceptar_sin_grupo(inscripcion_id, revisado_por, escuela_id=None):
+    """
+    Aceptar una inscripción pendiente o en revisión sin grupo (la coloca
+    después la colocación automática) si quedan lugares en los grupos del
+    grado. escuela_id limita a la escuela de un director. Retorna el
+    resultado ('aceptada', 'ya_aceptada', 'ya_revisada', 'sin_cupo',
+    'sin_permiso', 'no_encontrada') o None si falla.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, ACEPTAR_SIN_GRUPO, (inscripcion_id, revisado_por, escuela_id))
+        resultado = cursor.fetchone()['resultado']
+        conn.commit()
+        if resultado == 'aceptada':
+            invalidar_estadisticas()
+            print(f"✅ Inscripción {inscripcion_id} aceptada sin grupo")
+        return resultado
+    except ERRORES_CONFLICTO:
+        if conn:
+            conn.rollback()
+        raise
+    except DatabaseError as e:
+        print(f"❌ Error al aceptar inscripción sin grupo: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+@reintentar_conflictos
+def revisar_inscripciones_lote(inscripcion_ids, accion, revisado_por, escuela_id=None, motivo_rechazo=None, grupo_id=None):
+    """
+    Aceptar, rechazar o pasar a revisión varias inscripciones pendientes en una
+    sola transacción (ver revisar_inscripciones_lote en el esquema). Al aceptar
+    se reparten los lugares libres de los grupos del grado; grupo_id es el
+    preferido. Retorna lista de dicts (inscripcion_id, resultado, grupo_id,
+    nombre_grupo) en el orden recibido, o None si falla.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, REVISAR_LOTE, (
+            list(inscripcion_ids), accion, revisado_por, escuela_id, motivo_rechazo, grupo_id
+        ))
+        resultados = cursor.fetchall()
+        conn.commit()
+        cambiadas = sum(1 for r in resultados if r['resultado'] in ('aceptado', 'rechazado', 'en_revision'))
+        if cambiadas:
+            invalidar_estadisticas()
+        print(f"✅ Lote '{accion}': {cambiadas} de {len(resultados)} inscripciones actualizadas")
+        return resultados
+    except ERRORES_CONFLICTO:
+        if conn:
+            conn.rollback()
+        raise
+    except DatabaseError as e:
+        print(f"❌ Error al revisar lote de inscripciones: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
 def obtener_grupos_disponibles(escuela_id, ciclo_id, grado_id):
     """Obtener grupos disponibles para asignar un alumno"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -309,50 +523,51 @@ def obtener_grupos_disponibles(escuela_id, ciclo_id, grado_id):
         print(f"Error al obtener grupos disponibles: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@cacheado(ESPACIO_ESTADISTICAS, ttl=60)
+@lectura_en_replica
 def obtener_estadisticas_inscripciones(escuela_id=None):
-    """Obtener estadísticas de inscripciones"""
+    """Obtener estadísticas de inscripciones del ciclo activo (contadores_escuela)"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        ciclo_id = catalogo_model.obtener_ciclo_activo_id()
         
+        query = """
+            SELECT 
+                COALESCE(SUM(pendientes), 0) AS pendientes,
+                COALESCE(SUM(en_revision), 0) AS en_revision,
+                COALESCE(SUM(aceptados), 0) AS aceptados,
+                COALESCE(SUM(rechazados), 0) AS rechazados,
+                COALESCE(SUM(pendientes + en_revision + aceptados + rechazados), 0) AS total
+            FROM contadores_escuela
+            WHERE ciclo_id = %s
+        """
+        params = [ciclo_id]
         if escuela_id:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) FILTER (WHERE status = 'pendiente') AS pendientes,
-                    COUNT(*) FILTER (WHERE status = 'en_revision') AS en_revision,
-                    COUNT(*) FILTER (WHERE status = 'aceptado') AS aceptados,
-                    COUNT(*) FILTER (WHERE status = 'rechazado') AS rechazados,
-                    COUNT(*) AS total
-                FROM inscripciones
-                WHERE escuela_id = %s
-                AND ciclo_id = (SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1)
-            """, (escuela_id,))
-        else:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) FILTER (WHERE status = 'pendiente') AS pendientes,
-                    COUNT(*) FILTER (WHERE status = 'en_revision') AS en_revision,
-                    COUNT(*) FILTER (WHERE status = 'aceptado') AS aceptados,
-                    COUNT(*) FILTER (WHERE status = 'rechazado') AS rechazados,
-                    COUNT(*) AS total
-                FROM inscripciones
-                WHERE ciclo_id = (SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1)
-            """)
+            # Para directores: solo su escuela
+            query += " AND escuela_id = %s"
+            params.append(escuela_id)
         
+        cursor.execute(query, params)
         return cursor.fetchone()
     except DatabaseError as e:
         print(f"Error al obtener estadísticas: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@lectura_en_replica
 def obtener_todas_inscripciones(escuela_id=None, filtro_status=None):
     """Obtener todas las inscripciones con filtros opcionales"""
+    conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
         
         query = "SELECT * FROM vista_inscripciones_completa WHERE 1=1"
         params = []
@@ -373,4 +588,201 @@ def obtener_todas_inscripciones(escuela_id=None, filtro_status=None):
         print(f"Error al obtener inscripciones: {e}")
         return []
     finally:
-        conn.close()
\ No newline at end of file
+        if conn:
+            conn.close()
+
+# 🔑 Cursor de página: (fecha_solicitud, inscripcion_id) opaco para la URL
+def codificar_cursor(fila):
+    datos = json.dumps([fila['fecha_solicitud'].isoformat(), fila['inscripcion_id']])
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor_pagina):
+    """Retorna (fecha_solicitud, inscripcion_id) o None si el cursor no es válido"""
+    if not cursor_pagina:
+        return None
+    try:
+        datos = base64.urlsafe_b64decode(cursor_pagina + '=' * (-len(cursor_pagina) % 4))
+        fecha, inscripcion_id = json.loads(datos)
+        return datetime.fromisoformat(fecha), int(inscripcion_id)
+    except (ValueError, TypeError):
+        return None
+
+def _condiciones_inscripciones(escuela_id=None, filtros=None):
+    """WHERE de los listados: escuela, status, grado, municipio y rango de fechas"""
+    filtros = filtros or {}
+    condiciones = []
+    params = []
+    
+    if escuela_id:
+        condiciones.append("escuela_id = %s")
+        params.append(escuela_id)
+    if filtros.get('status'):
+        condiciones.append("status = %s")
+        params.append(filtros['status'])
+    if filtros.get('grado'):
+        condiciones.append("grado_nivel = %s")
+        params.append(filtros['grado'])
+    if filtros.get('municipio'):
+        condiciones.append("lower(municipio) = lower(%s)")
+        params.append(filtros['municipio'])
+    if filtros.get('desde'):
+        condiciones.append("fecha_solicitud >= %s")
+        params.append(filtros['desde'])
+    if filtros.get('hasta'):
+        # Fecha final inclusiva
+        condiciones.append("fecha_solicitud < %s")
+        params.append(filtros['hasta'] + timedelta(days=1))
+    
+    return condiciones, params
+
+class PaginaInscripciones(FilasEnFlujo):
+    """
+    Página de inscripciones (las más recientes primero) que se lee mientras se
+    recorre. Al terminar el recorrido quedan `siguiente` y `anterior`
+    (cursores de codificar_cursor() o None). La consulta trae una fila de más
+    y `filas_pagina` (total de filas traídas), así la fila sobrante se
+    reconoce también cuando llega primero (página anterior).
+    """
+
+    def __init__(self, filas, limite, hacia_atras=False, desde_cursor=False):
+        self.limite = limite
+        self.hacia_atras = hacia_atras
+        self.desde_cursor = desde_cursor
+        self.siguiente = None
+        self.anterior = None
+        super().__init__(filas)
+
+    def _recorrer(self, filas):
+        primera = ultima = None
+        hay_mas = False
+        sobrante = 0 if self.hacia_atras else self.limite
+        for indice, fila in enumerate(filas):
+            hay_mas = fila['filas_pagina'] > self.limite
+            if hay_mas and indice == sobrante:
+                continue
+            if primera is None:
+                primera = fila
+            ultima = fila
+            yield fila
+        
+        if self.hacia_atras:
+            self.siguiente = codificar_cursor(ultima) if ultima else None
+            self.anterior = codificar_cursor(primera) if primera and hay_mas else None
+        else:
+            self.siguiente = codificar_cursor(ultima) if ultima and hay_mas else None
+            self.anterior = codificar_cursor(primera) if primera and self.desde_cursor else None
+
+def _consulta_pagina(escuela_id, filtros, despues, antes, limite):
+    """SQL de una página por llave (fecha_solicitud, inscripcion_id), sin OFFSET"""
+    condiciones, params = _condiciones_inscripciones(escuela_id, filtros)
+    llave_despues = decodificar_cursor(despues)
+    llave_antes = None if llave_despues else decodificar_cursor(antes)
+    
+    if llave_antes:
+        # Página anterior: se toma hacia arriba y se presenta en orden descendente
+        condiciones.append("(fecha_solicitud, inscripcion_id) > (%s, %s)")
+        params.extend(llave_antes)
+        orden = "fecha_solicitud ASC, inscripcion_id ASC"
+    else:
+        if llave_despues:
+            condiciones.append("(fecha_solicitud, inscripcion_id) < (%s, %s)")
+            params.extend(llave_despues)
+        orden = "fecha_solicitud DESC, inscripcion_id DESC"
+    
+    pagina = "SELECT * FROM vista_inscripciones_completa"
+    if condiciones:
+        pagina += " WHERE " + " AND ".join(condiciones)
+    pagina += f" ORDER BY {orden} LIMIT %s"
+    params.append(limite + 1)
+    
+    query = f"""
+        SELECT p.*, COUNT(*) OVER () AS filas_pagina
+        FROM ({pagina}) p
+        ORDER BY p.fecha_solicitud DESC, p.inscripcion_id DESC
+    """
+    return query, params, bool(llave_antes), bool(llave_despues)
+
+@lectura_en_replica
+def obtener_pagina_inscripciones(escuela_id=None, filtros=None, despues=None, antes=None, limite=None):
+    """
+    Página de inscripciones, las más recientes primero, paginada por llave
+    (fecha_solicitud, inscripcion_id): no usa OFFSET, así cualquier página
+    cuesta lo mismo. `despues`/`antes` son cursores de codificar_cursor().
+    Retorna dict con inscripciones, siguiente y anterior (cursores o None).
+    """
+    limite = limite or INSCRIPCIONES_POR_PAGINA
+    query, params, hacia_atras, desde_cursor = _consulta_pagina(escuela_id, filtros, despues, antes, limite)
+    
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor(cursor_factory=RegistroCursor)
+        cursor.execute(query, params)
+        pagina = PaginaInscripciones(cursor.fetchall(), limite, hacia_atras, desde_cursor)
+    except DatabaseError as e:
+        print(f"Error al obtener página de inscripciones: {e}")
+        return {'inscripciones': [], 'siguiente': None, 'anterior': None}
+    finally:
+        if conn:
+            conn.close()
+    
+    filas = list(pagina)
+    return {'inscripciones': filas, 'siguiente': pagina.siguiente, 'anterior': pagina.anterior}
+
+@lectura_en_replica
+def recorrer_pagina_inscripciones(escuela_id=None, filtros=None, despues=None, antes=None, limite=None):
+    """
+    Como obtener_pagina_inscripciones, pero para plantillas en streaming:
+    retorna una PaginaInscripciones que lee las filas de un cursor del lado
+    del servidor mientras la plantilla la recorre
+    """
+    limite = limite or INSCRIPCIONES_POR_PAGINA
+    query, params, hacia_atras, desde_cursor = _consulta_pagina(escuela_id, filtros, despues, antes, limite)
+    return PaginaInscripciones(recorrer_consulta(query, params), limite, hacia_atras, desde_cursor)
+
+@cacheado(ESPACIO_ESTADISTICAS, ttl=60)
+@lectura_en_replica
+def contar_inscripciones_aproximado(escuela_id=None, filtros=None):
+    """
+    Total de inscripciones con los filtros: la estimación del planificador
+    (EXPLAIN, sin recorrer la tabla) y el conteo exacto solo si la estimación
+    es pequeña. Retorna dict {'total', 'exacto'} o None.
+    """
+    condiciones, params = _condiciones_inscripciones(escuela_id, filtros)
+    where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM vista_inscripciones_completa" + where, params)
+        fila = cursor.fetchone()
+        plan = fila['QUERY PLAN'] if isinstance(fila, dict) else fila[0]
+        estimado = int(plan[0]['Plan']['Plan Rows'])
+        
+        if estimado > INSCRIPCIONES_CONTEO_EXACTO_HASTA:
+            return {'total': estimado, 'exacto': False}
+        
+        cursor.execute("SELECT COUNT(*) AS total FROM vista_inscripciones_completa" + where, params)
+        return {'total': cursor.fetchone()['total'], 'exacto': True}
+    except DatabaseError as e:
+        print(f"Error al contar inscripciones: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+@lectura_en_replica
+def recorrer_inscripciones(escuela_id=None, filtros=None):
+    """
+    Todas las inscripciones con los filtros de los listados, para exportar:
+    generador de filas con cursor del lado del servidor, en el orden del
+    índice (fecha_solicitud, inscripcion_id) para que las primeras filas
+    salgan sin ordenar el resultado completo
+    """
+    condiciones, params = _condiciones_inscripciones(escuela_id, filtros)
+    query = "SELECT * FROM vista_inscripciones_completa"
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    query += " ORDER BY fecha_solicitud DESC, inscripcion_id DESC"
+    return recorrer_consulta(query, params)
@@ -0,0 +1,208 @@
+"""
+Medición de los triggers de contadores (alumnos_inscritos de grupos y
+contadores_escuela) ante cambios masivos de status.
+
+Se crea una escuela de prueba con sus grupos, alumnos e inscripciones y se
+mide aceptar y regresar a pendiente todas sus inscripciones con un UPDATE cada
+vez, en transacciones que se deshacen (al final se borra la escuela): con los
+triggers por sentencia, con los triggers por fila que había antes (recreados
+en pg_temp solo para la medición) y sin triggers como referencia.
+
+Correr solo contra una copia de la base (el comando pide --confirmar): toma
+candados exclusivos sobre inscripciones y grupos, y al crear y borrar la
+escuela confirma filas reales que disparan los NOTIFY de catálogos (todos los
+workers recargan) y de altas (las CURP de prueba quedan en los filtros de
+existencia hasta que se reconstruyan).
+"""
+from models.database import get_connection
+from models import catalogo_model
+from psycopg2 import DatabaseError
+import statistics
+import time
+
+# Triggers por fila de antes, solo la rama de UPDATE (la que se mide) y con un
+# solo upsert por fila en vez de dos: la comparación favorece a los de por fila
+TRIGGERS_POR_FILA = """
+    CREATE FUNCTION pg_temp.alumnos_grupo_por_fila()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF OLD.status != 'aceptado' AND NEW.status = 'aceptado' AND NEW.grupo_id IS NOT NULL THEN
+            UPDATE grupos SET alumnos_inscritos = alumnos_inscritos + 1
+            WHERE grupo_id = NEW.grupo_id;
+        ELSIF OLD.status = 'aceptado' AND NEW.status != 'aceptado' AND OLD.grupo_id IS NOT NULL THEN
+            UPDATE grupos SET alumnos_inscritos = GREATEST(0, alumnos_inscritos - 1)
+            WHERE grupo_id = OLD.grupo_id;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE FUNCTION pg_temp.contadores_inscripciones_por_fila()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF OLD.status IS NOT DISTINCT FROM NEW.status THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO contadores_escuela AS c (escuela_id, ciclo_id, pendientes, en_revision, aceptados, rechazados)
+        VALUES (
+            NEW.escuela_id, NEW.ciclo_id,
+            (NEW.status = 'pendiente')::INTEGER - (OLD.status = 'pendiente')::INTEGER,
+            (NEW.status = 'en_revision')::INTEGER - (OLD.status = 'en_revision')::INTEGER,
+            (NEW.status = 'aceptado')::INTEGER - (OLD.status = 'aceptado')::INTEGER,
+            (NEW.status = 'rechazado')::INTEGER - (OLD.status = 'rechazado')::INTEGER
+        )
+        ON CONFLICT (escuela_id, ciclo_id) DO UPDATE SET
+            pendientes = c.pendientes + EXCLUDED.pendientes,
+            en_revision = c.en_revision + EXCLUDED.en_revision,
+            aceptados = c.aceptados + EXCLUDED.aceptados,
+            rechazados = c.rechazados + EXCLUDED.rechazados,
+            actualizado_en = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE FUNCTION pg_temp.contadores_grupos_por_fila()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF OLD.alumnos_inscritos IS NOT DISTINCT FROM NEW.alumnos_inscritos THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO contadores_escuela AS c (escuela_id, ciclo_id, alumnos_en_grupos)
+        VALUES (NEW.escuela_id, NEW.ciclo_id, NEW.alumnos_inscritos - OLD.alumnos_inscritos)
+        ON CONFLICT (escuela_id, ciclo_id) DO UPDATE SET
+            alumnos_en_grupos = c.alumnos_en_grupos + EXCLUDED.alumnos_en_grupos,
+            actualizado_en = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER trg_actualizar_alumnos_grupo_cambio ON inscripciones;
+    DROP TRIGGER trg_contadores_inscripciones_cambio ON inscripciones;
+    DROP TRIGGER trg_contadores_grupos_cambio ON grupos;
+
+    CREATE TRIGGER trg_medicion_alumnos_grupo AFTER UPDATE ON inscripciones
+    FOR EACH ROW EXECUTE FUNCTION pg_temp.alumnos_grupo_por_fila();
+    CREATE TRIGGER trg_medicion_contadores_inscripciones AFTER UPDATE ON inscripciones
+    FOR EACH ROW EXECUTE FUNCTION pg_temp.contadores_inscripciones_por_fila();
+    CREATE TRIGGER trg_medicion_contadores_grupos AFTER UPDATE ON grupos
+    FOR EACH ROW EXECUTE FUNCTION pg_temp.contadores_grupos_por_fila();
+"""
+
+
+def _crear_escuela(cursor, ciclo_id, alumnos, grupos):
+    """Escuela de prueba con `grupos` grupos y `alumnos` inscripciones pendientes repartidas entre ellos"""
+    cursor.execute("""
+        INSERT INTO escuelas (escuela_id, cct, nombre, cupo_total)
+        SELECT n, 'MED' || n, 'Escuela de medición de contadores', %s
+        FROM nextval('escuelas_escuela_id_seq') AS n
+        RETURNING escuela_id
+    """, (alumnos,))
+    escuela_id = cursor.fetchone()['escuela_id']
+    cursor.execute("""
+        INSERT INTO grupos (escuela_id, grado_id, ciclo_id, nombre_grupo, cupo)
+        SELECT %s, 1, %s, 'M' || n, %s
+        FROM generate_series(1, %s) AS n
+    """, (escuela_id, ciclo_id, -(-alumnos // grupos), grupos))
+    cursor.execute("""
+        WITH nuevos AS (
+            INSERT INTO alumnos (curp, nombre, apellido_paterno, apellido_materno, fecha_nacimiento)
+            SELECT 'M' || lpad(%s::TEXT, 7, '0') || lpad(n::TEXT, 10, '0'), 'Alumno', 'Medición', 'Contadores', DATE '2019-01-01'
+            FROM generate_series(1, %s) AS n
+            RETURNING alumno_id
+        ),
+        grupos_escuela AS (
+            SELECT grupo_id, ROW_NUMBER() OVER (ORDER BY grupo_id) - 1 AS k
+            FROM grupos WHERE escuela_id = %s
+        )
+        INSERT INTO inscripciones (alumno_id, escuela_id, ciclo_id, grado_id, grupo_id, status)
+        SELECT n.alumno_id, %s, %s, 1, g.grupo_id, 'pendiente'
+        FROM nuevos n
+        INNER JOIN grupos_escuela g ON g.k = n.alumno_id %% %s
+    """, (escuela_id, alumnos, escuela_id, escuela_id, ciclo_id, grupos))
+    return escuela_id
+
+
+def _borrar_escuela(conn, escuela_id):
+    """Borrar la escuela de prueba (grupos, inscripciones y contadores se van en cascada)"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM alumnos
+            WHERE alumno_id IN (SELECT alumno_id FROM inscripciones WHERE escuela_id = %s)
+        """, (escuela_id,))
+        cursor.execute("DELETE FROM escuelas WHERE escuela_id = %s", (escuela_id,))
+        conn.commit()
+    except DatabaseError as e:
+        print(f"⚠️ No se pudo borrar la escuela de medición {escuela_id}: {e}")
+        conn.rollback()
+
+
+def _medir_cambios(cursor, escuela_id, alumnos, verificar=True):
+    """Aceptar y regresar a pendiente todas las inscripciones de la escuela; ms de cada UPDATE"""
+    tiempos = []
+    for status, esperado in (('aceptado', alumnos), ('pendiente', 0)):
+        inicio = time.perf_counter()
+        cursor.execute("UPDATE inscripciones SET status = %s WHERE escuela_id = %s", (status, escuela_id))
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if not verificar:
+            continue
+
+        cursor.execute("""
+            SELECT
+                (SELECT SUM(alumnos_inscritos) FROM grupos WHERE escuela_id = %s) AS en_grupos,
+                c.aceptados,
+                c.alumnos_en_grupos
+            FROM contadores_escuela c
+            WHERE c.escuela_id = %s
+        """, (escuela_id, escuela_id))
+        f = cursor.fetchone()
+        if (f['en_grupos'], f['aceptados'], f['alumnos_en_grupos']) != (esperado, esperado, esperado):
+            raise RuntimeError(f"Contadores incorrectos tras pasar a {status}: {dict(f)} (esperado {esperado})")
+    return tiempos
+
+
+def medir_contadores(alumnos=2000, grupos=20, repeticiones=3):
+    """
+    Medir aceptar/regresar en bloque `alumnos` inscripciones repartidas en
+    `grupos` grupos con los triggers por sentencia, con los de por fila y sin
+    triggers. Retorna dict con los ms (mediana de aceptar y de regresar) de
+    cada caso o None si falla.
+    """
+    ciclo_id = catalogo_model.obtener_ciclo_activo_id()
+    casos = (
+        ('por_sentencia', None),
+        ('por_fila', TRIGGERS_POR_FILA),
+        # Referencia: el mismo UPDATE sin triggers de usuario (las llaves foráneas siguen)
+        ('sin_triggers', "ALTER TABLE inscripciones DISABLE TRIGGER USER"),
+    )
+    conn = None
+    escuela_id = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        # Los datos se confirman antes de medir: las llaves foráneas se revisan
+        # de nuevo en cada UPDATE si la fila se insertó en la misma transacción
+        escuela_id = _crear_escuela(cursor, ciclo_id, alumnos, grupos)
+        conn.commit()
+
+        resultado = {'alumnos': alumnos, 'grupos': grupos}
+        for caso, preparar in casos:
+            aceptar, regresar = [], []
+            for _ in range(repeticiones):
+                if preparar:
+                    cursor.execute(preparar)
+                ms_aceptar, ms_regresar = _medir_cambios(cursor, escuela_id, alumnos, verificar=caso != 'sin_triggers')
+                conn.rollback()
+                aceptar.append(ms_aceptar)
+                regresar.append(ms_regresar)
+            resultado[caso] = (round(statistics.median(aceptar), 1), round(statistics.median(regresar), 1))
+        return resultado
+    except (DatabaseError, RuntimeError) as e:
+        print(f"❌ Error al medir los contadores: {e}")
+        return None
+    finally:
+        if conn:
+            conn.rollback()
+            if escuela_id:
+                _borrar_escuela(conn, escuela_id)
+            conn.close()
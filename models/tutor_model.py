@@ -1,6 +1,12 @@
-from models.database import get_connection
+from models.database import get_connection, registrar_consulta, ejecutar_consulta, lectura_en_replica
+from models.usuario_model import invalidar_principal
 from psycopg2 import DatabaseError
 
+TUTOR_POR_USUARIO = registrar_consulta(
+    'tutor_por_usuario',
+    "SELECT * FROM tutores WHERE usuario_id = %s"
+)
+
 def registrar_tutor(usuario_id, nombre, apellido_paterno, apellido_materno, telefono, edad):
     """Registrar nuevo tutor - retorna tutor_id o None"""
     conn = None
@@ -22,6 +28,7 @@ def registrar_tutor(usuario_id, nombre, apellido_paterno, apellido_materno, tele
         # ✅ Acceso como diccionario
         tutor_id = resultado['tutor_id']
         conn.commit()
+        invalidar_principal(usuario_id)
         
         print(f"✅ Tutor registrado exitosamente con ID: {tutor_id}")
         return tutor_id
@@ -37,20 +44,24 @@ def registrar_tutor(usuario_id, nombre, apellido_paterno, apellido_materno, tele
 
 def obtener_tutor_por_usuario(usuario_id):
     """Obtener tutor por ID de usuario - retorna dict o None"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tutores WHERE usuario_id = %s", (usuario_id,))
+        ejecutar_consulta(cursor, TUTOR_POR_USUARIO, (usuario_id,))
         tutor = cursor.fetchone()
         return tutor
     except DatabaseError as e:
         print(f"Error al obtener tutor: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
+@lectura_en_replica
 def obtener_alumnos_de_tutor(tutor_id):
     """Obtener todos los alumnos de un tutor - retorna lista de dicts"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -75,10 +86,12 @@ def obtener_alumnos_de_tutor(tutor_id):
         print(f"Error al obtener alumnos: {e}")
         return []
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 def tutor_existe(usuario_id):
     """Validar si el tutor ya está registrado"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -89,4 +102,5 @@ def tutor_existe(usuario_id):
         print(f"Error al validar tutor: {e}")
         return False
     finally:
-        conn.close()
\ No newline at end of file
+        if conn:
+            conn.close()
\ No newline at end of file
@@ -1,8 +1,41 @@
-from models.database import get_connection
+from models.database import get_connection, registrar_consulta, ejecutar_consulta, al_confirmar
+from models import existencia_model, escucha_bd
+from models.cache import obtener, guardar, descartar, invalidar
 from psycopg2 import DatabaseError
+import os
+
+ESPACIO_PRINCIPAL = 'principal'
+PRINCIPAL_TTL = float(os.getenv('PRINCIPAL_TTL', 30))
+CANAL_PRINCIPAL = 'principal_cambio'
+
+_COLUMNAS_TUTOR = (
+    'tutor_id', 'nombre', 'apellido_paterno', 'apellido_materno', 'parentesco', 'telefono',
+    'correo', 'direccion', 'curp', 'identificacion_oficial', 'edad', 'created_at',
+)
+_COLUMNAS_ESCUELA = (
+    'escuela_id', 'cct', 'nombre', 'direccion', 'municipio', 'entidad', 'turno',
+    'zona_escolar', 'cupo_total', 'telefono', 'correo_contacto', 'activo',
+)
+
+# Usuario + su registro de tutor + la escuela que dirige, en una sola consulta
+PRINCIPAL = registrar_consulta('principal', f"""
+    SELECT u.usuario_id, u.correo, u.nombre, u.apellido_paterno, u.apellido_materno, u.rol, u.activo,
+           {', '.join(f't.{c} AS tutor__{c}' for c in _COLUMNAS_TUTOR)},
+           {', '.join(f'e.{c} AS escuela__{c}' for c in _COLUMNAS_ESCUELA)}
+    FROM usuarios u
+    LEFT JOIN tutores t ON t.usuario_id = u.usuario_id
+    LEFT JOIN LATERAL (
+        SELECT * FROM escuelas
+        WHERE director_usuario_id = u.usuario_id AND activo = TRUE
+        ORDER BY escuela_id
+        LIMIT 1
+    ) e ON TRUE
+    WHERE u.usuario_id = %s
+""")
 
 def obtener_usuario_por_correo(correo):
     """Buscar usuario por correo - retorna dict o None"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -13,7 +46,8 @@ def obtener_usuario_por_correo(correo):
         print(f"Error al obtener usuario: {e}")
         return None
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 def registrar_usuario(nombre, apellido_paterno, apellido_materno, correo, password_hash, rol):
     """Registrar nuevo usuario - retorna usuario_id o None"""
@@ -40,6 +74,7 @@ def registrar_usuario(nombre, apellido_paterno, apellido_materno, correo, passwo
         # ✅ Acceso como diccionario
         usuario_id = resultado['usuario_id']
         conn.commit()
+        existencia_model.registrar_alta('correo', correo)
         
         print(f"✅ Usuario registrado exitosamente con ID: {usuario_id}")
         return usuario_id
@@ -55,20 +90,27 @@ def registrar_usuario(nombre, apellido_paterno, apellido_materno, correo, passwo
 
 def correo_existe(correo):
     """Validar si el correo ya está registrado"""
+    # Filtro de Bloom: un negativo es definitivo y no toca la BD
+    if not existencia_model.posiblemente_existe('correo', correo):
+        return False
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT 1 FROM usuarios WHERE correo = %s", (correo,))
         existe = cursor.fetchone() is not None
+        existencia_model.anotar_confirmacion('correo', existe)
         return existe
     except DatabaseError as e:
         print(f"Error al validar correo: {e}")
         return False
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 def obtener_password_hash(usuario_id):
     """Obtener hash de contraseña por ID"""
+    conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -80,4 +122,65 @@ def obtener_password_hash(usuario_id):
         print(f"Error al obtener hash: {e}")
         return None
     finally:
-        conn.close()
\ No newline at end of file
+        if conn:
+            conn.close()
+
+# 🪪 Obtener usuario con su tutor y escuela (principal de la sesión)
+def obtener_principal(usuario_id):
+    """
+    Obtener usuario + tutor + escuela dirigida - retorna dict o None.
+    Se guarda PRINCIPAL_TTL segundos en el cache por usuario_id; los cambios
+    de rol, activo, tutor o escuela lo descartan en todos los nodos por
+    LISTEN/NOTIFY. Sin escucha activa se lee siempre de la BD.
+    """
+    escucha_bd.asegurar()
+    con_escucha = escucha_bd.conectado()
+    if con_escucha:
+        principal = obtener(ESPACIO_PRINCIPAL, str(usuario_id))
+        if principal is not None:
+            return principal
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        ejecutar_consulta(cursor, PRINCIPAL, (usuario_id,))
+        fila = cursor.fetchone()
+    except DatabaseError as e:
+        print(f"Error al obtener principal: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+    if fila is None:
+        return None
+
+    principal = {'tutor': {}, 'escuela': {}}
+    for columna, valor in fila.items():
+        prefijo, _, nombre = columna.partition('__')
+        if nombre:
+            principal[prefijo][nombre] = valor
+        else:
+            principal[columna] = valor
+    if principal['tutor']['tutor_id'] is None:
+        principal['tutor'] = None
+    else:
+        principal['tutor']['usuario_id'] = usuario_id
+    if principal['escuela']['escuela_id'] is None:
+        principal['escuela'] = None
+    if con_escucha:
+        guardar(ESPACIO_PRINCIPAL, str(usuario_id), principal, PRINCIPAL_TTL)
+    return principal
+
+def invalidar_principal(usuario_id):
+    """Descartar el principal cacheado (tras confirmar cambios de usuario, tutor o escuela)"""
+    al_confirmar(lambda: descartar(ESPACIO_PRINCIPAL, str(usuario_id)))
+
+
+# ===== INVALIDACIÓN ENTRE NODOS (LISTEN/NOTIFY) =====
+
+def _al_reconectar():
+    # Mientras no se escuchaba pudo perderse algún aviso
+    invalidar(ESPACIO_PRINCIPAL)
+
+
+escucha_bd.suscribir(CANAL_PRINCIPAL, lambda usuario_id: descartar(ESPACIO_PRINCIPAL, usuario_id), _al_reconectar)
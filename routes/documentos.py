@@ -7,8 +7,9 @@ from models.documento_model import (
     documento_entregado,
     resumen_documental
 )
-from models.alumno_model import obtener_alumnos_por_tutor
-from models.tutor_model import obtener_tutor_por_usuario
+from models.alumno_model import obtener_alumno_por_id
+from utils.principal import tutor_actual
+from utils.autorizacion import tutor_tiene_alumno
 from utils.decorators import login_requerido, tutor_requerido
 from datetime import datetime
 
@@ -19,21 +20,18 @@ documentos_bp = Blueprint("documentos", __name__)
 @tutor_requerido
 def ver_documentos(alumno_id):
     """Ver checklist de documentos de un alumno"""
-    usuario_id = session.get('usuario_id')
-    
     # Obtener tutor
-    tutor = obtener_tutor_por_usuario(usuario_id)
+    tutor = tutor_actual()
     if not tutor:
         flash("No se encontró información del tutor", "error")
-        return redirect(url_for('panel_tutor_bp.panel_tutor'))
+        return redirect(url_for('panel_tutor.panel_tutor'))
     
     # Verificar que el alumno pertenezca al tutor
-    alumnos = obtener_alumnos_por_tutor(tutor['tutor_id'])
-    alumno = next((a for a in alumnos if a['alumno_id'] == alumno_id), None)
+    alumno = obtener_alumno_por_id(alumno_id) if tutor_tiene_alumno(alumno_id, tutor['tutor_id']) else None
     
     if not alumno:
         flash("No tienes permisos para ver los documentos de este alumno", "error")
-        return redirect(url_for('panel_tutor_bp.panel_tutor'))
+        return redirect(url_for('panel_tutor.panel_tutor'))
     
     # Obtener checklist de documentos
     checklist = obtener_checklist_documental(alumno_id)
@@ -57,18 +55,17 @@ def registrar_documento_route(alumno_id):
     usuario_id = session.get('usuario_id')
     
     # Obtener tutor
-    tutor = obtener_tutor_por_usuario(usuario_id)
+    tutor = tutor_actual()
     if not tutor:
         flash("No se encontró información del tutor", "error")
-        return redirect(url_for('panel_tutor_bp.panel_tutor'))
+        return redirect(url_for('panel_tutor.panel_tutor'))
     
     # Verificar que el alumno pertenezca al tutor
-    alumnos = obtener_alumnos_por_tutor(tutor['tutor_id'])
-    alumno = next((a for a in alumnos if a['alumno_id'] == alumno_id), None)
+    alumno = obtener_alumno_por_id(alumno_id) if tutor_tiene_alumno(alumno_id, tutor['tutor_id']) else None
     
     if not alumno:
         flash("No tienes permisos para registrar documentos de este alumno", "error")
-        return redirect(url_for('panel_tutor_bp.panel_tutor'))
+        return redirect(url_for('panel_tutor.panel_tutor'))
     
     fecha_maxima = datetime.now().strftime('%Y-%m-%d')
 
@@ -140,4 +137,4 @@ def eliminar_documento_route(documento_id):
         flash("Error al eliminar el documento o sin permisos", "error")
     
     # Redirigir a la página anterior
-    return redirect(request.referrer or url_for('panel_tutor_bp.panel_tutor'))
\ No newline at end of file
+    return redirect(request.referrer or url_for('panel_tutor.panel_tutor'))
\ No newline at end of file
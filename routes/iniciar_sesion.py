@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, flash, url_for, session
 from models.database import get_connection
+from models.usuario_model import invalidar_principal
 from werkzeug.security import check_password_hash
 from datetime import datetime
 
@@ -55,6 +56,7 @@ def iniciar_sesion():
                 WHERE usuario_id = %s
             """, (datetime.now(), usuario['usuario_id']))
             conn.commit()
+            invalidar_principal(usuario['usuario_id'])
             
             # Crear sesión
             session['usuario_id'] = usuario['usuario_id']
@@ -2,23 +2,28 @@ from flask import Blueprint, render_template, request, redirect, session, flash,
 from models.inscripcion_model import (
     crear_inscripcion, obtener_escuelas_disponibles, 
     obtener_ciclo_activo, obtener_grados,
-    puede_inscribirse_alumno, obtener_inscripciones_por_tutor
+    puede_inscribirse_alumno, obtener_inscripciones_por_tutor,
+    matriz_elegibilidad
 )
-from models.alumno_model import obtener_alumnos_por_tutor
-from models.tutor_model import obtener_tutor_por_usuario
+from models.alumno_model import obtener_alumnos_por_tutor, obtener_ids_alumnos_de_tutor
+from models.catalogo_model import obtener_escuelas_activas
+from models.database import presupuesto_bd
 from utils.decorators import login_requerido, tutor_requerido
+from utils.principal import tutor_actual
+from utils.autorizacion import tutor_tiene_alumno
 
 inscripcion_bp = Blueprint("inscripcion", __name__)
 
+ESCUELAS_ALTERNATIVAS = 2   # opciones además de la escuela principal
+MAXIMO_ALUMNOS_ELEGIBILIDAD = 20   # ?alumno= por consulta de elegibilidad
+
 @inscripcion_bp.route("/inscripcion")
 @login_requerido
 @tutor_requerido
 def inscripcion():
     """Mostrar formulario de inscripción"""
-    usuario_id = session.get('usuario_id')
-    
     # Obtener información del tutor
-    tutor = obtener_tutor_por_usuario(usuario_id)
+    tutor = tutor_actual()
     if not tutor:
         flash("No se encontró información del tutor", "error")
         return redirect(url_for('panel_tutor.panel_tutor'))
@@ -50,7 +55,8 @@ def inscripcion():
                          alumnos=alumnos,
                          escuelas=escuelas,
                          ciclo_activo=ciclo_activo,
-                         grados=grados)
+                         grados=grados,
+                         opciones_alternativas=range(2, ESCUELAS_ALTERNATIVAS + 2))
 
 @inscripcion_bp.route("/inscripcion/solicitar", methods=["POST"])
 @login_requerido
@@ -73,10 +79,31 @@ def solicitar_inscripcion():
         alumno_id = int(alumno_id)
         escuela_id = int(escuela_id)
         grado_id = int(grado_id)
+        # "-- Ninguna --" llega vacío
+        elegidas = [int(e) for e in request.form.getlist('escuela_alternativa') if e]
     except ValueError:
         flash("Datos inválidos", "error")
         return redirect(url_for('inscripcion.inscripcion'))
     
+    # Escuelas de segunda y tercera opción (sin repetir la principal)
+    alternativas = []
+    for alternativa in elegidas:
+        if alternativa != escuela_id and alternativa not in alternativas:
+            alternativas.append(alternativa)
+    alternativas = alternativas[:ESCUELAS_ALTERNATIVAS]
+    
+    # Solo escuelas activas: una inexistente rompería la llave foránea y una
+    # inactiva se guardaría para luego ignorarse en la asignación
+    activas = {e['escuela_id'] for e in obtener_escuelas_activas() or ()}
+    if any(alternativa not in activas for alternativa in alternativas):
+        flash("Alguna de las escuelas de otra opción no existe o ya no recibe solicitudes. Elige otra.", "error")
+        return redirect(url_for('inscripcion.inscripcion'))
+    
+    # Verificar que el alumno pertenezca al tutor
+    if not tutor_tiene_alumno(alumno_id):
+        flash("No tienes permisos para inscribir a este alumno", "error")
+        return redirect(url_for('inscripcion.inscripcion'))
+    
     # Obtener ciclo activo
     ciclo = obtener_ciclo_activo()
     if not ciclo:
@@ -100,7 +127,8 @@ def solicitar_inscripcion():
         escuela_id=escuela_id,
         ciclo_id=ciclo['ciclo_id'],
         grado_id=grado_id,
-        usuario_responsable=usuario_id
+        usuario_responsable=usuario_id,
+        alternativas=alternativas
     )
     
     if inscripcion_id:
@@ -115,9 +143,7 @@ def solicitar_inscripcion():
 @tutor_requerido
 def mis_inscripciones():
     """Mostrar historial de inscripciones del tutor"""
-    usuario_id = session.get('usuario_id')
-    
-    tutor = obtener_tutor_por_usuario(usuario_id)
+    tutor = tutor_actual()
     if not tutor:
         flash("No se encontró información del tutor", "error")
         return redirect(url_for('inicio.inicio'))
@@ -131,10 +157,44 @@ def mis_inscripciones():
 @inscripcion_bp.route("/verificar-elegibilidad/<int:alumno_id>/<int:escuela_id>")
 @login_requerido
 @tutor_requerido
+@presupuesto_bd('ajax')
 def verificar_elegibilidad(alumno_id, escuela_id):
     """Endpoint AJAX para verificar si un alumno puede inscribirse"""
+    if not tutor_tiene_alumno(alumno_id):
+        return {
+            "puede_inscribirse": False,
+            "mensaje": "No tienes permisos sobre este alumno"
+        }, 403
     puede, mensaje = puede_inscribirse_alumno(alumno_id, escuela_id)
     return {
         "puede_inscribirse": puede,
         "mensaje": mensaje
-    }
\ No newline at end of file
+    }
+
+@inscripcion_bp.route("/elegibilidad")
+@login_requerido
+@tutor_requerido
+@presupuesto_bd('ajax')
+def elegibilidad_alumnos():
+    """
+    Endpoint AJAX: elegibilidad de los alumnos del tutor (o los de ?alumno=)
+    contra todas las escuelas activas, en una sola consulta
+    """
+    tutor = tutor_actual()
+    if not tutor:
+        return {"mensaje": "No se encontró información del tutor"}, 403
+    pedidos = list(dict.fromkeys(request.args.getlist('alumno', type=int)))
+    if len(pedidos) > MAXIMO_ALUMNOS_ELEGIBILIDAD:
+        return {"mensaje": f"Máximo {MAXIMO_ALUMNOS_ELEGIBILIDAD} alumnos por consulta"}, 400
+    propios = obtener_ids_alumnos_de_tutor(tutor['tutor_id']) or frozenset()
+    if pedidos:
+        # Un alumno ajeno fuerza a releer de la BD una sola vez por petición
+        if any(a not in propios for a in pedidos):
+            propios = obtener_ids_alumnos_de_tutor(tutor['tutor_id'], refrescar=True) or frozenset()
+        alumno_ids = [a for a in pedidos if a in propios]
+    else:
+        alumno_ids = sorted(propios)
+    matriz = matriz_elegibilidad(alumno_ids)
+    if matriz is None:
+        return {"mensaje": "Error al verificar elegibilidad"}, 500
+    return matriz
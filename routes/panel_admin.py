@@ -1,40 +1,100 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
+from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
 from models.inscripcion_model import (
-    obtener_inscripciones_pendientes,
     cambiar_estado_inscripcion,
+    aceptar_inscripcion,
+    aceptar_sin_grupo,
+    revisar_inscripciones_lote,
     obtener_grupos_disponibles,
     obtener_estadisticas_inscripciones,
     obtener_inscripcion_detalle,
-    obtener_todas_inscripciones
+    recorrer_pagina_inscripciones,
+    recorrer_inscripciones_pendientes,
+    contar_inscripciones_aproximado,
+    recorrer_inscripciones
 )
-from utils.decorators import login_requerido
-from functools import wraps
+from models.documento_model import recorrer_documentos_pendientes
+from models.catalogo_model import obtener_grados
+from models.database import obtener_metricas_sql, presupuesto_bd, ERRORES_CONFLICTO
+from models.cache import obtener_metricas_cache
+from models import existencia_model
+from utils.decorators import login_requerido, sep_admin_requerido, admin_requerido
+from utils.principal import rol_actual, escuela_actual
+from utils.listados import filtros_inscripciones, total_de_pagina_unica
+from utils.exportar import respuesta_exportacion, formato_solicitado
+from utils.flujo import plantilla_en_flujo, FilasEnFlujo
 
 panel_admin_bp = Blueprint("panel_admin", __name__)
 
-def admin_requerido(f):
-    """Decorador para rutas que solo pueden acceder administradores/directores"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        rol = session.get('rol')
-        if rol not in ['sep_admin', 'director']:
-            flash("No tienes permisos para acceder a esta página", "error")
-            return redirect(url_for('inicio.inicio'))
-        return f(*args, **kwargs)
-    return decorated_function
+PENDIENTES_EN_PANEL = 20
+MAXIMO_REVISION_LOTE = 500   # inscripciones por revisión en lote
+
+# 💬 Mensaje por resultado de la revisión en lote
+MENSAJES_LOTE = {
+    'aceptado': 'Aceptada',
+    'rechazado': 'Rechazada',
+    'en_revision': 'En revisión',
+    'sin_cupo': 'Sin lugares en los grupos del grado',
+    'ya_revisada': 'Ya había sido revisada',
+    'sin_permiso': 'No pertenece a tu escuela',
+    'no_encontrada': 'No existe',
+}
+
+# 📤 Columnas de las exportaciones (campo, encabezado)
+COLUMNAS_INSCRIPCIONES = (
+    ('inscripcion_id', 'Folio'),
+    ('status', 'Estado'),
+    ('fecha_solicitud', 'Fecha de solicitud'),
+    ('fecha_revision', 'Fecha de revisión'),
+    ('curp', 'CURP'),
+    ('alumno_nombre', 'Alumno'),
+    ('fecha_nacimiento', 'Fecha de nacimiento'),
+    ('edad', 'Edad'),
+    ('cct', 'CCT'),
+    ('escuela_nombre', 'Escuela'),
+    ('municipio', 'Municipio'),
+    ('ciclo_nombre', 'Ciclo'),
+    ('grado_descripcion', 'Grado'),
+    ('nombre_grupo', 'Grupo'),
+    ('tutor_nombre', 'Tutor'),
+    ('tutor_telefono', 'Teléfono del tutor'),
+    ('tutor_correo', 'Correo del tutor'),
+    ('motivo_rechazo', 'Motivo de rechazo'),
+    ('responsable_revision', 'Revisó'),
+)
+
+COLUMNAS_DOCUMENTOS_PENDIENTES = (
+    ('cct', 'CCT'),
+    ('escuela_nombre', 'Escuela'),
+    ('inscripcion_id', 'Folio'),
+    ('inscripcion_status', 'Estado de la inscripción'),
+    ('alumno_id', 'ID alumno'),
+    ('alumno_nombre', 'Alumno'),
+    ('tipo_documento', 'Documento'),
+    ('requerido', 'Requerido'),
+    ('status', 'Estado del documento'),
+    ('fecha_subida', 'Fecha de entrega'),
+    ('observaciones', 'Observaciones'),
+)
+
+def _escuela_id_director():
+    """Escuela del director en sesión; -1 (ninguna) si no tiene asignada"""
+    escuela = escuela_actual()
+    return escuela['escuela_id'] if escuela else -1
 
 @panel_admin_bp.route("/panel-admin")
 @login_requerido
 @admin_requerido
+@presupuesto_bd('reporte')
 def panel_admin():
     usuario_id = session.get('usuario_id')
-    rol = session.get('rol')
-    escuela_id = session.get('escuela_id') if rol == 'director' else None
+    rol = rol_actual()
+    escuela_id = _escuela_id_director() if rol == 'director' else None
 
-    inscripciones_pendientes = obtener_inscripciones_pendientes(escuela_id)
     estadisticas = obtener_estadisticas_inscripciones(escuela_id)
+    # Las pendientes se leen mientras se envía la página
+    inscripciones_pendientes = FilasEnFlujo(recorrer_inscripciones_pendientes(escuela_id, limite=PENDIENTES_EN_PANEL))
 
-    return render_template(
+    return plantilla_en_flujo(
         'panel_admin.html',
         inscripciones=inscripciones_pendientes,
         estadisticas=estadisticas,
@@ -44,22 +104,73 @@ def panel_admin():
 @panel_admin_bp.route("/admin/inscripciones")
 @login_requerido
 @admin_requerido
+@presupuesto_bd('reporte')
 def gestionar_inscripciones():
-    rol = session.get('rol')
-    escuela_id = session.get('escuela_id') if rol == 'director' else None
-    filtro_status = request.args.get('status')
+    rol = rol_actual()
+    escuela_id = _escuela_id_director() if rol == 'director' else None
+    filtros, filtros_url = filtros_inscripciones(request.args)
 
-    inscripciones = obtener_todas_inscripciones(escuela_id, filtro_status)
+    # Una página por llave (fecha_solicitud, inscripcion_id), leída mientras se envía;
+    # el total se calcula al final de la página (exacto si cabe en una sola)
+    pagina = recorrer_pagina_inscripciones(
+        escuela_id, filtros,
+        despues=request.args.get('despues'),
+        antes=request.args.get('antes')
+    )
     estadisticas = obtener_estadisticas_inscripciones(escuela_id)
 
-    return render_template(
+    return plantilla_en_flujo(
         'gestionar_inscripciones.html',
-        inscripciones=inscripciones,
+        inscripciones=pagina,
+        pagina=pagina,
+        contar_total=lambda: total_de_pagina_unica(pagina) or contar_inscripciones_aproximado(escuela_id, filtros),
         estadisticas=estadisticas,
-        filtro_actual=filtro_status,
+        grados=obtener_grados(),
+        filtros=filtros_url,
+        filtro_actual=filtros.get('status'),
         rol=rol
     )
 
+@panel_admin_bp.route("/admin/inscripciones/exportar")
+@login_requerido
+@admin_requerido
+@presupuesto_bd('reporte')
+def exportar_inscripciones():
+    """Inscripciones con los filtros del listado en CSV/XLSX (todo el estado para sep_admin)"""
+    rol = rol_actual()
+    escuela_id = _escuela_id_director() if rol == 'director' else None
+    filtros, _ = filtros_inscripciones(request.args)
+
+    respuesta = respuesta_exportacion(
+        recorrer_inscripciones(escuela_id, filtros),
+        COLUMNAS_INSCRIPCIONES,
+        'inscripciones',
+        formato_solicitado(request.args)
+    )
+    if respuesta is None:
+        flash("No se pudo generar la exportación, intenta de nuevo", "error")
+        return redirect(url_for('panel_admin.gestionar_inscripciones', **request.args))
+    return respuesta
+
+@panel_admin_bp.route("/admin/documentos-pendientes/exportar")
+@login_requerido
+@admin_requerido
+@presupuesto_bd('reporte')
+def exportar_documentos_pendientes():
+    """Documentos pendientes de revisar en CSV/XLSX (de la escuela del director o de todas)"""
+    escuela_id = _escuela_id_director() if rol_actual() == 'director' else None
+
+    respuesta = respuesta_exportacion(
+        recorrer_documentos_pendientes(escuela_id),
+        COLUMNAS_DOCUMENTOS_PENDIENTES,
+        'documentos_pendientes',
+        formato_solicitado(request.args)
+    )
+    if respuesta is None:
+        flash("No se pudo generar la exportación, intenta de nuevo", "error")
+        return redirect(url_for('panel_admin.panel_admin'))
+    return respuesta
+
 @panel_admin_bp.route("/admin/inscripcion/<int:inscripcion_id>")
 @login_requerido
 @admin_requerido
@@ -70,10 +181,9 @@ def detalle_inscripcion(inscripcion_id):
         flash("Inscripción no encontrada", "error")
         return redirect(url_for('panel_admin.panel_admin'))
 
-    rol = session.get('rol')
+    rol = rol_actual()
     if rol == 'director':
-        escuela_id = session.get('escuela_id')
-        if inscripcion['escuela_id'] != escuela_id:
+        if inscripcion['escuela_id'] != _escuela_id_director():
             flash("No tienes permisos para ver esta inscripción", "error")
             return redirect(url_for('panel_admin.panel_admin'))
 
@@ -119,28 +229,131 @@ def revisar_inscripcion(inscripcion_id):
         if not grupo_id:
             flash("Debe asignar un grupo al aceptar la inscripción", "error")
             return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
+        if grupo_id == 'auto':
+            # Aceptada sin grupo: la coloca después la colocación automática de la escuela
+            escuela_id = _escuela_id_director() if rol_actual() == 'director' else None
+            try:
+                resultado = aceptar_sin_grupo(inscripcion_id, usuario_id, escuela_id)
+            except ERRORES_CONFLICTO:
+                flash("Hay muchas aceptaciones simultáneas en esta escuela. Intenta de nuevo en unos segundos.", "warning")
+                return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
+            if resultado == 'aceptada':
+                flash("Inscripción aceptada; el grupo se asignará con la colocación automática", "success")
+            elif resultado == 'ya_aceptada':
+                flash("La inscripción ya había sido aceptada", "warning")
+            elif resultado == 'sin_cupo':
+                flash("No quedan lugares en los grupos de este grado", "error")
+                return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
+            elif resultado in ('ya_revisada', 'sin_permiso'):
+                flash(MENSAJES_LOTE[resultado], "error")
+            else:
+                flash("Error al procesar la inscripción", "error")
+            return redirect(url_for('panel_admin.panel_admin'))
         try:
             grupo_id = int(grupo_id)
         except ValueError:
             flash("ID de grupo inválido", "error")
             return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
 
+    if accion == 'aceptar':
+        # Apartar el lugar con bloqueo de fila; si el grupo se llenó se usa otro del mismo grado
+        try:
+            asignacion = aceptar_inscripcion(inscripcion_id, grupo_id, usuario_id)
+        except ERRORES_CONFLICTO:
+            flash("Hay muchas aceptaciones simultáneas en esta escuela. Intenta de nuevo en unos segundos.", "warning")
+            return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
+        if not asignacion or asignacion['resultado'] == 'no_encontrada':
+            flash("Error al procesar la inscripción", "error")
+        elif asignacion['resultado'] == 'sin_cupo':
+            flash("No quedan lugares en los grupos de este grado", "error")
+            return redirect(url_for('panel_admin.detalle_inscripcion', inscripcion_id=inscripcion_id))
+        elif asignacion['resultado'] == 'ya_aceptada':
+            flash("La inscripción ya había sido aceptada", "warning")
+        elif asignacion['grupo_id'] != grupo_id:
+            flash("El grupo elegido se llenó; la inscripción se aceptó en otro grupo del mismo grado", "warning")
+        else:
+            flash("Inscripción aceptada exitosamente", "success")
+        return redirect(url_for('panel_admin.panel_admin'))
+
     exito = cambiar_estado_inscripcion(
         inscripcion_id=inscripcion_id,
         nuevo_estado=nuevo_estado,
         revisado_por=usuario_id,
         motivo_rechazo=motivo_rechazo if accion == 'rechazar' else None,
-        grupo_id=grupo_id if accion == 'aceptar' else None
+        grupo_id=None
     )
 
     if exito:
         mensajes = {
             'revisar': 'Inscripción puesta en revisión',
-            'aceptar': 'Inscripción aceptada exitosamente',
             'rechazar': 'Inscripción rechazada'
         }
         flash(mensajes[accion], "success")
     else:
         flash("Error al procesar la inscripción", "error")
 
-    return redirect(url_for('panel_admin.panel_admin'))
\ No newline at end of file
+    return redirect(url_for('panel_admin.panel_admin'))
+
+@panel_admin_bp.route("/admin/inscripciones/revisar-lote", methods=["POST"])
+@login_requerido
+@admin_requerido
+def revisar_lote():
+    """
+    Aceptar, rechazar o pasar a revisión las inscripciones seleccionadas en
+    una sola operación (form: inscripcion=..., accion, motivo_rechazo,
+    grupo_id opcional). Responde JSON con el resultado de cada folio.
+    """
+    accion = request.form.get('accion')
+    motivo_rechazo = request.form.get('motivo_rechazo', '').strip()
+    grupo_id = request.form.get('grupo_id', type=int)
+    inscripcion_ids = list(dict.fromkeys(request.form.getlist('inscripcion', type=int)))
+
+    if accion not in ['aceptar', 'rechazar', 'revisar']:
+        return {"mensaje": "Acción inválida"}, 400
+    if not inscripcion_ids:
+        return {"mensaje": "Selecciona al menos una inscripción"}, 400
+    if len(inscripcion_ids) > MAXIMO_REVISION_LOTE:
+        return {"mensaje": f"Máximo {MAXIMO_REVISION_LOTE} inscripciones por lote"}, 400
+    if accion == 'rechazar' and not motivo_rechazo:
+        return {"mensaje": "Debe proporcionar un motivo de rechazo"}, 400
+
+    escuela_id = _escuela_id_director() if rol_actual() == 'director' else None
+    try:
+        resultados = revisar_inscripciones_lote(
+            inscripcion_ids,
+            accion,
+            session.get('usuario_id'),
+            escuela_id=escuela_id,
+            motivo_rechazo=motivo_rechazo if accion == 'rechazar' else None,
+            grupo_id=grupo_id if accion == 'aceptar' else None
+        )
+    except ERRORES_CONFLICTO:
+        return {"mensaje": "Hay muchas aceptaciones simultáneas en esta escuela. Intenta de nuevo en unos segundos."}, 409
+    if resultados is None:
+        return {"mensaje": "Error al procesar las inscripciones"}, 500
+
+    resumen = {}
+    for r in resultados:
+        resumen[r['resultado']] = resumen.get(r['resultado'], 0) + 1
+    return {
+        "resultados": {
+            r['inscripcion_id']: {
+                "resultado": r['resultado'],
+                "mensaje": MENSAJES_LOTE[r['resultado']] + (f" (grupo {r['nombre_grupo']})" if r['nombre_grupo'] else ''),
+                "grupo_id": r['grupo_id'],
+            }
+            for r in resultados
+        },
+        "resumen": resumen
+    }
+
+@panel_admin_bp.route("/admin/metricas-sql")
+@login_requerido
+@sep_admin_requerido
+def metricas_sql():
+    """Consultas por ruta, sentencias más costosas, patrones N+1, cache y filtros del worker actual"""
+    return jsonify(dict(
+        obtener_metricas_sql(),
+        cache=obtener_metricas_cache(),
+        filtros_existencia=existencia_model.resumen()
+    ))
@@ -1,42 +1,60 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request
 from models.escuela_model import (
-    obtener_escuela_por_director,
     obtener_estadisticas_escuela,
     obtener_grupos_escuela,
-    obtener_alumnos_por_grupo,
+    obtener_grupo,
+    recorrer_alumnos_por_grupo,
     crear_grupo,
     actualizar_grupo
 )
 from models.inscripcion_model import (
     obtener_inscripciones_pendientes,
-    obtener_todas_inscripciones
+    recorrer_pagina_inscripciones,
+    contar_inscripciones_aproximado,
+    elegibilidad_solicitudes
 )
+from models.catalogo_model import obtener_ciclo_activo_id, obtener_grados
+from models.colocacion_model import contar_aceptados_sin_grupo, colocar_aceptados_escuela
+from models.database import presupuesto_bd, ERRORES_CONFLICTO
 from utils.decorators import login_requerido, director_requerido
+from utils.principal import escuela_actual
+from utils.listados import filtros_inscripciones, total_de_pagina_unica
+from utils.exportar import respuesta_exportacion, formato_solicitado
+from utils.flujo import plantilla_en_flujo, FilasEnFlujo
 
 panel_director_bp = Blueprint("panel_director", __name__)
 
+PENDIENTES_EN_PANEL = 20
+MAXIMO_REVISION_LOTE = 500   # solicitudes por llamada a la revisión por lotes
+
+# 📤 Columnas de la lista de grupo exportada (campo, encabezado)
+COLUMNAS_LISTA_GRUPO = (
+    ('nombre_completo', 'Alumno'),
+    ('curp', 'CURP'),
+    ('fecha_nacimiento', 'Fecha de nacimiento'),
+    ('edad', 'Edad'),
+    ('tutor_nombre', 'Tutor'),
+    ('tutor_telefono', 'Teléfono del tutor'),
+    ('fecha_solicitud', 'Fecha de solicitud'),
+)
+
 @panel_director_bp.route("/panel-director")
 @login_requerido
 @director_requerido
 def panel_director():
     """Panel principal del director"""
-    usuario_id = session.get('usuario_id')
-    
     # Obtener la escuela del director
-    escuela = obtener_escuela_por_director(usuario_id)
+    escuela = escuela_actual()
     
     if not escuela:
         flash("No se encontró una escuela asignada a tu cuenta", "error")
         return redirect(url_for('inicio.inicio'))
     
-    # Guardar escuela_id en sesión para uso en otras rutas
-    session['escuela_id'] = escuela['escuela_id']
-    
     # Obtener estadísticas
     estadisticas = obtener_estadisticas_escuela(escuela['escuela_id'])
     
-    # Obtener inscripciones pendientes
-    inscripciones_pendientes = obtener_inscripciones_pendientes(escuela['escuela_id'])
+    # Obtener inscripciones pendientes (las más antiguas)
+    inscripciones_pendientes = obtener_inscripciones_pendientes(escuela['escuela_id'], limite=PENDIENTES_EN_PANEL)
     
     # Obtener grupos
     grupos = obtener_grupos_escuela(escuela['escuela_id'])
@@ -54,100 +72,163 @@ def panel_director():
 @director_requerido
 def gestionar_grupos():
     """Ver y gestionar todos los grupos de la escuela"""
-    escuela_id = session.get('escuela_id')
-    
-    if not escuela_id:
-        escuela = obtener_escuela_por_director(session.get('usuario_id'))
-        if not escuela:
-            flash("No se encontró tu escuela", "error")
-            return redirect(url_for('inicio.inicio'))
-        escuela_id = escuela['escuela_id']
-        session['escuela_id'] = escuela_id
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
     
-    escuela = obtener_escuela_por_director(session.get('usuario_id'))
-    grupos = obtener_grupos_escuela(escuela_id)
+    grupos = obtener_grupos_escuela(escuela['escuela_id'])
+    sin_grupo = sum(contar_aceptados_sin_grupo(escuela['escuela_id']).values())
     
     return render_template(
         'director_grupos.html',
         escuela=escuela,
-        grupos=grupos
+        grupos=grupos,
+        sin_grupo=sin_grupo
     )
 
+@panel_director_bp.route("/director/grupos/colocar", methods=["POST"])
+@login_requerido
+@director_requerido
+def colocar_aceptados_route():
+    """Colocar en grupos a los alumnos aceptados que aún no tienen grupo"""
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
+    
+    try:
+        resultado = colocar_aceptados_escuela(escuela['escuela_id'])
+    except ERRORES_CONFLICTO:
+        resultado = None
+    
+    if resultado is None:
+        flash("Error al colocar a los alumnos. Intenta de nuevo en unos segundos.", "error")
+    elif not resultado['colocadas'] and not resultado['sin_lugar']:
+        flash("No hay alumnos aceptados sin grupo", "info")
+    elif resultado['sin_lugar']:
+        flash(f"Se colocaron {resultado['colocadas']} alumno(s); {resultado['sin_lugar']} quedaron sin grupo por falta de lugares", "warning")
+    else:
+        flash(f"Se colocaron {resultado['colocadas']} alumno(s) en {len(resultado['por_grupo'])} grupo(s)", "success")
+    
+    return redirect(url_for('panel_director.gestionar_grupos'))
+
 @panel_director_bp.route("/director/grupo/<int:grupo_id>")
 @login_requerido
 @director_requerido
 def ver_grupo(grupo_id):
     """Ver detalles de un grupo específico"""
-    escuela_id = session.get('escuela_id')
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
+    escuela_id = escuela['escuela_id']
     
     # Verificar que el grupo pertenezca a la escuela del director
-    alumnos = obtener_alumnos_por_grupo(grupo_id)
-    
-    # Obtener información del grupo
-    from models.database import get_connection
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            gr.grupo_id,
-            gr.nombre_grupo,
-            gr.cupo,
-            gr.alumnos_inscritos,
-            g.nivel AS grado_nivel,
-            g.descripcion AS grado_descripcion,
-            u.nombre || ' ' || u.apellido_paterno AS docente_nombre,
-            c.nombre AS ciclo_nombre
-        FROM grupos gr
-        INNER JOIN grados g ON gr.grado_id = g.grado_id
-        INNER JOIN ciclos c ON gr.ciclo_id = c.ciclo_id
-        LEFT JOIN usuarios u ON gr.docente_usuario_id = u.usuario_id
-        WHERE gr.grupo_id = %s AND gr.escuela_id = %s
-    """, (grupo_id, escuela_id))
-    
-    grupo = cursor.fetchone()
-    conn.close()
-    
+    grupo = obtener_grupo(grupo_id, escuela_id)
     if not grupo:
         flash("Grupo no encontrado o no pertenece a tu escuela", "error")
         return redirect(url_for('panel_director.gestionar_grupos'))
     
-    escuela = obtener_escuela_por_director(session.get('usuario_id'))
-    
-    return render_template(
-        'director_grupo_detalle.html',
+    # La lista se lee mientras se envía la página
+    return plantilla_en_flujo(
+        'director_grupos_detalles.html',
         grupo=grupo,
-        alumnos=alumnos,
+        alumnos=FilasEnFlujo(recorrer_alumnos_por_grupo(grupo_id, escuela_id)),
         escuela=escuela
     )
 
+@panel_director_bp.route("/director/grupo/<int:grupo_id>/exportar")
+@login_requerido
+@director_requerido
+@presupuesto_bd('reporte')
+def exportar_grupo(grupo_id):
+    """Lista de alumnos del grupo en CSV/XLSX"""
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
+    
+    # Solo filas del grupo dentro de la escuela del director
+    respuesta = respuesta_exportacion(
+        recorrer_alumnos_por_grupo(grupo_id, escuela['escuela_id']),
+        COLUMNAS_LISTA_GRUPO,
+        f'grupo_{grupo_id}',
+        formato_solicitado(request.args)
+    )
+    if respuesta is None:
+        flash("No se pudo generar la exportación, intenta de nuevo", "error")
+        return redirect(url_for('panel_director.ver_grupo', grupo_id=grupo_id))
+    return respuesta
+
 @panel_director_bp.route("/director/inscripciones")
 @login_requerido
 @director_requerido
+@presupuesto_bd('reporte')
 def ver_inscripciones():
     """Ver todas las inscripciones de la escuela"""
-    escuela_id = session.get('escuela_id')
-    filtro_status = request.args.get('status')
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
+    escuela_id = escuela['escuela_id']
+    filtros, filtros_url = filtros_inscripciones(request.args)
     
-    escuela = obtener_escuela_por_director(session.get('usuario_id'))
-    inscripciones = obtener_todas_inscripciones(escuela_id, filtro_status)
+    # Una página por llave (fecha_solicitud, inscripcion_id), leída mientras se envía;
+    # el total se calcula al final de la página (exacto si cabe en una sola)
+    pagina = recorrer_pagina_inscripciones(
+        escuela_id, filtros,
+        despues=request.args.get('despues'),
+        antes=request.args.get('antes')
+    )
     estadisticas = obtener_estadisticas_escuela(escuela_id)
     
-    return render_template(
+    return plantilla_en_flujo(
         'director_inscripciones.html',
         escuela=escuela,
-        inscripciones=inscripciones,
+        inscripciones=pagina,
+        pagina=pagina,
+        contar_total=lambda: total_de_pagina_unica(pagina) or contar_inscripciones_aproximado(escuela_id, filtros),
         estadisticas=estadisticas,
-        filtro_actual=filtro_status
+        grados=obtener_grados(),
+        grupos=obtener_grupos_escuela(escuela_id),
+        filtros=filtros_url,
+        filtro_actual=filtros.get('status')
     )
 
+@panel_director_bp.route("/director/inscripciones/elegibilidad")
+@login_requerido
+@director_requerido
+@presupuesto_bd('ajax')
+def revisar_solicitudes():
+    """
+    Endpoint AJAX: revisión por lotes de solicitudes (?inscripcion=...) de la
+    escuela del director, en una sola consulta
+    """
+    escuela = escuela_actual()
+    if not escuela:
+        return {"mensaje": "No se encontró tu escuela"}, 403
+    inscripcion_ids = request.args.getlist('inscripcion', type=int)[:MAXIMO_REVISION_LOTE]
+    revision = elegibilidad_solicitudes(inscripcion_ids, escuela['escuela_id'])
+    if revision is None:
+        return {"mensaje": "Error al revisar las solicitudes"}, 500
+    return {
+        "solicitudes": {
+            inscripcion_id: [f['puede_inscribirse'], f['mensaje']]
+            for inscripcion_id, f in revision.items()
+        }
+    }
+
 @panel_director_bp.route("/director/crear-grupo", methods=["GET", "POST"])
 @login_requerido
 @director_requerido
 def crear_grupo_route():
     """Crear un nuevo grupo en la escuela"""
-    escuela_id = session.get('escuela_id')
-    escuela = obtener_escuela_por_director(session.get('usuario_id'))
+    escuela = escuela_actual()
+    if not escuela:
+        flash("No se encontró tu escuela", "error")
+        return redirect(url_for('inicio.inicio'))
+    escuela_id = escuela['escuela_id']
     
     if request.method == "POST":
         grado_id = request.form.get('grado_id')
@@ -170,21 +251,16 @@ def crear_grupo_route():
             return redirect(url_for('panel_director.crear_grupo_route'))
         
         # Obtener ciclo activo
-        from models.database import get_connection
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1")
-        ciclo = cursor.fetchone()
-        conn.close()
+        ciclo_id = obtener_ciclo_activo_id()
         
-        if not ciclo:
+        if not ciclo_id:
             flash("No hay ciclo escolar activo", "error")
             return redirect(url_for('panel_director.crear_grupo_route'))
         
         grupo_id = crear_grupo(
             escuela_id=escuela_id,
             grado_id=grado_id,
-            ciclo_id=ciclo['ciclo_id'],
+            ciclo_id=ciclo_id,
             nombre_grupo=nombre_grupo,
             cupo=cupo
         )
@@ -196,12 +272,7 @@ def crear_grupo_route():
             flash("Error al crear el grupo", "error")
     
     # GET - Mostrar formulario
-    from models.database import get_connection
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT grado_id, nivel, descripcion FROM grados ORDER BY nivel")
-    grados = cursor.fetchall()
-    conn.close()
+    grados = obtener_grados()
     
     return render_template(
         'director_crear_grupo.html',
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash
-from models.tutor_model import obtener_tutor_por_usuario, obtener_alumnos_de_tutor
-from models.documento_model import obtener_checklist_documental
+from flask import Blueprint, render_template, redirect, url_for, flash
+from models.tutor_model import obtener_alumnos_de_tutor
+from models.documento_model import obtener_checklist_documental_many
 from utils.decorators import login_requerido, tutor_requerido
+from utils.principal import tutor_actual
 
 panel_tutor_bp = Blueprint("panel_tutor", __name__)
 
@@ -10,10 +11,8 @@ panel_tutor_bp = Blueprint("panel_tutor", __name__)
 @tutor_requerido
 def panel_tutor():
     """Panel principal del tutor"""
-    usuario_id = session.get('usuario_id')
-    
     # Obtener información del tutor
-    tutor = obtener_tutor_por_usuario(usuario_id)
+    tutor = tutor_actual()
     
     if not tutor:
         flash("No se encontró información del tutor. Por favor contacte al administrador.", "error")
@@ -22,12 +21,13 @@ def panel_tutor():
     # Obtener alumnos (hijos) del tutor
     hijos = obtener_alumnos_de_tutor(tutor['tutor_id'])
     
-    # Obtener documentos de cada hijo
+    # Obtener documentos de todos los hijos en una sola consulta
+    checklists = obtener_checklist_documental_many([hijo['alumno_id'] for hijo in hijos])
     documentos = {}
     documentos_pendientes_total = 0
     
     for hijo in hijos:
-        checklist = obtener_checklist_documental(hijo['alumno_id'])
+        checklist = checklists.get(hijo['alumno_id'], [])
         documentos[hijo['alumno_id']] = [
             {
                 'nombre': doc['tipo_documento'],
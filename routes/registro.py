@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, flash, session
 from models.usuario_model import registrar_usuario, correo_existe
 from models.tutor_model import registrar_tutor
+from models.database import unidad_de_trabajo
 from werkzeug.security import generate_password_hash
 
 registro_bp = Blueprint("registro", __name__)
@@ -27,29 +28,33 @@ def registro():
             flash("Las contraseñas no coinciden", "error")
             return render_template("registro.html")
 
-        if correo_existe(correo):
-            flash("Este correo ya está registrado", "error")
-            return render_template("registro.html")
-
         try:
             password_hash = generate_password_hash(password)
-            print(f"Registrando usuario con: {nombre} {apellido_paterno} {apellido_materno} {correo} {rol}")
-            usuario_id = registrar_usuario(nombre, apellido_paterno, apellido_materno, correo, password_hash, rol)
 
-            # ✅ CORRECCIÓN: Verificar None en lugar de falsy
-            # Esto permite que usuario_id=0 sea válido
-            if usuario_id is None:
-                flash("Hubo un error al registrar el usuario", "error")
-                return render_template("registro.html")
+            # 🔒 Usuario y tutor se registran en una sola transacción:
+            # si algo falla no queda un usuario sin tutor
+            with unidad_de_trabajo():
+                if correo_existe(correo):
+                    flash("Este correo ya está registrado", "error")
+                    return render_template("registro.html")
+
+                print(f"Registrando usuario con: {nombre} {apellido_paterno} {apellido_materno} {correo} {rol}")
+                usuario_id = registrar_usuario(nombre, apellido_paterno, apellido_materno, correo, password_hash, rol)
+
+                # ✅ CORRECCIÓN: Verificar None en lugar de falsy
+                # Esto permite que usuario_id=0 sea válido
+                if usuario_id is None:
+                    flash("Hubo un error al registrar el usuario", "error")
+                    return render_template("registro.html")
 
-            print(f"Usuario registrado exitosamente con ID: {usuario_id}")
-            print(f"Registrando tutor con: {usuario_id}, {nombre}, {apellido_paterno}, {apellido_materno}, {telefono}, {edad}")
-            tutor_id = registrar_tutor(usuario_id, nombre, apellido_paterno, apellido_materno, telefono, edad)
+                print(f"Usuario registrado exitosamente con ID: {usuario_id}")
+                print(f"Registrando tutor con: {usuario_id}, {nombre}, {apellido_paterno}, {apellido_materno}, {telefono}, {edad}")
+                tutor_id = registrar_tutor(usuario_id, nombre, apellido_paterno, apellido_materno, telefono, edad)
 
-            # ✅ CORRECCIÓN: Verificar None en lugar de falsy
-            if tutor_id is None:
-                flash("Hubo un error al registrar al tutor", "error")
-                return render_template("registro.html")
+                # ✅ CORRECCIÓN: Verificar None en lugar de falsy
+                if tutor_id is None:
+                    flash("Hubo un error al registrar al tutor", "error")
+                    return render_template("registro.html")
 
             print(f"Tutor registrado exitosamente con ID: {tutor_id}")
             
@@ -2,11 +2,16 @@
 # routes/registro_alumno.py
 # ============================================
 from flask import Blueprint, render_template, request, redirect, flash, url_for, session
-from models.database import get_connection
+from models.database import unidad_de_trabajo, presupuesto_bd, al_revertir
 from models.alumno_model import registrar_alumno, vincular_alumno_a_tutor, curp_existe
+from models.catalogo_model import obtener_ciclo_activo, obtener_escuelas_activas, obtener_grados, obtener_tipo_doc_ids_por_codigo
+from models.documento_model import registrar_documentos_lote
+from models.inscripcion_model import invalidar_estadisticas
+from utils.principal import tutor_actual
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import os
+import mimetypes
 from pathlib import Path
 
 registro_alumno_bp = Blueprint('registro_alumno', __name__)
@@ -47,6 +52,13 @@ def guardar_archivo(file, alumno_id, tipo_documento):
     
     return filepath
 
+def borrar_archivo(filepath):
+    """Borrar un archivo guardado cuyo registro no llegó a la BD"""
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
 @registro_alumno_bp.route('/registro-alumno', methods=['GET', 'POST'])
 def registro_alumno():
     """Formulario para registrar un nuevo alumno"""
@@ -61,35 +73,13 @@ def registro_alumno():
     
     if request.method == 'GET':
         # Obtener escuelas y grados para los selects
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Obtener escuelas activas
-            cursor.execute("""
-                SELECT escuela_id, nombre, cct, municipio, turno
-                FROM escuelas
-                WHERE activo = TRUE
-                ORDER BY nombre
-            """)
-            escuelas = cursor.fetchall()
-            
-            # Obtener grados
-            cursor.execute("""
-                SELECT grado_id, nivel, descripcion
-                FROM grados
-                ORDER BY nivel
-            """)
-            grados = cursor.fetchall()
+            # Escuelas activas y grados (catálogos en memoria)
+            escuelas = obtener_escuelas_activas()
+            grados = obtener_grados()
             
-            # Obtener tutor_id
-            cursor.execute("""
-                SELECT tutor_id, nombre, apellido_paterno, apellido_materno
-                FROM tutores
-                WHERE usuario_id = %s
-            """, (usuario_id,))
-            tutor = cursor.fetchone()
+            # Tutor de la sesión
+            tutor = tutor_actual()
             
             if not tutor:
                 flash("No se encontró información del tutor", "error")
@@ -106,12 +96,8 @@ def registro_alumno():
             print(f"Error al cargar formulario: {e}")
             flash("Error al cargar el formulario", "error")
             return redirect(url_for('panel_tutor.panel_tutor'))
-        finally:
-            if conn:
-                conn.close()
     
     # POST - Procesar el registro
-    conn = None
     try:
         # Obtener datos del formulario
         nombre = request.form.get('nombre', '').strip()
@@ -157,158 +143,140 @@ def registro_alumno():
             flash("Fecha de nacimiento inválida", "error")
             return redirect(url_for('registro_alumno.registro_alumno'))
         
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Obtener tutor_id
-        cursor.execute("SELECT tutor_id FROM tutores WHERE usuario_id = %s", (usuario_id,))
-        tutor = cursor.fetchone()
-        
-        if not tutor:
-            flash("Error: No se encontró el tutor", "error")
-            return redirect(url_for('panel_tutor.panel_tutor'))
-        
-        tutor_id = tutor['tutor_id']
+        # Avisos del registro: se muestran solo si la unidad confirma
+        mensajes = []
         
-        # Registrar alumno
-        alumno_id = registrar_alumno(
-            nombre=nombre,
-            apellido_paterno=apellido_paterno,
-            apellido_materno=apellido_materno,
-            curp=curp,
-            fecha_nacimiento=fecha_nacimiento,
-            sexo=sexo,
-            direccion=direccion,
-            municipio=municipio,
-            entidad=entidad,
-            telefono=telefono,
-            nacionalidad=nacionalidad,
-            escuela_procedencia=escuela_procedencia,
-            creado_por_usuario_id=usuario_id
-        )
-        
-        if not alumno_id:
-            flash("Error al registrar al alumno", "error")
-            return redirect(url_for('registro_alumno.registro_alumno'))
-        
-        # Vincular alumno con tutor
-        if not vincular_alumno_a_tutor(alumno_id, tutor_id, es_representante=True):
-            flash("Alumno registrado pero hubo un error al vincularlo", "warning")
-        
-        # ========== PROCESAR DOCUMENTOS ==========
-        documentos_procesados = 0
-        documentos_map = {
-            'doc_alumno_acta': ('acta_nac', 'Acta de Nacimiento'),
-            'doc_alumno_cartilla': ('cartilla_vac', 'Cartilla de Vacunación'),
-            'doc_tutor_identificacion': ('ine_tutor', 'INE del Tutor'),
-            'doc_tutor_domicilio': ('comprobante_dom', 'Comprobante de Domicilio'),
-            'doc_tutor_autorizacion': ('foto', 'Fotografía')
-        }
-        
-        for field_name, (tipo_codigo, tipo_nombre) in documentos_map.items():
-            if field_name in request.files:
-                file = request.files[field_name]
-                if file and file.filename != '':
-                    # Validar tamaño
-                    file.seek(0, os.SEEK_END)
-                    file_size = file.tell()
-                    file.seek(0)
-                    
-                    if file_size > MAX_FILE_SIZE:
-                        flash(f"El archivo {tipo_nombre} excede el tamaño máximo (10 MB)", "warning")
-                        continue
-                    
-                    # Validar extensión
-                    if not archivo_permitido(file.filename):
-                        flash(f"Formato no permitido para {tipo_nombre}", "warning")
-                        continue
-                    
-                    # Obtener tipo_doc_id del código
-                    cursor.execute("""
-                        SELECT tipo_doc_id FROM tipos_documento WHERE codigo = %s
-                    """, (tipo_codigo,))
-                    tipo_doc_result = cursor.fetchone()
-                    
-                    if not tipo_doc_result:
-                        print(f"No se encontró tipo de documento con código: {tipo_codigo}")
-                        continue
-                    
-                    tipo_doc_id = tipo_doc_result['tipo_doc_id']
-                    
-                    # Guardar archivo
-                    filepath = guardar_archivo(file, alumno_id, tipo_codigo)
-                    if filepath:
-                        try:
-                            # Obtener MIME type
-                            import mimetypes
+        # 🔒 Alumno, vínculo, documentos e inscripción en una sola transacción
+        with unidad_de_trabajo() as conn:
+            cursor = conn.cursor()
+            
+            # Tutor de la sesión
+            tutor = tutor_actual()
+            
+            if not tutor:
+                flash("Error: No se encontró el tutor", "error")
+                return redirect(url_for('panel_tutor.panel_tutor'))
+            
+            tutor_id = tutor['tutor_id']
+            
+            # Registrar alumno
+            alumno_id = registrar_alumno(
+                nombre=nombre,
+                apellido_paterno=apellido_paterno,
+                apellido_materno=apellido_materno,
+                curp=curp,
+                fecha_nacimiento=fecha_nacimiento,
+                sexo=sexo,
+                direccion=direccion,
+                municipio=municipio,
+                entidad=entidad,
+                telefono=telefono,
+                nacionalidad=nacionalidad,
+                escuela_procedencia=escuela_procedencia,
+                creado_por_usuario_id=usuario_id
+            )
+            
+            if not alumno_id:
+                flash("Error al registrar al alumno", "error")
+                return redirect(url_for('registro_alumno.registro_alumno'))
+            
+            # Vincular alumno con tutor (si falla se revierte todo el registro)
+            if not vincular_alumno_a_tutor(alumno_id, tutor_id, es_representante=True):
+                flash("Error al vincular al alumno con el tutor", "error")
+                return redirect(url_for('registro_alumno.registro_alumno'))
+            
+            # ========== PROCESAR DOCUMENTOS ==========
+            documentos_procesados = 0
+            documentos_map = {
+                'doc_alumno_acta': ('acta_nac', 'Acta de Nacimiento'),
+                'doc_alumno_cartilla': ('cartilla_vac', 'Cartilla de Vacunación'),
+                'doc_tutor_identificacion': ('ine_tutor', 'INE del Tutor'),
+                'doc_tutor_domicilio': ('comprobante_dom', 'Comprobante de Domicilio'),
+                'doc_tutor_autorizacion': ('foto', 'Fotografía')
+            }
+            
+            tipo_doc_ids = obtener_tipo_doc_ids_por_codigo()
+            documentos = []
+            
+            # Validar los archivos y guardarlos en disco; si la unidad no llega
+            # a confirmarse (documentos, inscripción o COMMIT) se borran
+            for field_name, (tipo_codigo, tipo_nombre) in documentos_map.items():
+                if field_name in request.files:
+                    file = request.files[field_name]
+                    if file and file.filename != '':
+                        # Validar tamaño
+                        file.seek(0, os.SEEK_END)
+                        file_size = file.tell()
+                        file.seek(0)
+                        
+                        if file_size > MAX_FILE_SIZE:
+                            mensajes.append((f"El archivo {tipo_nombre} excede el tamaño máximo (10 MB)", "warning"))
+                            continue
+                        
+                        # Validar extensión
+                        if not archivo_permitido(file.filename):
+                            mensajes.append((f"Formato no permitido para {tipo_nombre}", "warning"))
+                            continue
+                        
+                        # tipo_doc_id del código (catálogo en memoria)
+                        tipo_doc_id = tipo_doc_ids.get(tipo_codigo)
+                        
+                        if not tipo_doc_id:
+                            print(f"No se encontró tipo de documento con código: {tipo_codigo}")
+                            continue
+                        
+                        # Guardar archivo
+                        filepath = guardar_archivo(file, alumno_id, tipo_codigo)
+                        if filepath:
+                            al_revertir(lambda ruta=filepath: borrar_archivo(ruta))
                             mime_type, _ = mimetypes.guess_type(file.filename)
-                            
-                            cursor.execute("""
-                                INSERT INTO documento_alumno (
-                                    alumno_id, tipo_doc_id, archivo_url, 
-                                    nombre_archivo, mime_type, uploaded_by, status
-                                )
-                                VALUES (%s, %s, %s, %s, %s, %s, 'pendiente')
-                                ON CONFLICT (alumno_id, tipo_doc_id) 
-                                DO UPDATE SET 
-                                    archivo_url = EXCLUDED.archivo_url,
-                                    nombre_archivo = EXCLUDED.nombre_archivo,
-                                    mime_type = EXCLUDED.mime_type,
-                                    fecha_subida = NOW()
-                            """, (alumno_id, tipo_doc_id, filepath, 
-                                  secure_filename(file.filename), mime_type, usuario_id))
-                            
-                            documentos_procesados += 1
-                        except Exception as e:
-                            print(f"Error al guardar documento {tipo_nombre}: {e}")
-                            conn.rollback()
-        
-        # Confirmar cambios
-        if documentos_procesados > 0:
-            conn.commit()
-            flash(f"Se cargaron {documentos_procesados} documento(s) exitosamente", "info")
-        
-        # Si se seleccionó escuela y grado, crear inscripción
-        if escuela_id and grado_id:
-            # Obtener ciclo activo
-            cursor.execute("""
-                SELECT ciclo_id, inscripciones_abiertas
-                FROM ciclos
-                WHERE activo = TRUE
-                LIMIT 1
-            """)
-            ciclo = cursor.fetchone()
+                            documentos.append(
+                                (tipo_doc_id, filepath, secure_filename(file.filename), mime_type)
+                            )
+            
+            # Todos los documentos en un solo INSERT ... ON CONFLICT
+            if documentos:
+                if registrar_documentos_lote(alumno_id, documentos, uploaded_by=usuario_id) is None:
+                    flash("Error al registrar los documentos del alumno", "error")
+                    return redirect(url_for('registro_alumno.registro_alumno'))
+                documentos_procesados = len(documentos)
             
-            if ciclo and ciclo['inscripciones_abiertas']:
-                cursor.execute("""
-                    INSERT INTO inscripciones (
-                        alumno_id, escuela_id, ciclo_id, grado_id, status
-                    )
-                    VALUES (%s, %s, %s, %s, 'pendiente')
-                """, (alumno_id, escuela_id, ciclo['ciclo_id'], grado_id))
-                conn.commit()
-                flash("Alumno registrado, documentos cargados e inscripción solicitada exitosamente", "success")
+            if documentos_procesados > 0:
+                mensajes.append((f"Se cargaron {documentos_procesados} documento(s) exitosamente", "info"))
+            
+            # Si se seleccionó escuela y grado, crear inscripción
+            if escuela_id and grado_id:
+                # Obtener ciclo activo
+                ciclo = obtener_ciclo_activo()
+                
+                if ciclo and ciclo['inscripciones_abiertas']:
+                    cursor.execute("""
+                        INSERT INTO inscripciones (
+                            alumno_id, escuela_id, ciclo_id, grado_id, status
+                        )
+                        VALUES (%s, %s, %s, %s, 'pendiente')
+                    """, (alumno_id, escuela_id, ciclo['ciclo_id'], grado_id))
+                    invalidar_estadisticas()
+                    mensajes.append(("Alumno registrado, documentos cargados e inscripción solicitada exitosamente", "success"))
+                else:
+                    mensajes.append(("Alumno y documentos registrados. Las inscripciones están cerradas actualmente", "warning"))
             else:
-                flash("Alumno y documentos registrados. Las inscripciones están cerradas actualmente", "warning")
-        else:
-            flash("Alumno y documentos registrados exitosamente", "success")
+                mensajes.append(("Alumno y documentos registrados exitosamente", "success"))
         
+        for mensaje, categoria in mensajes:
+            flash(mensaje, categoria)
         return redirect(url_for('panel_tutor.panel_tutor'))
         
     except Exception as e:
         print(f"❌ Error al registrar alumno: {type(e).__name__}: {str(e)}")
         import traceback
         traceback.print_exc()
-        if conn:
-            conn.rollback()
         flash("Ocurrió un error al registrar al alumno", "error")
         return redirect(url_for('registro_alumno.registro_alumno'))
-    finally:
-        if conn:
-            conn.close()
 
 
 @registro_alumno_bp.route('/validar-curp', methods=['POST'])
+@presupuesto_bd('ajax')
 def validar_curp():
     """Endpoint AJAX para validar CURP en tiempo real"""
     from flask import jsonify
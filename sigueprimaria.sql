@@ -124,7 +124,9 @@ CREATE TABLE tipos_documento (
     nombre VARCHAR(150) NOT NULL,
     descripcion TEXT,
     requerido BOOLEAN DEFAULT TRUE,
-    activo BOOLEAN DEFAULT TRUE
+    activo BOOLEAN DEFAULT TRUE,
+    -- cada tipo es un bit de las máscaras de progreso_documentos (BIGINT)
+    CHECK (tipo_doc_id BETWEEN 1 AND 62)
 );
 
 CREATE TABLE documento_alumno (
@@ -152,7 +154,7 @@ CREATE TABLE inscripciones (
     ciclo_id INTEGER NOT NULL REFERENCES ciclos(ciclo_id) ON DELETE RESTRICT,
     grado_id INTEGER NOT NULL REFERENCES grados(grado_id) ON DELETE RESTRICT,
     grupo_id INTEGER REFERENCES grupos(grupo_id) ON DELETE SET NULL,
-    fecha_solicitud TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    fecha_solicitud TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     status enroll_status DEFAULT 'pendiente',
     motivo_rechazo TEXT,
     usuario_responsable INTEGER REFERENCES usuarios(usuario_id) ON DELETE SET NULL,
@@ -197,6 +199,43 @@ CREATE TABLE expediente_medico (
     actualizado_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Contadores por escuela y ciclo, mantenidos por triggers (ver actualizar_contadores_*)
+-- Los cupos disponibles se calculan al leer: escuelas.cupo_total - aceptados
+CREATE TABLE contadores_escuela (
+    escuela_id INTEGER NOT NULL REFERENCES escuelas(escuela_id) ON DELETE CASCADE,
+    ciclo_id INTEGER NOT NULL REFERENCES ciclos(ciclo_id) ON DELETE CASCADE,
+    pendientes INTEGER NOT NULL DEFAULT 0,
+    en_revision INTEGER NOT NULL DEFAULT 0,
+    aceptados INTEGER NOT NULL DEFAULT 0,
+    rechazados INTEGER NOT NULL DEFAULT 0,
+    grupos_totales INTEGER NOT NULL DEFAULT 0,
+    cupo_grupos INTEGER NOT NULL DEFAULT 0,
+    alumnos_en_grupos INTEGER NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (escuela_id, ciclo_id)
+);
+
+-- progreso documental por alumno, mantenido por triggers (bit n = tipo_doc_id n)
+CREATE TABLE progreso_documentos (
+    alumno_id INTEGER PRIMARY KEY REFERENCES alumnos(alumno_id) ON DELETE CASCADE,
+    requeridos INTEGER NOT NULL DEFAULT 0,
+    subidos INTEGER NOT NULL DEFAULT 0,
+    validados INTEGER NOT NULL DEFAULT 0,
+    mascara_entregados BIGINT NOT NULL DEFAULT 0,
+    mascara_validados BIGINT NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Escuelas alternativas de una solicitud, en orden de preferencia. La escuela
+-- de la inscripción es la primera opción (orden 1) y no se repite aquí.
+CREATE TABLE preferencias_inscripcion (
+    inscripcion_id INTEGER NOT NULL REFERENCES inscripciones(inscripcion_id) ON DELETE CASCADE,
+    orden SMALLINT NOT NULL CHECK (orden BETWEEN 2 AND 10),
+    escuela_id INTEGER NOT NULL REFERENCES escuelas(escuela_id) ON DELETE CASCADE,
+    PRIMARY KEY (inscripcion_id, orden),
+    UNIQUE (inscripcion_id, escuela_id)
+);
+
 --Funciones y triggers
 
 CREATE OR REPLACE FUNCTION ensure_single_active_ciclo()
@@ -217,62 +256,540 @@ FOR EACH ROW
 WHEN (NEW.activo = TRUE)
 EXECUTE FUNCTION ensure_single_active_ciclo();
 
--- funcion actualizar contador de alumnos en grupos
-CREATE OR REPLACE FUNCTION actualizar_alumnos_grupo()
+-- avisar a los workers que un catálogo cambió (invalidan su copia en memoria)
+CREATE OR REPLACE FUNCTION notificar_cambio_catalogo()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('catalogos_cambio', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_notificar_ciclos
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ciclos
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+CREATE TRIGGER trg_notificar_grados
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON grados
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+CREATE TRIGGER trg_notificar_tipos_documento
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tipos_documento
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+CREATE TRIGGER trg_notificar_escuelas
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON escuelas
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_cambio_catalogo();
+
+-- avisar a los workers de un curp/correo nuevo (filtros de existencia); solo viaja la huella SHA-256
+CREATE OR REPLACE FUNCTION notificar_alta_existencia()
+RETURNS TRIGGER AS $$
+DECLARE
+    valor TEXT := to_jsonb(NEW) ->> TG_ARGV[1];
+BEGIN
+    IF valor IS NOT NULL THEN
+        PERFORM pg_notify('existencia_alta', TG_ARGV[0] || ':' || encode(sha256(convert_to(valor, 'UTF8')), 'hex'));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_existencia_curp
+AFTER INSERT OR UPDATE OF curp ON alumnos
+FOR EACH ROW
+EXECUTE FUNCTION notificar_alta_existencia('curp', 'curp');
+
+CREATE TRIGGER trg_existencia_correo
+AFTER INSERT OR UPDATE OF correo ON usuarios
+FOR EACH ROW
+EXECUTE FUNCTION notificar_alta_existencia('correo', 'correo');
+
+-- avisar a los workers que cambió el principal (usuario, tutor o escuela dirigida)
+-- de un usuario: descartan su copia cacheada. TG_ARGV[0] es la columna con el usuario_id
+CREATE OR REPLACE FUNCTION notificar_cambio_principal()
 RETURNS TRIGGER AS $$
+DECLARE
+    anterior TEXT;
+    nuevo TEXT;
 BEGIN
-    IF TG_OP = 'INSERT' THEN
-        IF NEW.status = 'aceptado' AND NEW.grupo_id IS NOT NULL THEN
-            UPDATE grupos
-            SET alumnos_inscritos = alumnos_inscritos + 1
-            WHERE grupo_id = NEW.grupo_id;
-        END IF;
-        RETURN NEW;
-
-    ELSIF TG_OP = 'UPDATE' THEN
--- cambio de no aceptado a aceptado
-        IF OLD.status != 'aceptado' AND NEW.status = 'aceptado' AND NEW.grupo_id IS NOT NULL THEN
-            UPDATE grupos
-            SET alumnos_inscritos = alumnos_inscritos + 1
-            WHERE grupo_id = NEW.grupo_id;
--- cambio de aceptado a no aceptado
-        ELSIF OLD.status = 'aceptado' AND NEW.status != 'aceptado' AND OLD.grupo_id IS NOT NULL THEN
-            UPDATE grupos
-            SET alumnos_inscritos = GREATEST(0, alumnos_inscritos - 1)
-            WHERE grupo_id = OLD.grupo_id;
--- cambio de grupo (manteniendo status aceptado)
-        ELSIF OLD.status = 'aceptado' AND NEW.status = 'aceptado' AND OLD.grupo_id != NEW.grupo_id THEN
-            IF OLD.grupo_id IS NOT NULL THEN
-                UPDATE grupos
-                SET alumnos_inscritos = GREATEST(0, alumnos_inscritos - 1)
-                WHERE grupo_id = OLD.grupo_id;
-            END IF;
-            IF NEW.grupo_id IS NOT NULL THEN
-                UPDATE grupos
-                SET alumnos_inscritos = alumnos_inscritos + 1
-                WHERE grupo_id = NEW.grupo_id;
-            END IF;
-        END IF;
-        RETURN NEW;
-
-    ELSIF TG_OP = 'DELETE' THEN
-        IF OLD.status = 'aceptado' AND OLD.grupo_id IS NOT NULL THEN
-            UPDATE grupos
-            SET alumnos_inscritos = GREATEST(0, alumnos_inscritos - 1)
-            WHERE grupo_id = OLD.grupo_id;
-        END IF;
-        RETURN OLD;
+    IF TG_OP <> 'INSERT' THEN
+        anterior := to_jsonb(OLD) ->> TG_ARGV[0];
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        nuevo := to_jsonb(NEW) ->> TG_ARGV[0];
     END IF;
+    IF anterior IS NOT NULL THEN
+        PERFORM pg_notify('principal_cambio', anterior);
+    END IF;
+    IF nuevo IS NOT NULL AND nuevo IS DISTINCT FROM anterior THEN
+        PERFORM pg_notify('principal_cambio', nuevo);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_principal_usuarios
+AFTER UPDATE OF correo, nombre, apellido_paterno, apellido_materno, rol, activo OR DELETE ON usuarios
+FOR EACH ROW
+EXECUTE FUNCTION notificar_cambio_principal('usuario_id');
+
+CREATE TRIGGER trg_principal_tutores
+AFTER INSERT OR UPDATE OR DELETE ON tutores
+FOR EACH ROW
+EXECUTE FUNCTION notificar_cambio_principal('usuario_id');
+
+CREATE TRIGGER trg_principal_escuelas
+AFTER INSERT OR UPDATE OR DELETE ON escuelas
+FOR EACH ROW
+EXECUTE FUNCTION notificar_cambio_principal('director_usuario_id');
 
+-- avisar a los workers que cambiaron los alumnos de un tutor: descartan el
+-- conjunto cacheado con que se autoriza el acceso (el payload es el tutor_id)
+CREATE OR REPLACE FUNCTION notificar_cambio_alumnos_tutor()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('alumnos_tutor_cambio', OLD.tutor_id::TEXT);
+    END IF;
+    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.tutor_id IS DISTINCT FROM OLD.tutor_id) THEN
+        PERFORM pg_notify('alumnos_tutor_cambio', NEW.tutor_id::TEXT);
+    END IF;
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trg_actualizar_alumnos_grupo
-AFTER INSERT OR UPDATE OR DELETE ON inscripciones
+CREATE TRIGGER trg_alumnos_tutor
+AFTER INSERT OR UPDATE OR DELETE ON alumno_tutor
 FOR EACH ROW
+EXECUTE FUNCTION notificar_cambio_alumnos_tutor();
+
+-- funcion: filas de la sentencia que disparó un trigger FOR EACH STATEMENT, con
+-- delta +1 las que entran (tabla de transición nuevas) y -1 las que salen (viejas)
+CREATE OR REPLACE FUNCTION filas_de_sentencia(p_operacion TEXT, p_columnas TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE p_operacion
+        WHEN 'INSERT' THEN format('SELECT %s, 1 AS delta FROM nuevas', p_columnas)
+        WHEN 'DELETE' THEN format('SELECT %s, -1 AS delta FROM viejas', p_columnas)
+        ELSE format('SELECT %1$s, 1 AS delta FROM nuevas UNION ALL SELECT %1$s, -1 AS delta FROM viejas', p_columnas)
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- funcion actualizar contador de alumnos en grupos: una vez por sentencia, suma
+-- por grupo los aceptados que entran y salen y aplica un UPDATE por grupo afectado
+CREATE OR REPLACE FUNCTION actualizar_alumnos_grupo()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_grupos INTEGER[];
+    v_deltas INTEGER[];
+BEGIN
+    EXECUTE format($sql$
+        SELECT array_agg(grupo_id ORDER BY grupo_id), array_agg(delta ORDER BY grupo_id)
+        FROM (
+            SELECT grupo_id, SUM(delta)::INTEGER AS delta
+            FROM (%s) cambios
+            WHERE status = 'aceptado' AND grupo_id IS NOT NULL
+            GROUP BY grupo_id
+            HAVING SUM(delta) <> 0
+        ) d
+    $sql$, filas_de_sentencia(TG_OP, 'grupo_id, status'))
+    INTO v_grupos, v_deltas;
+
+    IF v_grupos IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- en orden de grupo_id: dos cambios masivos con grupos en común no se bloquean en cruz
+    PERFORM 1 FROM grupos WHERE grupo_id = ANY(v_grupos) ORDER BY grupo_id FOR UPDATE;
+
+    UPDATE grupos g
+    SET alumnos_inscritos = GREATEST(0, g.alumnos_inscritos + d.delta)
+    FROM unnest(v_grupos, v_deltas) AS d(grupo_id, delta)
+    WHERE g.grupo_id = d.grupo_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Las tablas de transición solo se permiten con un evento por trigger
+CREATE TRIGGER trg_actualizar_alumnos_grupo_alta
+AFTER INSERT ON inscripciones
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
 EXECUTE FUNCTION actualizar_alumnos_grupo();
 
+CREATE TRIGGER trg_actualizar_alumnos_grupo_cambio
+AFTER UPDATE ON inscripciones
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_alumnos_grupo();
+
+CREATE TRIGGER trg_actualizar_alumnos_grupo_baja
+AFTER DELETE ON inscripciones
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_alumnos_grupo();
+
+-- funcion: contadores por status al insertar, cambiar o borrar inscripciones; una
+-- fila de contadores_escuela por escuela y ciclo afectados, en orden de llave (las
+-- escuelas borradas se saltan: sus contadores se fueron en la cascada)
+CREATE OR REPLACE FUNCTION actualizar_contadores_inscripciones()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format($sql$
+        INSERT INTO contadores_escuela AS c (escuela_id, ciclo_id, pendientes, en_revision, aceptados, rechazados)
+        SELECT *
+        FROM (
+            SELECT
+                escuela_id,
+                ciclo_id,
+                COALESCE(SUM(delta) FILTER (WHERE status = 'pendiente'), 0) AS pendientes,
+                COALESCE(SUM(delta) FILTER (WHERE status = 'en_revision'), 0) AS en_revision,
+                COALESCE(SUM(delta) FILTER (WHERE status = 'aceptado'), 0) AS aceptados,
+                COALESCE(SUM(delta) FILTER (WHERE status = 'rechazado'), 0) AS rechazados
+            FROM (%s) cambios
+            GROUP BY escuela_id, ciclo_id
+        ) d
+        WHERE (pendientes, en_revision, aceptados, rechazados) <> (0, 0, 0, 0)
+          AND EXISTS (SELECT 1 FROM escuelas e WHERE e.escuela_id = d.escuela_id)
+        ORDER BY escuela_id, ciclo_id
+        ON CONFLICT (escuela_id, ciclo_id) DO UPDATE SET
+            pendientes = c.pendientes + EXCLUDED.pendientes,
+            en_revision = c.en_revision + EXCLUDED.en_revision,
+            aceptados = c.aceptados + EXCLUDED.aceptados,
+            rechazados = c.rechazados + EXCLUDED.rechazados,
+            actualizado_en = CURRENT_TIMESTAMP
+    $sql$, filas_de_sentencia(TG_OP, 'escuela_id, ciclo_id, status'));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_contadores_inscripciones_alta
+AFTER INSERT ON inscripciones
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_inscripciones();
+
+CREATE TRIGGER trg_contadores_inscripciones_cambio
+AFTER UPDATE ON inscripciones
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_inscripciones();
+
+CREATE TRIGGER trg_contadores_inscripciones_baja
+AFTER DELETE ON inscripciones
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_inscripciones();
+
+-- funcion: grupos, cupo y alumnos en grupos por escuela y ciclo (una vez por sentencia)
+CREATE OR REPLACE FUNCTION actualizar_contadores_grupos()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format($sql$
+        INSERT INTO contadores_escuela AS c (escuela_id, ciclo_id, grupos_totales, cupo_grupos, alumnos_en_grupos)
+        SELECT *
+        FROM (
+            SELECT
+                escuela_id,
+                ciclo_id,
+                SUM(delta) AS grupos_totales,
+                SUM(delta * COALESCE(cupo, 0)) AS cupo_grupos,
+                SUM(delta * COALESCE(alumnos_inscritos, 0)) AS alumnos_en_grupos
+            FROM (%s) cambios
+            GROUP BY escuela_id, ciclo_id
+        ) d
+        WHERE (grupos_totales, cupo_grupos, alumnos_en_grupos) <> (0, 0, 0)
+          AND EXISTS (SELECT 1 FROM escuelas e WHERE e.escuela_id = d.escuela_id)
+        ORDER BY escuela_id, ciclo_id
+        ON CONFLICT (escuela_id, ciclo_id) DO UPDATE SET
+            grupos_totales = c.grupos_totales + EXCLUDED.grupos_totales,
+            cupo_grupos = c.cupo_grupos + EXCLUDED.cupo_grupos,
+            alumnos_en_grupos = c.alumnos_en_grupos + EXCLUDED.alumnos_en_grupos,
+            actualizado_en = CURRENT_TIMESTAMP
+    $sql$, filas_de_sentencia(TG_OP, 'escuela_id, ciclo_id, cupo, alumnos_inscritos'));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_contadores_grupos_alta
+AFTER INSERT ON grupos
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_grupos();
+
+CREATE TRIGGER trg_contadores_grupos_cambio
+AFTER UPDATE ON grupos
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_grupos();
+
+CREATE TRIGGER trg_contadores_grupos_baja
+AFTER DELETE ON grupos
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_contadores_grupos();
+-- funcion: recalcular los contadores desde inscripciones y grupos (trabajo de reconciliación).
+-- Bloquea las escrituras en ambas tablas mientras recalcula para no perder
+-- incrementos concurrentes. Retorna cuántas filas de contadores corrigió.
+CREATE OR REPLACE FUNCTION reconciliar_contadores_escuela()
+RETURNS INTEGER AS $$
+DECLARE
+    v_corregidas INTEGER;
+BEGIN
+    LOCK TABLE inscripciones, grupos IN SHARE MODE;
+
+    WITH reales AS (
+        SELECT
+            escuela_id,
+            ciclo_id,
+            SUM(pendientes)::INTEGER AS pendientes,
+            SUM(en_revision)::INTEGER AS en_revision,
+            SUM(aceptados)::INTEGER AS aceptados,
+            SUM(rechazados)::INTEGER AS rechazados,
+            SUM(grupos_totales)::INTEGER AS grupos_totales,
+            SUM(cupo_grupos)::INTEGER AS cupo_grupos,
+            SUM(alumnos_en_grupos)::INTEGER AS alumnos_en_grupos
+        FROM (
+            SELECT
+                escuela_id,
+                ciclo_id,
+                COUNT(*) FILTER (WHERE status = 'pendiente') AS pendientes,
+                COUNT(*) FILTER (WHERE status = 'en_revision') AS en_revision,
+                COUNT(*) FILTER (WHERE status = 'aceptado') AS aceptados,
+                COUNT(*) FILTER (WHERE status = 'rechazado') AS rechazados,
+                0 AS grupos_totales,
+                0 AS cupo_grupos,
+                0 AS alumnos_en_grupos
+            FROM inscripciones
+            GROUP BY escuela_id, ciclo_id
+            UNION ALL
+            SELECT
+                escuela_id,
+                ciclo_id,
+                0, 0, 0, 0,
+                COUNT(*),
+                COALESCE(SUM(cupo), 0),
+                COALESCE(SUM(alumnos_inscritos), 0)
+            FROM grupos
+            GROUP BY escuela_id, ciclo_id
+        ) t
+        GROUP BY escuela_id, ciclo_id
+    ),
+    todas AS (
+        SELECT
+            COALESCE(r.escuela_id, c.escuela_id) AS escuela_id,
+            COALESCE(r.ciclo_id, c.ciclo_id) AS ciclo_id,
+            COALESCE(r.pendientes, 0) AS pendientes,
+            COALESCE(r.en_revision, 0) AS en_revision,
+            COALESCE(r.aceptados, 0) AS aceptados,
+            COALESCE(r.rechazados, 0) AS rechazados,
+            COALESCE(r.grupos_totales, 0) AS grupos_totales,
+            COALESCE(r.cupo_grupos, 0) AS cupo_grupos,
+            COALESCE(r.alumnos_en_grupos, 0) AS alumnos_en_grupos
+        FROM reales r
+        FULL JOIN contadores_escuela c ON c.escuela_id = r.escuela_id AND c.ciclo_id = r.ciclo_id
+    ),
+    corregidas AS (
+        INSERT INTO contadores_escuela AS c (
+            escuela_id, ciclo_id, pendientes, en_revision, aceptados, rechazados,
+            grupos_totales, cupo_grupos, alumnos_en_grupos
+        )
+        SELECT * FROM todas
+        ON CONFLICT (escuela_id, ciclo_id) DO UPDATE SET
+            pendientes = EXCLUDED.pendientes,
+            en_revision = EXCLUDED.en_revision,
+            aceptados = EXCLUDED.aceptados,
+            rechazados = EXCLUDED.rechazados,
+            grupos_totales = EXCLUDED.grupos_totales,
+            cupo_grupos = EXCLUDED.cupo_grupos,
+            alumnos_en_grupos = EXCLUDED.alumnos_en_grupos,
+            actualizado_en = CURRENT_TIMESTAMP
+        WHERE (c.pendientes, c.en_revision, c.aceptados, c.rechazados,
+               c.grupos_totales, c.cupo_grupos, c.alumnos_en_grupos)
+              IS DISTINCT FROM
+              (EXCLUDED.pendientes, EXCLUDED.en_revision, EXCLUDED.aceptados, EXCLUDED.rechazados,
+               EXCLUDED.grupos_totales, EXCLUDED.cupo_grupos, EXCLUDED.alumnos_en_grupos)
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_corregidas FROM corregidas;
+
+    RETURN v_corregidas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- funcion: máscara de los tipos de documento requeridos y activos
+CREATE OR REPLACE FUNCTION mascara_documentos_requeridos()
+RETURNS BIGINT AS $$
+    SELECT COALESCE(bit_or(1::BIGINT << tipo_doc_id), 0)
+    FROM tipos_documento
+    WHERE requerido = TRUE AND activo = TRUE;
+$$ LANGUAGE sql STABLE;
+
+-- funcion: cuántos bits están encendidos en una máscara
+CREATE OR REPLACE FUNCTION contar_bits(p_mascara BIGINT)
+RETURNS INTEGER AS $$
+    SELECT bit_count(p_mascara::BIT(64))::INTEGER;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- funcion: encender o apagar el bit de un tipo de documento
+CREATE OR REPLACE FUNCTION cambiar_bit(p_mascara BIGINT, p_tipo_doc_id INTEGER, p_encendido BOOLEAN)
+RETURNS BIGINT AS $$
+    SELECT CASE WHEN p_encendido
+                THEN p_mascara | (1::BIGINT << p_tipo_doc_id)
+                ELSE p_mascara & ~(1::BIGINT << p_tipo_doc_id)
+           END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- funcion: marcar un tipo de documento del alumno como entregado/validado (o quitarlo)
+CREATE OR REPLACE FUNCTION ajustar_progreso_documento(
+    p_alumno_id INTEGER,
+    p_tipo_doc_id INTEGER,
+    p_entregado BOOLEAN,
+    p_validado BOOLEAN
+)
+RETURNS VOID AS $$
+DECLARE
+    v_requeridos BIGINT := mascara_documentos_requeridos();
+BEGIN
+    -- la fila nace con el alumno; al borrar no se crea (el alumno puede estar borrándose)
+    IF p_entregado THEN
+        INSERT INTO progreso_documentos (alumno_id) VALUES (p_alumno_id)
+        ON CONFLICT (alumno_id) DO NOTHING;
+    END IF;
+
+    UPDATE progreso_documentos SET
+        mascara_entregados = cambiar_bit(mascara_entregados, p_tipo_doc_id, p_entregado),
+        mascara_validados = cambiar_bit(mascara_validados, p_tipo_doc_id, p_validado),
+        requeridos = contar_bits(v_requeridos),
+        subidos = contar_bits(cambiar_bit(mascara_entregados, p_tipo_doc_id, p_entregado) & v_requeridos),
+        validados = contar_bits(cambiar_bit(mascara_validados, p_tipo_doc_id, p_validado) & v_requeridos),
+        actualizado_en = CURRENT_TIMESTAMP
+    WHERE alumno_id = p_alumno_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- funcion: progreso al entregar, validar o borrar documentos
+CREATE OR REPLACE FUNCTION actualizar_progreso_documentos()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.alumno_id = NEW.alumno_id
+       AND OLD.tipo_doc_id = NEW.tipo_doc_id
+       AND (OLD.status IS NOT DISTINCT FROM 'validado') = (NEW.status IS NOT DISTINCT FROM 'validado') THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE'
+       OR (TG_OP = 'UPDATE' AND (OLD.alumno_id, OLD.tipo_doc_id) IS DISTINCT FROM (NEW.alumno_id, NEW.tipo_doc_id)) THEN
+        PERFORM ajustar_progreso_documento(OLD.alumno_id, OLD.tipo_doc_id, FALSE, FALSE);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM ajustar_progreso_documento(NEW.alumno_id, NEW.tipo_doc_id, TRUE, NEW.status IS NOT DISTINCT FROM 'validado');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_progreso_documentos
+AFTER INSERT OR UPDATE OF alumno_id, tipo_doc_id, status OR DELETE ON documento_alumno
+FOR EACH ROW
+EXECUTE FUNCTION actualizar_progreso_documentos();
+
+-- funcion: fila de progreso para cada alumno nuevo
+CREATE OR REPLACE FUNCTION crear_progreso_alumno()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO progreso_documentos (alumno_id, requeridos)
+    VALUES (NEW.alumno_id, contar_bits(mascara_documentos_requeridos()))
+    ON CONFLICT (alumno_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_progreso_alumno
+AFTER INSERT ON alumnos
+FOR EACH ROW
+EXECUTE FUNCTION crear_progreso_alumno();
+
+-- funcion: si cambian los tipos requeridos se recuentan las máscaras guardadas
+CREATE OR REPLACE FUNCTION recontar_progreso_documentos()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_requeridos BIGINT := mascara_documentos_requeridos();
+BEGIN
+    UPDATE progreso_documentos SET
+        requeridos = contar_bits(v_requeridos),
+        subidos = contar_bits(mascara_entregados & v_requeridos),
+        validados = contar_bits(mascara_validados & v_requeridos),
+        actualizado_en = CURRENT_TIMESTAMP
+    WHERE (requeridos, subidos, validados) IS DISTINCT FROM (
+        contar_bits(v_requeridos),
+        contar_bits(mascara_entregados & v_requeridos),
+        contar_bits(mascara_validados & v_requeridos)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_progreso_tipos_documento
+AFTER INSERT OR UPDATE OF requerido, activo OR DELETE ON tipos_documento
+FOR EACH STATEMENT
+EXECUTE FUNCTION recontar_progreso_documentos();
+
+-- funcion: recalcular progreso_documentos desde documento_alumno (trabajo de reconciliación).
+-- Retorna cuántas filas de progreso corrigió.
+CREATE OR REPLACE FUNCTION reconciliar_progreso_documentos()
+RETURNS INTEGER AS $$
+DECLARE
+    v_requeridos BIGINT;
+    v_corregidas INTEGER;
+BEGIN
+    LOCK TABLE alumnos, documento_alumno IN SHARE MODE;
+    v_requeridos := mascara_documentos_requeridos();
+
+    WITH reales AS (
+        SELECT
+            a.alumno_id,
+            COALESCE(bit_or(1::BIGINT << da.tipo_doc_id), 0) AS mascara_entregados,
+            COALESCE(bit_or(1::BIGINT << da.tipo_doc_id) FILTER (WHERE da.status = 'validado'), 0) AS mascara_validados
+        FROM alumnos a
+        LEFT JOIN documento_alumno da ON da.alumno_id = a.alumno_id
+        GROUP BY a.alumno_id
+    ),
+    corregidas AS (
+        INSERT INTO progreso_documentos AS p (
+            alumno_id, requeridos, subidos, validados, mascara_entregados, mascara_validados
+        )
+        SELECT
+            alumno_id,
+            contar_bits(v_requeridos),
+            contar_bits(mascara_entregados & v_requeridos),
+            contar_bits(mascara_validados & v_requeridos),
+            mascara_entregados,
+            mascara_validados
+        FROM reales
+        ON CONFLICT (alumno_id) DO UPDATE SET
+            requeridos = EXCLUDED.requeridos,
+            subidos = EXCLUDED.subidos,
+            validados = EXCLUDED.validados,
+            mascara_entregados = EXCLUDED.mascara_entregados,
+            mascara_validados = EXCLUDED.mascara_validados,
+            actualizado_en = CURRENT_TIMESTAMP
+        WHERE (p.requeridos, p.subidos, p.validados, p.mascara_entregados, p.mascara_validados)
+              IS DISTINCT FROM
+              (EXCLUDED.requeridos, EXCLUDED.subidos, EXCLUDED.validados,
+               EXCLUDED.mascara_entregados, EXCLUDED.mascara_validados)
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_corregidas FROM corregidas;
+
+    RETURN v_corregidas;
+END;
+$$ LANGUAGE plpgsql;
+
 --- funcion: actualizar timestamp en alumnos
 CREATE OR REPLACE FUNCTION actualizar_timestamp()
 RETURNS TRIGGER AS $$
@@ -367,6 +884,12 @@ CREATE INDEX idx_inscripciones_escuela ON inscripciones(escuela_id);
 CREATE INDEX idx_inscripciones_ciclo ON inscripciones(ciclo_id);
 CREATE INDEX idx_inscripciones_alumno ON inscripciones(alumno_id);
 CREATE INDEX idx_inscripciones_escuela_status ON inscripciones(escuela_id, status);
+-- Paginación por llave (fecha_solicitud, inscripcion_id) de los listados
+CREATE INDEX idx_inscripciones_fecha ON inscripciones(fecha_solicitud, inscripcion_id);
+CREATE INDEX idx_inscripciones_escuela_fecha ON inscripciones(escuela_id, fecha_solicitud, inscripcion_id);
+CREATE INDEX idx_inscripciones_status_fecha ON inscripciones(status, fecha_solicitud, inscripcion_id);
+-- Aceptadas que esperan la colocación automática en un grupo
+CREATE INDEX idx_inscripciones_sin_grupo ON inscripciones(escuela_id, ciclo_id) WHERE status = 'aceptado' AND grupo_id IS NULL;
 
 -- Documentos de alumnos
 CREATE INDEX idx_documento_alumno_status ON documento_alumno(status);
@@ -396,6 +919,7 @@ CREATE INDEX idx_audit_logs_tabla ON audit_logs(tabla_afectada);
 -- Relación alumno-tutor
 CREATE INDEX idx_alumno_tutor_alumno ON alumno_tutor(alumno_id);
 CREATE INDEX idx_alumno_tutor_representante ON alumno_tutor(alumno_id) WHERE es_representante = TRUE;
+CREATE INDEX idx_alumno_tutor_tutor ON alumno_tutor(tutor_id, alumno_id);
 
 -- vistas
 CREATE OR REPLACE VIEW vista_inscripciones_completa AS
@@ -466,8 +990,9 @@ WHERE da.status IN ('pendiente', 'recibido')
   AND i.status IN ('pendiente', 'en_revision')
   AND td.activo = TRUE;
 
-  --vista estadisticas por escuela
-  CREATE OR REPLACE VIEW vista_estadisticas_escuela AS
+  --vista estadisticas por escuela (ciclo activo, desde contadores_escuela)
+DROP VIEW IF EXISTS vista_estadisticas_escuela;
+CREATE VIEW vista_estadisticas_escuela AS
 SELECT 
     e.escuela_id,
     e.cct,
@@ -479,39 +1004,30 @@ SELECT
     e.activo,
     CONCAT(d.nombre, ' ', d.apellido_paterno, ' ', d.apellido_materno) AS director_nombre,
     d.correo AS director_correo,
-    COUNT(DISTINCT CASE WHEN i.status = 'aceptado' THEN i.alumno_id END) AS alumnos_aceptados,
-    COUNT(DISTINCT CASE WHEN i.status = 'pendiente' THEN i.alumno_id END) AS solicitudes_pendientes,
-    COUNT(DISTINCT CASE WHEN i.status = 'en_revision' THEN i.alumno_id END) AS solicitudes_en_revision,
-    COUNT(DISTINCT CASE WHEN i.status = 'rechazado' THEN i.alumno_id END) AS solicitudes_rechazadas,
-    COUNT(DISTINCT gr.grupo_id) AS grupos_totales,
-    COALESCE(SUM(gr.cupo), 0) AS cupo_grupos,
-    COALESCE(SUM(gr.alumnos_inscritos), 0) AS total_alumnos_en_grupos,
-    e.cupo_total - COUNT(DISTINCT CASE WHEN i.status = 'aceptado' THEN i.alumno_id END) AS cupos_disponibles
+    COALESCE(ce.aceptados, 0) AS alumnos_aceptados,
+    COALESCE(ce.pendientes, 0) AS solicitudes_pendientes,
+    COALESCE(ce.en_revision, 0) AS solicitudes_en_revision,
+    COALESCE(ce.rechazados, 0) AS solicitudes_rechazadas,
+    COALESCE(ce.grupos_totales, 0) AS grupos_totales,
+    COALESCE(ce.cupo_grupos, 0) AS cupo_grupos,
+    COALESCE(ce.alumnos_en_grupos, 0) AS total_alumnos_en_grupos,
+    e.cupo_total - COALESCE(ce.aceptados, 0) AS cupos_disponibles
 FROM escuelas e
 LEFT JOIN usuarios d ON e.director_usuario_id = d.usuario_id
-LEFT JOIN inscripciones i ON e.escuela_id = i.escuela_id 
-    AND i.ciclo_id = (SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1)
-LEFT JOIN grupos gr ON e.escuela_id = gr.escuela_id 
-    AND gr.ciclo_id = (SELECT ciclo_id FROM ciclos WHERE activo = TRUE LIMIT 1)
-GROUP BY e.escuela_id, e.cct, e.nombre, e.municipio, e.entidad, e.turno, e.cupo_total, e.activo, d.nombre, d.apellido_paterno, d.apellido_materno, d.correo;
----vista:progreso de documentos por alumno
-CREATE OR REPLACE VIEW vista_progreso_documentos AS
+LEFT JOIN ciclos c ON c.activo = TRUE
+LEFT JOIN contadores_escuela ce ON ce.escuela_id = e.escuela_id AND ce.ciclo_id = c.ciclo_id;
+---vista:progreso de documentos por alumno (lee progreso_documentos)
+DROP VIEW IF EXISTS vista_progreso_documentos;
+CREATE VIEW vista_progreso_documentos AS
 SELECT 
     a.alumno_id,
     CONCAT(a.nombre, ' ', a.apellido_paterno, ' ', a.apellido_materno) AS alumno_nombre,
-    COUNT(DISTINCT td.tipo_doc_id) FILTER (WHERE td.requerido = TRUE) AS documentos_requeridos,
-    COUNT(DISTINCT da.tipo_doc_id) FILTER (WHERE td.requerido = TRUE) AS documentos_subidos,
-    COUNT(DISTINCT da.tipo_doc_id) FILTER (WHERE td.requerido = TRUE AND da.status = 'validado') AS documentos_validados,
-    ROUND(
-        100.0 * COUNT(DISTINCT da.tipo_doc_id) FILTER (WHERE td.requerido = TRUE) / 
-        NULLIF(COUNT(DISTINCT td.tipo_doc_id) FILTER (WHERE td.requerido = TRUE), 0), 
-        2
-    ) AS porcentaje_completado
+    p.requeridos AS documentos_requeridos,
+    p.subidos AS documentos_subidos,
+    p.validados AS documentos_validados,
+    ROUND(100.0 * p.subidos / NULLIF(p.requeridos, 0), 2) AS porcentaje_completado
 FROM alumnos a
-CROSS JOIN tipos_documento td
-LEFT JOIN documento_alumno da ON a.alumno_id = da.alumno_id AND td.tipo_doc_id = da.tipo_doc_id
-WHERE td.activo = TRUE
-GROUP BY a.alumno_id, a.nombre, a.apellido_paterno, a.apellido_materno;
+INNER JOIN progreso_documentos p ON p.alumno_id = a.alumno_id;
 --funciones utiles
 CREATE OR REPLACE FUNCTION obtener_documentos_faltantes(p_alumno_id INTEGER)
 RETURNS TABLE(
@@ -530,16 +1046,83 @@ BEGIN
     FROM tipos_documento td
     WHERE td.requerido = TRUE
       AND td.activo = TRUE
-      AND NOT EXISTS (
-          SELECT 1 
-          FROM documento_alumno da 
-          WHERE da.alumno_id = p_alumno_id
-            AND da.tipo_doc_id = td.tipo_doc_id
-      )
+      AND COALESCE((
+          SELECT p.mascara_entregados
+          FROM progreso_documentos p
+          WHERE p.alumno_id = p_alumno_id
+      ), 0) & (1::BIGINT << td.tipo_doc_id) = 0
     ORDER BY td.nombre;
 END;
 $$ LANGUAGE plpgsql;
---Funcion: verificar si un alumno puede inscribirse
+--Funcion: elegibilidad de varios alumnos contra varias escuelas en una sola consulta.
+-- p_escuela_ids NULL = todas las escuelas activas. p_en_revision = TRUE evalúa
+-- solicitudes ya hechas (revisión del director): no revisa si las inscripciones
+-- siguen abiertas ni si el alumno ya tiene solicitud en el ciclo.
+CREATE OR REPLACE FUNCTION elegibilidad_inscripcion(
+    p_alumno_ids INTEGER[],
+    p_escuela_ids INTEGER[],
+    p_ciclo_id INTEGER,
+    p_en_revision BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE(
+    alumno_id INTEGER,
+    escuela_id INTEGER,
+    puede_inscribirse BOOLEAN,
+    mensaje TEXT,
+    cupos_disponibles INTEGER,
+    documentos_faltantes INTEGER
+) AS $$
+    WITH ciclo AS (
+        SELECT
+            COALESCE(bool_or(c.activo), FALSE) AS activo,
+            COALESCE(bool_or(c.inscripciones_abiertas), FALSE) AS abiertas
+        FROM ciclos c
+        WHERE c.ciclo_id = p_ciclo_id
+    ),
+    candidatos AS (
+        SELECT
+            a.alumno_id,
+            EXISTS (
+                SELECT 1 FROM inscripciones i
+                WHERE i.alumno_id = a.alumno_id
+                  AND i.ciclo_id = p_ciclo_id
+            ) AS ya_inscrito,
+            COALESCE(p.requeridos - p.subidos, contar_bits(mascara_documentos_requeridos())) AS faltantes
+        FROM (SELECT DISTINCT unnest(p_alumno_ids) AS alumno_id) a
+        LEFT JOIN progreso_documentos p ON p.alumno_id = a.alumno_id
+    ),
+    destinos AS (
+        SELECT
+            e.escuela_id,
+            e.cupo_total - COALESCE(ce.aceptados, 0) AS cupos
+        FROM escuelas e
+        LEFT JOIN contadores_escuela ce ON ce.escuela_id = e.escuela_id AND ce.ciclo_id = p_ciclo_id
+        WHERE CASE WHEN p_escuela_ids IS NULL THEN e.activo = TRUE
+                   ELSE e.escuela_id = ANY(p_escuela_ids) END
+    )
+    SELECT
+        a.alumno_id,
+        d.escuela_id,
+        m.motivo IS NULL,
+        COALESCE(m.motivo, 'El alumno puede inscribirse'),
+        d.cupos,
+        a.faltantes
+    FROM candidatos a
+    CROSS JOIN destinos d
+    CROSS JOIN ciclo c
+    CROSS JOIN LATERAL (
+        SELECT CASE
+            WHEN NOT c.activo THEN 'El ciclo escolar no está activo'
+            WHEN NOT p_en_revision AND NOT c.abiertas THEN 'Las inscripciones están cerradas para este ciclo'
+            WHEN NOT p_en_revision AND a.ya_inscrito THEN 'El alumno ya tiene una solicitud de inscripción para este ciclo'
+            WHEN d.cupos <= 0 THEN 'No hay cupos disponibles en la escuela'
+            WHEN a.faltantes > 0 THEN 'Faltan ' || a.faltantes || ' documento(s) requerido(s)'
+        END AS motivo
+    ) m
+    ORDER BY a.alumno_id, d.escuela_id;
+$$ LANGUAGE sql STABLE;
+
+--Funcion: verificar si un alumno puede inscribirse (un solo par de elegibilidad_inscripcion)
 CREATE OR REPLACE FUNCTION puede_inscribirse(
     p_alumno_id INTEGER, 
     p_escuela_id INTEGER, 
@@ -549,63 +1132,318 @@ RETURNS TABLE(
     puede_inscribirse BOOLEAN,
     mensaje TEXT
 ) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT el.puede_inscribirse, el.mensaje
+    FROM elegibilidad_inscripcion(ARRAY[p_alumno_id], ARRAY[p_escuela_id], p_ciclo_id) el;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT FALSE, 'La escuela no existe';
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- funcion: lugares libres de los grupos de un grado menos los que ya tienen
+-- apartados las aceptadas que esperan grupo (aceptar_sin_grupo). Las tres
+-- formas de aceptar (asignar_lugar_grupo, aceptar_sin_grupo y
+-- revisar_inscripciones_lote) la consultan con el advisory lock del grado
+-- tomado, para que la colocación automática siempre tenga lugar para ellas.
+CREATE OR REPLACE FUNCTION lugares_libres_grado(
+    p_escuela_id INTEGER,
+    p_ciclo_id INTEGER,
+    p_grado_id INTEGER
+)
+RETURNS INTEGER AS $$
+    SELECT (
+        COALESCE(SUM(GREATEST(g.cupo - g.alumnos_inscritos, 0)), 0) - (
+            SELECT COUNT(*)
+            FROM inscripciones i
+            WHERE i.escuela_id = p_escuela_id
+              AND i.ciclo_id = p_ciclo_id
+              AND i.grado_id = p_grado_id
+              AND i.status = 'aceptado'
+              AND i.grupo_id IS NULL
+        )
+    )::INTEGER
+    FROM grupos g
+    WHERE g.escuela_id = p_escuela_id
+      AND g.ciclo_id = p_ciclo_id
+      AND g.grado_id = p_grado_id;
+$$ LANGUAGE sql STABLE;
+
+-- funcion: aceptar una inscripción apartando un lugar en un grupo con cupo.
+-- Las aceptaciones del mismo grado de una escuela se ordenan con un advisory
+-- lock de la transacción; dentro se bloquea el grupo antes de que el trigger
+-- sume al alumno, así el CHECK de cupo no falla por aceptaciones concurrentes
+-- y no hay deadlocks entre revisores. Si el grupo pedido está lleno (y
+-- p_otro_grupo) se usa el del mismo grado con más lugares libres.
+-- resultado: 'asignado', 'ya_aceptada', 'sin_cupo' o 'no_encontrada'.
+CREATE OR REPLACE FUNCTION asignar_lugar_grupo(
+    p_inscripcion_id INTEGER,
+    p_grupo_id INTEGER,
+    p_revisado_por INTEGER,
+    p_otro_grupo BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE(
+    grupo_id INTEGER,
+    resultado TEXT
+) AS $$
 DECLARE
-    v_cupos_disponibles INTEGER;
-    v_documentos_faltantes INTEGER;
-    v_ya_inscrito BOOLEAN;
-    v_ciclo_activo BOOLEAN;
-    v_inscripciones_abiertas BOOLEAN;
+    v_inscripcion RECORD;
+    v_grupo_id INTEGER;
 BEGIN
-    -- Verificar si el ciclo está activo y acepta inscripciones
-    SELECT activo, inscripciones_abiertas 
-    INTO v_ciclo_activo, v_inscripciones_abiertas
-    FROM ciclos 
-    WHERE ciclo_id = p_ciclo_id;
-
-    IF NOT v_ciclo_activo THEN
-        RETURN QUERY SELECT FALSE, 'El ciclo escolar no está activo';
+    SELECT i.escuela_id, i.ciclo_id, i.grado_id, i.status, i.grupo_id
+    INTO v_inscripcion
+    FROM inscripciones i
+    WHERE i.inscripcion_id = p_inscripcion_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT NULL::INTEGER, 'no_encontrada';
         RETURN;
     END IF;
 
-    IF NOT v_inscripciones_abiertas THEN
-        RETURN QUERY SELECT FALSE, 'Las inscripciones están cerradas para este ciclo';
+    IF v_inscripcion.status = 'aceptado' THEN
+        RETURN QUERY SELECT v_inscripcion.grupo_id, 'ya_aceptada';
         RETURN;
     END IF;
 
-    -- Verificar si ya está inscrito en este ciclo
-    SELECT EXISTS(
-        SELECT 1 FROM inscripciones 
-        WHERE alumno_id = p_alumno_id 
-          AND ciclo_id = p_ciclo_id
-    ) INTO v_ya_inscrito;
+    PERFORM pg_advisory_xact_lock(
+        v_inscripcion.escuela_id,
+        hashtext('asignar_lugar:' || v_inscripcion.ciclo_id || ':' || v_inscripcion.grado_id)
+    );
 
-    IF v_ya_inscrito THEN
-        RETURN QUERY SELECT FALSE, 'El alumno ya tiene una solicitud de inscripción para este ciclo';
+    -- los lugares apartados por las aceptadas sin grupo no se ocupan
+    IF lugares_libres_grado(v_inscripcion.escuela_id, v_inscripcion.ciclo_id, v_inscripcion.grado_id) <= 0 THEN
+        RETURN QUERY SELECT NULL::INTEGER, 'sin_cupo';
         RETURN;
     END IF;
 
-    -- Verificar cupos disponibles
-    SELECT cupos_disponibles INTO v_cupos_disponibles
-    FROM vista_estadisticas_escuela
-    WHERE escuela_id = p_escuela_id;
-
-    IF v_cupos_disponibles <= 0 THEN
-        RETURN QUERY SELECT FALSE, 'No hay cupos disponibles en la escuela';
+    -- el grupo pedido si tiene lugar; si no, el de más lugares libres
+    SELECT g.grupo_id INTO v_grupo_id
+    FROM grupos g
+    WHERE g.escuela_id = v_inscripcion.escuela_id
+      AND g.ciclo_id = v_inscripcion.ciclo_id
+      AND g.grado_id = v_inscripcion.grado_id
+      AND g.alumnos_inscritos < g.cupo
+      AND (g.grupo_id = p_grupo_id OR p_otro_grupo)
+    ORDER BY g.grupo_id = p_grupo_id DESC, g.cupo - g.alumnos_inscritos DESC, g.grupo_id
+    LIMIT 1
+    FOR UPDATE;
+
+    IF v_grupo_id IS NULL THEN
+        RETURN QUERY SELECT NULL::INTEGER, 'sin_cupo';
         RETURN;
     END IF;
 
-    -- Verificar documentos requeridos
-    SELECT COUNT(*) INTO v_documentos_faltantes
-    FROM obtener_documentos_faltantes(p_alumno_id);
+    UPDATE inscripciones
+    SET status = 'aceptado',
+        grupo_id = v_grupo_id,
+        revisado_por = p_revisado_por,
+        fecha_revision = CURRENT_TIMESTAMP,
+        motivo_rechazo = NULL
+    WHERE inscripcion_id = p_inscripcion_id;
+
+    RETURN QUERY SELECT v_grupo_id, 'asignado';
+END;
+$$ LANGUAGE plpgsql;
+
+-- funcion: aceptar una inscripción pendiente o en revisión sin grupo, para que
+-- la coloque después la colocación automática. Toma el mismo advisory lock que
+-- asignar_lugar_grupo y solo acepta si quedan lugares_libres_grado.
+-- p_escuela_id limita a la escuela de un director.
+-- resultado: 'aceptada', 'ya_aceptada', 'ya_revisada', 'sin_cupo',
+-- 'sin_permiso' o 'no_encontrada'.
+CREATE OR REPLACE FUNCTION aceptar_sin_grupo(
+    p_inscripcion_id INTEGER,
+    p_revisado_por INTEGER,
+    p_escuela_id INTEGER DEFAULT NULL
+)
+RETURNS TEXT AS $$
+DECLARE
+    v_inscripcion RECORD;
+BEGIN
+    SELECT i.escuela_id, i.ciclo_id, i.grado_id, i.status
+    INTO v_inscripcion
+    FROM inscripciones i
+    WHERE i.inscripcion_id = p_inscripcion_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN 'no_encontrada';
+    END IF;
+
+    IF p_escuela_id IS NOT NULL AND v_inscripcion.escuela_id <> p_escuela_id THEN
+        RETURN 'sin_permiso';
+    END IF;
+
+    IF v_inscripcion.status = 'aceptado' THEN
+        RETURN 'ya_aceptada';
+    END IF;
+
+    IF v_inscripcion.status NOT IN ('pendiente', 'en_revision') THEN
+        RETURN 'ya_revisada';
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(
+        v_inscripcion.escuela_id,
+        hashtext('asignar_lugar:' || v_inscripcion.ciclo_id || ':' || v_inscripcion.grado_id)
+    );
+
+    IF lugares_libres_grado(v_inscripcion.escuela_id, v_inscripcion.ciclo_id, v_inscripcion.grado_id) <= 0 THEN
+        RETURN 'sin_cupo';
+    END IF;
+
+    UPDATE inscripciones
+    SET status = 'aceptado',
+        grupo_id = NULL,
+        revisado_por = p_revisado_por,
+        fecha_revision = CURRENT_TIMESTAMP,
+        motivo_rechazo = NULL
+    WHERE inscripcion_id = p_inscripcion_id;
 
-    IF v_documentos_faltantes > 0 THEN
-        RETURN QUERY SELECT FALSE, 
-            'Faltan ' || v_documentos_faltantes || ' documento(s) requerido(s)';
+    RETURN 'aceptada';
+END;
+$$ LANGUAGE plpgsql;
+
+-- funcion: revisar varias inscripciones pendientes en una sola transacción
+-- (p_accion: 'aceptar', 'rechazar' o 'revisar'). Al aceptar reparte los
+-- lugares libres de los grupos de cada grado (el grupo preferido primero,
+-- después el más vacío) por orden de solicitud, sin tocar los lugares
+-- apartados por las aceptadas sin grupo (lugares_libres_grado), con los
+-- mismos bloqueos que asignar_lugar_grupo tomados siempre en el mismo orden. p_escuela_id limita
+-- el lote a la escuela de un director. Retorna un resultado por folio:
+-- 'aceptado', 'rechazado', 'en_revision', 'sin_cupo', 'ya_revisada',
+-- 'sin_permiso' o 'no_encontrada'.
+CREATE OR REPLACE FUNCTION revisar_inscripciones_lote(
+    p_inscripcion_ids INTEGER[],
+    p_accion TEXT,
+    p_revisado_por INTEGER,
+    p_escuela_id INTEGER DEFAULT NULL,
+    p_motivo_rechazo TEXT DEFAULT NULL,
+    p_grupo_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE(
+    inscripcion_id INTEGER,
+    resultado TEXT,
+    grupo_id INTEGER,
+    nombre_grupo VARCHAR
+) AS $$
+BEGIN
+    IF p_accion NOT IN ('aceptar', 'rechazar', 'revisar') THEN
+        RAISE EXCEPTION 'Acción inválida: %', p_accion;
+    END IF;
+
+    -- inscripciones del lote en orden de folio (dos lotes no se cruzan)
+    PERFORM 1
+    FROM inscripciones i
+    WHERE i.inscripcion_id = ANY(p_inscripcion_ids)
+      AND (p_escuela_id IS NULL OR i.escuela_id = p_escuela_id)
+    ORDER BY i.inscripcion_id
+    FOR UPDATE;
+
+    IF p_accion = 'aceptar' THEN
+        PERFORM pg_advisory_xact_lock(t.escuela_id, hashtext('asignar_lugar:' || t.ciclo_id || ':' || t.grado_id))
+        FROM (
+            SELECT DISTINCT i.escuela_id, i.ciclo_id, i.grado_id
+            FROM inscripciones i
+            WHERE i.inscripcion_id = ANY(p_inscripcion_ids)
+              AND (p_escuela_id IS NULL OR i.escuela_id = p_escuela_id)
+              AND i.status IN ('pendiente', 'en_revision')
+            ORDER BY i.escuela_id, i.ciclo_id, i.grado_id
+        ) t;
+
+        RETURN QUERY
+        WITH candidatas AS (
+            SELECT
+                i.inscripcion_id, i.escuela_id, i.ciclo_id, i.grado_id,
+                ROW_NUMBER() OVER (
+                    PARTITION BY i.escuela_id, i.ciclo_id, i.grado_id
+                    ORDER BY i.fecha_solicitud, i.inscripcion_id
+                ) AS turno,
+                lugares_libres_grado(i.escuela_id, i.ciclo_id, i.grado_id) AS libres
+            FROM inscripciones i
+            WHERE i.inscripcion_id = ANY(p_inscripcion_ids)
+              AND (p_escuela_id IS NULL OR i.escuela_id = p_escuela_id)
+              AND i.status IN ('pendiente', 'en_revision')
+        ),
+        grupos_lote AS (
+            SELECT g.grupo_id, g.escuela_id, g.ciclo_id, g.grado_id, g.cupo, g.alumnos_inscritos
+            FROM grupos g
+            WHERE (g.escuela_id, g.ciclo_id, g.grado_id) IN (
+                SELECT c.escuela_id, c.ciclo_id, c.grado_id FROM candidatas c
+            )
+            ORDER BY g.grupo_id
+            FOR UPDATE
+        ),
+        lugares AS (
+            SELECT
+                g.grupo_id, g.escuela_id, g.ciclo_id, g.grado_id,
+                ROW_NUMBER() OVER (
+                    PARTITION BY g.escuela_id, g.ciclo_id, g.grado_id
+                    ORDER BY g.grupo_id IS NOT DISTINCT FROM p_grupo_id DESC,
+                             g.alumnos_inscritos + n, g.grupo_id
+                ) AS turno
+            FROM grupos_lote g
+            CROSS JOIN LATERAL generate_series(1, g.cupo - g.alumnos_inscritos) n
+        ),
+        aceptadas AS (
+            UPDATE inscripciones i
+            SET status = 'aceptado',
+                grupo_id = l.grupo_id,
+                revisado_por = p_revisado_por,
+                fecha_revision = CURRENT_TIMESTAMP,
+                motivo_rechazo = NULL
+            FROM candidatas c
+            INNER JOIN lugares l USING (escuela_id, ciclo_id, grado_id, turno)
+            WHERE i.inscripcion_id = c.inscripcion_id
+              AND c.turno <= c.libres
+            RETURNING i.inscripcion_id, i.grupo_id
+        )
+        SELECT
+            x.id,
+            CASE
+                WHEN a.inscripcion_id IS NOT NULL THEN 'aceptado'
+                WHEN i.inscripcion_id IS NULL THEN 'no_encontrada'
+                WHEN p_escuela_id IS NOT NULL AND i.escuela_id <> p_escuela_id THEN 'sin_permiso'
+                WHEN i.status IN ('pendiente', 'en_revision') THEN 'sin_cupo'
+                ELSE 'ya_revisada'
+            END,
+            g.grupo_id,
+            g.nombre_grupo
+        FROM unnest(p_inscripcion_ids) AS x(id)
+        LEFT JOIN aceptadas a ON a.inscripcion_id = x.id
+        LEFT JOIN inscripciones i ON i.inscripcion_id = x.id
+        LEFT JOIN grupos g ON g.grupo_id = a.grupo_id;
         RETURN;
     END IF;
 
-    -- Todo correcto
-    RETURN QUERY SELECT TRUE, 'El alumno puede inscribirse';
+    RETURN QUERY
+    WITH cambiadas AS (
+        UPDATE inscripciones i
+        SET status = CASE WHEN p_accion = 'rechazar' THEN 'rechazado' ELSE 'en_revision' END::enroll_status,
+            revisado_por = p_revisado_por,
+            fecha_revision = CURRENT_TIMESTAMP,
+            motivo_rechazo = CASE WHEN p_accion = 'rechazar' THEN p_motivo_rechazo END,
+            grupo_id = NULL
+        WHERE i.inscripcion_id = ANY(p_inscripcion_ids)
+          AND (p_escuela_id IS NULL OR i.escuela_id = p_escuela_id)
+          AND i.status IN ('pendiente', 'en_revision')
+        RETURNING i.inscripcion_id, i.status
+    )
+    SELECT
+        x.id,
+        CASE
+            WHEN c.inscripcion_id IS NOT NULL THEN c.status::TEXT
+            WHEN i.inscripcion_id IS NULL THEN 'no_encontrada'
+            WHEN p_escuela_id IS NOT NULL AND i.escuela_id <> p_escuela_id THEN 'sin_permiso'
+            ELSE 'ya_revisada'
+        END,
+        NULL::INTEGER,
+        NULL::VARCHAR
+    FROM unnest(p_inscripcion_ids) AS x(id)
+    LEFT JOIN cambiadas c ON c.inscripcion_id = x.id
+    LEFT JOIN inscripciones i ON i.inscripcion_id = x.id;
 END;
 $$ LANGUAGE plpgsql;
 
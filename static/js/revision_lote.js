@@ -0,0 +1,89 @@
+    // Revisión en lote: seleccionar inscripciones de la tabla y aceptarlas,
+    // rechazarlas o pasarlas a revisión con una sola petición
+    const formLote = document.getElementById('revisionLote');
+    const seleccionarTodas = document.getElementById('seleccionarTodas');
+    const casillasLote = () => [...document.querySelectorAll('input.seleccion-lote')];
+
+    function actualizarSeleccion() {
+      const marcadas = casillasLote().filter(c => c.checked).length;
+      document.getElementById('seleccionadasLote').textContent = marcadas;
+      formLote.querySelector('button[type="submit"]').disabled = marcadas === 0;
+    }
+
+    function mostrarCamposAccion() {
+      const accion = formLote.elements.accion.value;
+      formLote.querySelector('.motivo-lote').style.display = accion === 'rechazar' ? '' : 'none';
+      const grupo = formLote.querySelector('.grupo-lote');
+      if (grupo) grupo.style.display = accion === 'aceptar' ? '' : 'none';
+    }
+
+    function marcarFila(casilla, resultado) {
+      const row = casilla.closest('tr');
+      const div = row.querySelector('.resultado-lote');
+      div.textContent = resultado.mensaje;
+      div.className = 'resultado-lote ' + (['aceptado', 'rechazado', 'en_revision'].includes(resultado.resultado) ? 'success' : 'error');
+      if (['aceptado', 'rechazado', 'en_revision'].includes(resultado.resultado)) {
+        const badge = row.querySelector('.status-badge');
+        badge.className = 'status-badge status-' + resultado.resultado;
+        badge.textContent = resultado.resultado.replace('_', ' ');
+        row.dataset.status = resultado.resultado;
+        if (resultado.resultado !== 'en_revision') {
+          casilla.checked = false;
+          casilla.disabled = true;
+        }
+      }
+    }
+
+    if (formLote) {
+      casillasLote().forEach(c => c.addEventListener('change', actualizarSeleccion));
+      if (seleccionarTodas) {
+        seleccionarTodas.addEventListener('change', function() {
+          casillasLote().filter(c => !c.disabled && c.closest('tr').style.display !== 'none')
+            .forEach(c => c.checked = this.checked);
+          actualizarSeleccion();
+        });
+      }
+      formLote.elements.accion.addEventListener('change', mostrarCamposAccion);
+      mostrarCamposAccion();
+      actualizarSeleccion();
+
+      formLote.addEventListener('submit', function(e) {
+        e.preventDefault();
+        const marcadas = casillasLote().filter(c => c.checked);
+        const accion = this.elements.accion.value;
+        if (accion === 'rechazar' && !this.elements.motivo_rechazo.value.trim()) {
+          alert('Debe proporcionar un motivo de rechazo');
+          return;
+        }
+        const textoAccion = this.elements.accion.options[this.elements.accion.selectedIndex].text;
+        if (!confirm(`¿${textoAccion} ${marcadas.length} inscripción(es)?`)) return;
+
+        const datos = new FormData(this);
+        marcadas.forEach(c => datos.append('inscripcion', c.value));
+        const boton = this.querySelector('button[type="submit"]');
+        const resumen = document.getElementById('resumenLote');
+        boton.disabled = true;
+        resumen.textContent = 'Procesando...';
+
+        fetch(this.action, { method: 'POST', body: datos })
+          .then(response => response.json().then(data => ({ ok: response.ok, data })))
+          .then(({ ok, data }) => {
+            if (!ok) {
+              resumen.textContent = data.mensaje || 'Error al procesar las inscripciones';
+              return;
+            }
+            marcadas.forEach(c => {
+              const resultado = data.resultados[c.value];
+              if (resultado) marcarFila(c, resultado);
+            });
+            resumen.textContent = Object.entries(data.resumen)
+              .map(([resultado, total]) => `${resultado.replace('_', ' ')}: ${total}`)
+              .join(' · ');
+          })
+          .catch(error => {
+            console.error('Error en la revisión en lote:', error);
+            resumen.textContent = 'Error de conexión';
+          })
+          .finally(actualizarSeleccion);
+      });
+    }
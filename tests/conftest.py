@@ -0,0 +1,145 @@
+"""
+Configuración de pytest: el paquete se importa desde la raíz del repo.
+
+Las pruebas de algoritmos en memoria corren sin BD. Las que necesitan
+PostgreSQL usan la conexión configurada (DB_HOST, DB_NAME, ...) y se saltan
+si no hay servidor.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_connection  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    """La aplicación Flask, o skip si no hay conexión a PostgreSQL"""
+    try:
+        conn = get_connection()
+        conn.close()
+    except Exception as e:
+        pytest.skip(f"Sin conexión a PostgreSQL: {e}")
+    from app import app as aplicacion
+    aplicacion.config['TESTING'] = True
+    return aplicacion
+
+
+@pytest.fixture
+def tutor_con_hijos(app):
+    """Fábrica: usuario tutor con `n` alumnos vinculados -> (usuario_id, alumno_ids); todo se borra al terminar"""
+    creados = []
+
+    def crear(n):
+        marca = uuid.uuid4().hex[:8].upper()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO usuarios (correo, nombre, apellido_paterno, apellido_materno, rol, password_hash)
+                VALUES (%s, 'Tutor', 'Prueba', 'Presupuesto', 'tutor', 'x')
+                RETURNING usuario_id
+            """, (f"prueba_{marca.lower()}@ejemplo.com",))
+            usuario_id = cursor.fetchone()['usuario_id']
+            cursor.execute("""
+                INSERT INTO tutores (usuario_id, nombre, apellido_paterno, apellido_materno)
+                VALUES (%s, 'Tutor', 'Prueba', 'Presupuesto')
+                RETURNING tutor_id
+            """, (usuario_id,))
+            tutor_id = cursor.fetchone()['tutor_id']
+            cursor.execute("""
+                WITH nuevos AS (
+                    INSERT INTO alumnos (curp, nombre, apellido_paterno, apellido_materno, fecha_nacimiento)
+                    SELECT 'PRUE' || %s || lpad(n::TEXT, 6, '0'), 'Hijo', 'Prueba', 'Presupuesto', DATE '2018-01-01'
+                    FROM generate_series(1, %s) AS n
+                    RETURNING alumno_id
+                )
+                INSERT INTO alumno_tutor (alumno_id, tutor_id, es_representante)
+                SELECT alumno_id, %s, TRUE FROM nuevos
+                RETURNING alumno_id
+            """, (marca, n, tutor_id))
+            alumno_ids = [f['alumno_id'] for f in cursor.fetchall()]
+            conn.commit()
+        finally:
+            conn.close()
+        creados.append((usuario_id, alumno_ids))
+        return usuario_id, alumno_ids
+
+    yield crear
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for usuario_id, alumno_ids in creados:
+            cursor.execute("DELETE FROM alumnos WHERE alumno_id = ANY(%s)", (alumno_ids,))
+            cursor.execute("DELETE FROM tutores WHERE usuario_id = %s", (usuario_id,))
+            cursor.execute("DELETE FROM usuarios WHERE usuario_id = %s", (usuario_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def entregar_documentos(app):
+    """Función que registra como entregados los documentos requeridos de un alumno"""
+    def entregar(alumno_id):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO documento_alumno (alumno_id, tipo_doc_id, archivo_url)
+                SELECT %s, tipo_doc_id, 'prueba.pdf'
+                FROM tipos_documento
+                WHERE requerido AND activo
+            """, (alumno_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    return entregar
+
+
+@pytest.fixture
+def crear_escuela(app):
+    """Fábrica: escuela de prueba (activa o no) -> escuela_id; se borran al terminar"""
+    from models import catalogo_model
+    creadas = []
+
+    def crear(activo=True, cupo_total=30):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO escuelas (cct, nombre, cupo_total, activo)
+                VALUES (%s, 'Escuela de prueba', %s, %s)
+                RETURNING escuela_id
+            """, ('PRU' + uuid.uuid4().hex[:8].upper(), cupo_total, activo))
+            escuela_id = cursor.fetchone()['escuela_id']
+            conn.commit()
+        finally:
+            conn.close()
+        creadas.append(escuela_id)
+        # El NOTIFY llega por el hilo de escucha; aquí no se espera
+        catalogo_model.invalidar('escuelas')
+        return escuela_id
+
+    yield crear
+
+    conn = get_connection()
+    try:
+        conn.cursor().execute("DELETE FROM escuelas WHERE escuela_id = ANY(%s)", (creadas,))
+        conn.commit()
+    finally:
+        conn.close()
+    catalogo_model.invalidar('escuelas')
+
+
+@pytest.fixture
+def grado_id(app):
+    """Primer grado del catálogo"""
+    from models.catalogo_model import obtener_grados
+    return obtener_grados()[0]['grado_id']
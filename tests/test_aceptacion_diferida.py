@@ -0,0 +1,83 @@
+"""
+Aceptación diferida: con instancias al azar el resultado respeta los cupos
+y es estable (sin pares que bloqueen).
+"""
+import random
+from array import array
+
+import pytest
+
+from utils.aceptacion_diferida import aceptacion_diferida, claves_con_sorteo
+
+
+def _instancia(rng, alumnos, escuelas, max_opciones):
+    """Preferencias al azar en CSR, clases al azar y cupos (algunos en cero)"""
+    inicio, prefs, clases = array('l', [0]), array('l'), array('b')
+    for _ in range(alumnos):
+        opciones = rng.sample(range(escuelas), rng.randint(0, min(max_opciones, escuelas)))
+        prefs.extend(opciones)
+        clases.extend(rng.randint(0, 1) for _ in opciones)
+        inicio.append(len(prefs))
+    cupos = array('l', (rng.randint(0, 4) for _ in range(escuelas)))
+    return inicio, prefs, clases, cupos
+
+
+def _escuela_asignada(inicio, escuelas, asignada, i):
+    return escuelas[inicio[i] + asignada[i]] if asignada[i] >= 0 else None
+
+
+@pytest.mark.parametrize('semilla', range(40))
+def test_estable_y_dentro_del_cupo(semilla):
+    rng = random.Random(semilla)
+    inicio, escuelas, clases, cupos = _instancia(rng, rng.randint(1, 60), rng.randint(1, 8), 4)
+    claves = claves_con_sorteo(inicio, clases, rng)
+    asignada = aceptacion_diferida(inicio, escuelas, claves, cupos)
+    n = len(inicio) - 1
+
+    # Clave con la que cada alumno quedó en su escuela
+    retenidos = {e: [] for e in range(len(cupos))}
+    for i in range(n):
+        assert -1 <= asignada[i] < inicio[i + 1] - inicio[i]
+        e = _escuela_asignada(inicio, escuelas, asignada, i)
+        if e is not None:
+            retenidos[e].append(claves[inicio[i] + asignada[i]])
+
+    for e, claves_e in retenidos.items():
+        assert len(claves_e) <= cupos[e]
+
+    # Par que bloquea: el alumno prefiere una escuela que tiene lugar libre o
+    # que retiene a alguien con peor clave que la suya
+    for i in range(n):
+        hasta = asignada[i] if asignada[i] >= 0 else inicio[i + 1] - inicio[i]
+        for p in range(inicio[i], inicio[i] + hasta):
+            e = escuelas[p]
+            if cupos[e] == 0:
+                continue
+            assert len(retenidos[e]) == cupos[e], (i, e)
+            assert max(retenidos[e]) < claves[p], (i, e)
+
+
+def test_nadie_queda_fuera_si_sobra_cupo():
+    rng = random.Random(7)
+    inicio, escuelas, clases, _ = _instancia(rng, 50, 5, 3)
+    cupos = array('l', [50] * 5)
+    asignada = aceptacion_diferida(inicio, escuelas, claves_con_sorteo(inicio, clases, rng), cupos)
+    for i in range(len(inicio) - 1):
+        # Todos con al menos una opción quedan en su primera
+        assert asignada[i] == (0 if inicio[i + 1] > inicio[i] else -1)
+
+
+def test_claves_prioridad_antes_que_general_y_sorteo_unico():
+    rng = random.Random(3)
+    inicio, escuelas, clases, _ = _instancia(rng, 30, 6, 4)
+    claves = claves_con_sorteo(inicio, clases, rng)
+    n = len(inicio) - 1
+
+    numeros = set()
+    for i in range(n):
+        propios = {claves[p] % n for p in range(inicio[i], inicio[i + 1])}
+        assert len(propios) <= 1            # el mismo sorteo en todas sus escuelas
+        numeros |= propios
+        for p in range(inicio[i], inicio[i + 1]):
+            assert claves[p] // n == clases[p]
+    assert len(numeros) == sum(1 for i in range(n) if inicio[i + 1] > inicio[i])
@@ -0,0 +1,35 @@
+"""
+Resumen de la asignación por preferencias: las solicitudes que no entran se
+cuentan según el motivo (documentación incompleta o ninguna escuela activa).
+"""
+from models.asignacion_model import asignar_por_preferencias
+from models.catalogo_model import obtener_ciclo_activo_id
+from models.database import get_connection
+
+
+def _solicitar(alumno_id, escuela_id, grado_id):
+    conn = get_connection()
+    try:
+        conn.cursor().execute("""
+            INSERT INTO inscripciones (alumno_id, escuela_id, ciclo_id, grado_id, status)
+            VALUES (%s, %s, %s, %s, 'pendiente')
+        """, (alumno_id, escuela_id, obtener_ciclo_activo_id(), grado_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_sin_documentos_no_incluye_escuelas_inactivas(app, tutor_con_hijos, entregar_documentos, crear_escuela, grado_id):
+    activa, inactiva = crear_escuela(), crear_escuela(activo=False)
+    antes = asignar_por_preferencias(semilla=1, simular=True)
+    _, (sin_docs, solo_inactiva, completa) = tutor_con_hijos(3)
+    entregar_documentos(solo_inactiva)
+    entregar_documentos(completa)
+    _solicitar(sin_docs, activa, grado_id)
+    _solicitar(solo_inactiva, inactiva, grado_id)
+    _solicitar(completa, activa, grado_id)
+
+    despues = asignar_por_preferencias(semilla=1, simular=True)
+    assert despues['sin_documentos'] - antes['sin_documentos'] == 1
+    assert despues['sin_escuela_activa'] - antes['sin_escuela_activa'] == 1
+    assert despues['solicitudes'] - antes['solicitudes'] == 1
@@ -0,0 +1,74 @@
+"""
+Autorización tutor -> alumno: quitar un vínculo revoca el acceso en todos los
+workers sin esperar al TTL, y la elegibilidad con ?alumno= ajenos relee la BD
+a lo más una vez por petición.
+"""
+import time
+
+from models import escucha_bd
+from models.alumno_model import CANAL_ALUMNOS_TUTOR, ESPACIO_ALUMNOS_TUTOR, obtener_ids_alumnos_de_tutor
+from models.cache import obtener
+from models.database import get_connection, presupuesto_consultas
+from routes.inscripcion import MAXIMO_ALUMNOS_ELEGIBILIDAD
+from utils.autorizacion import tutor_tiene_alumno
+
+
+def _tutor_id(usuario_id):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tutor_id FROM tutores WHERE usuario_id = %s", (usuario_id,))
+        return cursor.fetchone()['tutor_id']
+    finally:
+        conn.close()
+
+
+def test_quitar_vinculo_revoca_el_acceso_cacheado(app, tutor_con_hijos):
+    usuario_id, (alumno_id,) = tutor_con_hijos(1)
+    tutor_id = _tutor_id(usuario_id)
+    assert escucha_bd.escuchando(CANAL_ALUMNOS_TUTOR, espera=5)
+    assert tutor_tiene_alumno(alumno_id, tutor_id)
+    assert obtener(ESPACIO_ALUMNOS_TUTOR, str(tutor_id)) == {alumno_id}
+
+    conn = get_connection()
+    try:
+        conn.cursor().execute("DELETE FROM alumno_tutor WHERE alumno_id = %s", (alumno_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    limite = time.monotonic() + 5
+    while obtener(ESPACIO_ALUMNOS_TUTOR, str(tutor_id)) is not None and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert obtener(ESPACIO_ALUMNOS_TUTOR, str(tutor_id)) is None
+    assert not tutor_tiene_alumno(alumno_id, tutor_id)
+
+
+def _cliente(app, usuario_id):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['usuario_id'] = usuario_id
+        sesion['rol'] = 'tutor'
+    return cliente
+
+
+def test_elegibilidad_relee_una_vez_con_alumnos_ajenos(app, tutor_con_hijos):
+    usuario_id, (propio,) = tutor_con_hijos(1)
+    _, ajenos = tutor_con_hijos(5)
+    obtener_ids_alumnos_de_tutor(_tutor_id(usuario_id))           # en cache
+    cliente = _cliente(app, usuario_id)
+    assert cliente.get('/elegibilidad').status_code == 200        # calienta principal y catálogos
+
+    with presupuesto_consultas(20) as sentencias:
+        resp = cliente.get('/elegibilidad', query_string=[('alumno', a) for a in [propio] + ajenos])
+    assert resp.status_code == 200
+    assert [s[0] for s in sentencias].count('EXECUTE ids_alumnos_de_tutor') == 1
+
+
+def test_elegibilidad_limita_los_alumnos_pedidos(app, tutor_con_hijos):
+    usuario_id, _ = tutor_con_hijos(1)
+    pedidos = [('alumno', 10 ** 6 + k) for k in range(MAXIMO_ALUMNOS_ELEGIBILIDAD + 1)]
+    with presupuesto_consultas(20) as sentencias:
+        resp = _cliente(app, usuario_id).get('/elegibilidad', query_string=pedidos)
+    assert resp.status_code == 400
+    assert 'EXECUTE ids_alumnos_de_tutor' not in [s[0] for s in sentencias]
@@ -0,0 +1,43 @@
+"""
+Conexión compartida de la petición: al soltarla el último modelo se termina
+la transacción de lectura (sin esperar al teardown), pero no la de un modelo
+que la sigue usando.
+"""
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from models.alumno_model import obtener_ids_alumnos_de_tutor
+from models.database import get_connection, unidad_de_trabajo
+
+
+def test_lectura_no_deja_transaccion_abierta(app):
+    with app.test_request_context():
+        assert obtener_ids_alumnos_de_tutor(0, refrescar=True) == frozenset()
+        conn = get_connection()
+        try:
+            assert conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+        finally:
+            conn.close()
+
+
+def test_modelo_anidado_no_revierte_al_que_lo_llama(app, tutor_con_hijos):
+    _, (alumno_id,) = tutor_con_hijos(1)
+    with app.test_request_context():
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE alumnos SET nombre = 'Anidado' WHERE alumno_id = %s", (alumno_id,))
+            obtener_ids_alumnos_de_tutor(0, refrescar=True)
+            assert conn.info.transaction_status == TRANSACTION_STATUS_INTRANS
+            cursor.execute("SELECT nombre FROM alumnos WHERE alumno_id = %s", (alumno_id,))
+            assert cursor.fetchone()['nombre'] == 'Anidado'
+            conn.rollback()
+        finally:
+            conn.close()
+
+
+def test_unidad_de_trabajo_sigue_difiriendo(app):
+    with app.test_request_context():
+        with unidad_de_trabajo() as conn:
+            obtener_ids_alumnos_de_tutor(0, refrescar=True)
+            assert conn.info.transaction_status == TRANSACTION_STATUS_INTRANS
+        assert get_connection().info.transaction_status == TRANSACTION_STATUS_IDLE
@@ -0,0 +1,66 @@
+"""
+Escuelas de otra opción en la solicitud de inscripción: solo se aceptan
+escuelas activas.
+"""
+import pytest
+
+from models.database import get_connection
+
+
+def _solicitar(app, usuario_id, alumno_id, escuela_id, grado_id, alternativas):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['usuario_id'] = usuario_id
+        sesion['rol'] = 'tutor'
+    resp = cliente.post('/inscripcion/solicitar', data={
+        'alumno_id': alumno_id, 'escuela_id': escuela_id, 'grado_id': grado_id,
+        'escuela_alternativa': alternativas,
+    })
+    with cliente.session_transaction() as sesion:
+        avisos = sesion.get('_flashes', [])
+    return resp, avisos
+
+
+def _preferencias(alumno_id):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT i.inscripcion_id, array_remove(array_agg(p.escuela_id ORDER BY p.orden), NULL) AS alternativas
+            FROM inscripciones i
+            LEFT JOIN preferencias_inscripcion p ON p.inscripcion_id = i.inscripcion_id
+            WHERE i.alumno_id = %s
+            GROUP BY i.inscripcion_id
+        """, (alumno_id,))
+        return [f['alternativas'] for f in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def escuelas(crear_escuela):
+    """(principal, otra activa, inactiva)"""
+    return crear_escuela(), crear_escuela(), crear_escuela(activo=False)
+
+
+@pytest.mark.parametrize('opcion', ['inexistente', 'inactiva'])
+def test_rechaza_escuela_inexistente_o_inactiva(app, tutor_con_hijos, escuelas, grado_id, opcion):
+    principal, otra, inactiva = escuelas
+    alternativas = {'inexistente': [str(2 ** 31 - 1)], 'inactiva': [str(otra), str(inactiva)]}[opcion]
+    usuario_id, (alumno_id,) = tutor_con_hijos(1)
+    resp, avisos = _solicitar(app, usuario_id, alumno_id, principal, grado_id, alternativas)
+    assert resp.status_code == 302 and resp.location.endswith('/inscripcion')
+    assert [categoria for categoria, _ in avisos] == ['error']
+    assert 'otra opción' in avisos[0][1]
+    assert _preferencias(alumno_id) == []
+
+
+def test_guarda_alternativas_activas_sin_repetir(app, tutor_con_hijos, entregar_documentos, escuelas, grado_id):
+    principal, otra, _ = escuelas
+    usuario_id, (alumno_id,) = tutor_con_hijos(1)
+    entregar_documentos(alumno_id)
+    resp, avisos = _solicitar(app, usuario_id, alumno_id, principal, grado_id,
+                              ['', str(principal), str(otra), str(otra)])
+    assert resp.status_code == 302 and resp.location.endswith('/mis-inscripciones')
+    assert [categoria for categoria, _ in avisos] == ['success']
+    assert _preferencias(alumno_id) == [[otra]]
@@ -0,0 +1,65 @@
+"""
+Lugares apartados por las aceptadas sin grupo ("auto"): las aceptaciones
+directas y por lote no los ocupan, y la colocación automática siempre
+encuentra lugar para ellas.
+"""
+import pytest
+
+from models.catalogo_model import obtener_ciclo_activo_id
+from models.colocacion_model import colocar_aceptados_escuela
+from models.database import get_connection
+from models.inscripcion_model import aceptar_inscripcion, aceptar_sin_grupo, revisar_inscripciones_lote
+
+
+@pytest.fixture
+def grado_con_grupo(app, crear_escuela, grado_id, tutor_con_hijos):
+    """Fábrica: escuela con un grupo de `cupo` lugares y `n` solicitudes pendientes -> (escuela_id, grupo_id, ids)"""
+    def crear(cupo, n):
+        escuela_id = crear_escuela()
+        _, alumno_ids = tutor_con_hijos(n)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO grupos (escuela_id, grado_id, ciclo_id, nombre_grupo, cupo)
+                VALUES (%s, %s, %s, 'A', %s)
+                RETURNING grupo_id
+            """, (escuela_id, grado_id, obtener_ciclo_activo_id(), cupo))
+            grupo_id = cursor.fetchone()['grupo_id']
+            cursor.execute("""
+                INSERT INTO inscripciones (alumno_id, escuela_id, ciclo_id, grado_id, status)
+                SELECT alumno_id, %s, %s, %s, 'pendiente'
+                FROM unnest(%s::INTEGER[]) WITH ORDINALITY AS a(alumno_id, n)
+                ORDER BY n
+                RETURNING inscripcion_id
+            """, (escuela_id, obtener_ciclo_activo_id(), grado_id, alumno_ids))
+            ids = sorted(f['inscripcion_id'] for f in cursor.fetchall())
+            conn.commit()
+        finally:
+            conn.close()
+        return escuela_id, grupo_id, ids
+    return crear
+
+
+def test_aceptar_directo_no_ocupa_lugar_apartado(grado_con_grupo):
+    escuela_id, grupo_id, (x, y) = grado_con_grupo(cupo=1, n=2)
+    assert aceptar_sin_grupo(x, None, escuela_id) == 'aceptada'
+
+    assert aceptar_inscripcion(y, grupo_id, None)['resultado'] == 'sin_cupo'
+    assert [r['resultado'] for r in revisar_inscripciones_lote([y], 'aceptar', None, escuela_id)] == ['sin_cupo']
+
+    colocacion = colocar_aceptados_escuela(escuela_id)
+    assert (colocacion['colocadas'], colocacion['sin_lugar']) == (1, 0)
+
+
+def test_aceptaciones_mezcladas_llenan_el_grupo_sin_pasarse(grado_con_grupo):
+    escuela_id, grupo_id, (x, y, z, w) = grado_con_grupo(cupo=3, n=4)
+    assert aceptar_sin_grupo(x, None, escuela_id) == 'aceptada'
+    assert aceptar_inscripcion(y, grupo_id, None)['resultado'] == 'asignado'
+    # Del lote solo cabe una: el lugar de x sigue apartado
+    resultados = revisar_inscripciones_lote([z, w], 'aceptar', None, escuela_id)
+    assert [r['resultado'] for r in resultados] == ['aceptado', 'sin_cupo']
+    assert aceptar_sin_grupo(w, None, escuela_id) == 'sin_cupo'
+
+    colocacion = colocar_aceptados_escuela(escuela_id)
+    assert (colocacion['colocadas'], colocacion['sin_lugar']) == (1, 0)
@@ -0,0 +1,34 @@
+"""
+Presupuesto de consultas del panel del tutor: el checklist documental de
+todos los hijos sale de una sola consulta, sin importar cuántos sean.
+"""
+import pytest
+
+from models.database import presupuesto_consultas
+
+# Sentencias de /panel-tutor con el principal y los catálogos ya en cache
+PRESUPUESTO_PANEL_TUTOR = 3
+
+
+def _sentencias_panel(app, usuario_id):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['usuario_id'] = usuario_id
+        sesion['rol'] = 'tutor'
+    assert cliente.get('/panel-tutor').status_code == 200      # calienta principal y catálogos
+    with presupuesto_consultas(PRESUPUESTO_PANEL_TUTOR) as sentencias:
+        assert cliente.get('/panel-tutor').status_code == 200
+    return sentencias
+
+
+@pytest.mark.parametrize('hijos', [1, 8])
+def test_un_checklist_para_todos_los_hijos(app, tutor_con_hijos, hijos):
+    sentencias = _sentencias_panel(app, tutor_con_hijos(hijos)[0])
+    checklists = [s for s in sentencias if s[3].endswith('obtener_checklist_documental_many')]
+    assert [s[0] for s in checklists] == ['EXECUTE documentos_de_alumnos']
+
+
+def test_sentencias_no_crecen_con_los_hijos(app, tutor_con_hijos):
+    uno = _sentencias_panel(app, tutor_con_hijos(1)[0])
+    muchos = _sentencias_panel(app, tutor_con_hijos(12)[0])
+    assert len(muchos) == len(uno)
@@ -0,0 +1,70 @@
+"""
+Reparto en grupos: ningún grupo pasa de su cupo y, si no caben todos, se
+quedan sin lugar los últimos en orden de prioridad.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from utils.reparto_grupos import repartir
+
+
+def _alumnos(rng, n):
+    return [
+        (1000 + k, rng.choice(['H', 'M', None]), date(2019, 1, 1) + timedelta(days=rng.randint(0, 364)))
+        for k in range(n)
+    ]
+
+
+def _grupos(rng, n):
+    grupos = []
+    for k in range(n):
+        cupo = rng.randint(1, 8)
+        hombres = rng.randint(0, cupo)
+        mujeres = rng.randint(0, cupo - hombres)
+        grupos.append({'grupo_id': 10 + k, 'cupo': cupo, 'inscritos': hombres + mujeres,
+                       'por_sexo': {'H': hombres, 'M': mujeres}})
+    return grupos
+
+
+@pytest.mark.parametrize('semilla', range(40))
+def test_respeta_cupo_y_orden_de_prioridad(semilla):
+    rng = random.Random(semilla)
+    grupos = _grupos(rng, rng.randint(1, 4))
+    inscritos_antes = {g['grupo_id']: g['inscritos'] for g in grupos}
+    libres = sum(g['cupo'] - g['inscritos'] for g in grupos)
+    alumnos = _alumnos(rng, rng.randint(0, 30))
+
+    asignaciones, sin_lugar = repartir(alumnos, grupos)
+
+    ids = [a[0] for a in alumnos]
+    colocados = [inscripcion_id for inscripcion_id, _ in asignaciones]
+    assert sorted(colocados) == sorted(ids[:libres])
+    assert sin_lugar == ids[libres:]
+
+    por_grupo = {g['grupo_id']: 0 for g in grupos}
+    for _, grupo_id in asignaciones:
+        por_grupo[grupo_id] += 1
+    for g in grupos:
+        assert inscritos_antes[g['grupo_id']] + por_grupo[g['grupo_id']] == g['inscritos'] <= g['cupo']
+
+
+def test_grupos_llenos_o_excedidos_no_reciben():
+    grupos = [
+        {'grupo_id': 1, 'cupo': 3, 'inscritos': 3, 'por_sexo': {'H': 3}},
+        {'grupo_id': 2, 'cupo': 3, 'inscritos': 4, 'por_sexo': {'M': 4}},
+        {'grupo_id': 3, 'cupo': 3, 'inscritos': 1, 'por_sexo': {'H': 1}},
+    ]
+    alumnos = [(k, 'M', date(2019, 1, k + 1)) for k in range(4)]
+    asignaciones, sin_lugar = repartir(alumnos, grupos)
+    assert asignaciones == [(0, 3), (1, 3)]
+    assert sin_lugar == [2, 3]
+
+
+def test_sexo_repartido_segun_cupo():
+    grupos = [{'grupo_id': k, 'cupo': 10, 'inscritos': 0, 'por_sexo': {}} for k in range(2)]
+    alumnos = [(k, 'H' if k % 2 else 'M', date(2019, 1, 1) + timedelta(days=k)) for k in range(20)]
+    repartir(alumnos, grupos)
+    for g in grupos:
+        assert g['por_sexo'] == {'H': 5, 'M': 5}
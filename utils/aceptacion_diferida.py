@@ -0,0 +1,73 @@
+"""
+Aceptación diferida (Gale-Shapley con propuestas de los alumnos) sobre
+arreglos compactos, para correr sobre todas las solicitudes de un ciclo.
+
+Las preferencias van en formato CSR: las del alumno i son
+escuelas[inicio[i]:inicio[i + 1]], de la más a la menos deseada, y claves[p]
+es la prioridad del alumno en esa escuela (menor = mejor, sin empates dentro
+de una escuela). Cada escuela retiene a sus mejores propuestas hasta su cupo
+en un heap de enteros; el resultado es estable y ningún alumno gana mintiendo
+sobre sus preferencias.
+"""
+import heapq
+from array import array
+
+
+def claves_con_sorteo(inicio, clases, semilla_rng):
+    """
+    Prioridad de cada preferencia: su clase (0 = prioridad, 1 = general) y,
+    dentro de la clase, un número de sorteo único por alumno (el mismo en
+    todas sus escuelas). semilla_rng es un random.Random ya sembrado.
+    """
+    n = len(inicio) - 1
+    sorteo = array('l', range(n))
+    semilla_rng.shuffle(sorteo)
+    claves = array('q', bytes(8 * len(clases)))
+    for i in range(n):
+        numero = sorteo[i]
+        for p in range(inicio[i], inicio[i + 1]):
+            claves[p] = clases[p] * n + numero
+    return claves
+
+
+def aceptacion_diferida(inicio, escuelas, claves, cupos):
+    """
+    inicio, escuelas, claves: preferencias en CSR (ver arriba); cupos[e]:
+    lugares de la escuela e. Retorna array asignada[i] = posición en la lista
+    del alumno de la escuela que le tocó (0 = primera opción) o -1 sin lugar.
+    """
+    n = len(inicio) - 1
+    siguiente = array('l', inicio[:n])
+    retenidas = [None] * len(cupos)
+    libres = list(range(n - 1, -1, -1))
+    while libres:
+        i = libres.pop()
+        p = siguiente[i]
+        if p == inicio[i + 1]:
+            continue                      # sin más opciones: se queda sin lugar
+        siguiente[i] = p + 1
+        e = escuelas[p]
+        cupo = cupos[e]
+        if cupo <= 0:
+            libres.append(i)
+            continue
+        # Heap de máximos por clave: -(clave * n + i) guarda también al alumno
+        propuesta = -(claves[p] * n + i)
+        heap = retenidas[e]
+        if heap is None:
+            retenidas[e] = [propuesta]
+        elif len(heap) < cupo:
+            heapq.heappush(heap, propuesta)
+        elif propuesta > heap[0]:
+            rechazada = heapq.heapreplace(heap, propuesta)
+            libres.append(-rechazada % n)
+        else:
+            libres.append(i)
+
+    asignada = array('l', [-1]) * n
+    for heap in retenidas:
+        if heap:
+            for propuesta in heap:
+                i = -propuesta % n
+                asignada[i] = siguiente[i] - 1 - inicio[i]
+    return asignada
@@ -0,0 +1,27 @@
+"""
+Autorización sobre alumnos: ¿el tutor T tiene a su cargo al alumno A?
+
+Se responde con el conjunto de alumno_id de cada tutor, cacheado (ver
+alumno_model.obtener_ids_alumnos_de_tutor) mientras la escucha de
+alumno_tutor está activa: al quitar un vínculo se descarta en todos los nodos.
+Un "no" se confirma releyendo el conjunto de la BD: un vínculo recién creado
+en otro worker puede tardar unos instantes en invalidar su cache local, y
+negar el acceso por eso no es aceptable.
+"""
+from models.alumno_model import obtener_ids_alumnos_de_tutor
+from utils.principal import tutor_actual
+
+
+def tutor_tiene_alumno(alumno_id, tutor_id=None):
+    """True si el alumno está vinculado al tutor (por defecto, el de la sesión)"""
+    if tutor_id is None:
+        tutor = tutor_actual()
+        if not tutor:
+            return False
+        tutor_id = tutor['tutor_id']
+    ids = obtener_ids_alumnos_de_tutor(tutor_id)
+    if ids is not None and alumno_id in ids:
+        return True
+    ids = obtener_ids_alumnos_de_tutor(tutor_id, refrescar=True)
+    return ids is not None and alumno_id in ids
+
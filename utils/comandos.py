@@ -0,0 +1,113 @@
+"""
+Comandos de mantenimiento para cron o para correr a mano:
+
+    flask --app app reconciliar-contadores
+    flask --app app colocar-aceptados [--escuela N] [--ciclo N] [--simular]
+    flask --app app asignar-preferencias [--ciclo N] [--semilla N] [--simular] [--rechazar-sin-lugar]
+
+Y para medir, solo contra una copia de la base:
+
+    flask --app app medir-contadores --confirmar [--alumnos N] [--grupos N] [--repeticiones N]
+"""
+import os
+import click
+from flask.cli import with_appcontext
+from models.database import presupuesto_bd
+from models.escuela_model import reconciliar_contadores
+from models.documento_model import reconciliar_progreso
+from models.colocacion_model import colocar_aceptados, colocar_aceptados_escuela
+from models.asignacion_model import asignar_por_preferencias
+from models.medicion_contadores import medir_contadores
+
+
+@click.command('reconciliar-contadores')
+@with_appcontext
+@presupuesto_bd('reporte')
+def reconciliar_contadores_comando():
+    """Recalcular contadores_escuela y progreso_documentos desde sus tablas de origen"""
+    corregidas = reconciliar_contadores()
+    if corregidas is None:
+        raise click.ClickException("No se pudieron reconciliar los contadores")
+    click.echo(f"🧮 Contadores reconciliados: {corregidas} fila(s) corregida(s)")
+    corregidas = reconciliar_progreso()
+    if corregidas is None:
+        raise click.ClickException("No se pudo reconciliar el progreso documental")
+    click.echo(f"📈 Progreso documental reconciliado: {corregidas} fila(s) corregida(s)")
+
+
+@click.command('colocar-aceptados')
+@click.option('--escuela', type=int, help="Solo esta escuela (por defecto, todas)")
+@click.option('--ciclo', type=int, help="Ciclo (por defecto, el activo)")
+@click.option('--simular', is_flag=True, help="Calcular el reparto sin guardarlo")
+@with_appcontext
+@presupuesto_bd('reporte')
+def colocar_aceptados_comando(escuela, ciclo, simular):
+    """Colocar en grupos las inscripciones aceptadas que aún no tienen grupo"""
+    if escuela:
+        resultado = colocar_aceptados_escuela(escuela, ciclo, simular=simular)
+        if resultado is None:
+            raise click.ClickException(f"No se pudo colocar la escuela {escuela}")
+        resultado = dict(resultado, escuelas=1, fallidas=0)
+    else:
+        resultado = colocar_aceptados(ciclo, simular=simular)
+        if resultado is None:
+            raise click.ClickException("No se pudieron leer las escuelas por colocar")
+    prefijo = "🧪 Simulación: " if simular else "🏫 "
+    click.echo(
+        f"{prefijo}{resultado['colocadas']} alumno(s) colocados en {resultado['escuelas']} escuela(s); "
+        f"{resultado['sin_lugar']} sin lugar, {resultado['fallidas']} escuela(s) con error"
+    )
+
+
+@click.command('asignar-preferencias')
+@click.option('--ciclo', type=int, help="Ciclo (por defecto, el activo)")
+@click.option('--semilla', type=int, help="Semilla del sorteo (por defecto, una al azar que se reporta)")
+@click.option('--simular', is_flag=True, help="Calcular la asignación sin guardarla")
+@click.option('--rechazar-sin-lugar', is_flag=True, help="Rechazar las solicitudes que no alcanzan lugar")
+@with_appcontext
+@presupuesto_bd('lote')
+def asignar_preferencias_comando(ciclo, semilla, simular, rechazar_sin_lugar):
+    """Asignar escuela a las solicitudes pendientes por preferencias, prioridad y sorteo"""
+    resumen = asignar_por_preferencias(ciclo, semilla, simular=simular, rechazar_sin_lugar=rechazar_sin_lugar)
+    if resumen is None:
+        raise click.ClickException("No se pudo completar la asignación por preferencias")
+    prefijo = "🧪 Simulación" if simular else "🎯 Asignación"
+    click.echo(f"{prefijo} del ciclo {resumen['ciclo_id']} con semilla {resumen['semilla']} ({resumen['segundos']} s)")
+    click.echo(f"   Solicitudes: {resumen['solicitudes']} (sin documentación completa: {resumen['sin_documentos']}, "
+               f"sin escuela activa: {resumen['sin_escuela_activa']})")
+    opciones = ', '.join(f"{n} en su opción {opcion}" for opcion, n in resumen['por_opcion'].items())
+    click.echo(f"   Asignadas: {resumen['asignadas']}" + (f" ({opciones})" if opciones else ''))
+    click.echo(f"   Sin lugar: {resumen['sin_lugar']}" + (f" (rechazadas: {resumen['rechazadas']})" if resumen['rechazadas'] else ''))
+
+
+@click.command('medir-contadores')
+@click.option('--alumnos', type=int, default=2000, show_default=True, help="Inscripciones que cambian de status en bloque")
+@click.option('--grupos', type=int, default=20, show_default=True, help="Grupos entre los que se reparten")
+@click.option('--repeticiones', type=int, default=3, show_default=True, help="Veces que se mide cada caso (se reporta la mediana)")
+@click.option('--confirmar', is_flag=True, help="Confirmar que la base configurada es una copia desechable")
+@with_appcontext
+@presupuesto_bd('lote')
+def medir_contadores_comando(alumnos, grupos, repeticiones, confirmar):
+    """Comparar los triggers de contadores por sentencia y por fila (solo en una copia de la base)"""
+    if not confirmar:
+        raise click.ClickException(
+            f"La medición escribe en la base configurada ({os.getenv('DB_NAME') or 'por defecto'}): bloquea "
+            "inscripciones y grupos, hace que todos los workers recarguen catálogos y deja las CURP de prueba "
+            "en los filtros de existencia. Córrela contra una copia con --confirmar."
+        )
+    resultado = medir_contadores(alumnos, grupos, repeticiones)
+    if resultado is None:
+        raise click.ClickException("No se pudo completar la medición")
+    click.echo(f"⏱️  {resultado['alumnos']} inscripciones en {resultado['grupos']} grupos (mediana de {repeticiones})")
+    for caso in ('por_sentencia', 'por_fila', 'sin_triggers'):
+        aceptar, regresar = resultado[caso]
+        click.echo(f"   {caso.replace('_', ' ').capitalize()}: aceptar {aceptar} ms, regresar a pendiente {regresar} ms")
+    click.echo(f"   Mejora: {resultado['por_fila'][0] / resultado['por_sentencia'][0]:.1f}x al aceptar, "
+               f"{resultado['por_fila'][1] / resultado['por_sentencia'][1]:.1f}x al regresar")
+
+
+def init_app(app):
+    app.cli.add_command(reconciliar_contadores_comando)
+    app.cli.add_command(colocar_aceptados_comando)
+    app.cli.add_command(asignar_preferencias_comando)
+    app.cli.add_command(medir_contadores_comando)
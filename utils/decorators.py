@@ -4,6 +4,7 @@ Evita duplicación de código en las rutas
 """
 from flask import session, redirect, url_for, flash
 from functools import wraps
+from utils.principal import principal_actual, rol_actual
 
 def login_requerido(f):
     """Decorador para proteger rutas que requieren autenticación"""
@@ -12,6 +13,11 @@ def login_requerido(f):
         if 'usuario_id' not in session:
             flash("Debes iniciar sesión para acceder a esta página", "error")
             return redirect(url_for('iniciar_sesion.iniciar_sesion'))
+        principal = principal_actual()
+        if principal is not None and not principal['activo']:
+            session.clear()
+            flash("Esta cuenta ha sido desactivada. Contacta al administrador", "error")
+            return redirect(url_for('iniciar_sesion.iniciar_sesion'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -19,7 +25,7 @@ def tutor_requerido(f):
     """Decorador para rutas que solo pueden acceder tutores"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('rol') != 'tutor':
+        if rol_actual() != 'tutor':
             flash("No tienes permisos para acceder a esta página", "error")
             return redirect(url_for('inicio.inicio'))
         return f(*args, **kwargs)
@@ -29,7 +35,7 @@ def admin_requerido(f):
     """Decorador para rutas que solo pueden acceder administradores/directores"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        rol = session.get('rol')
+        rol = rol_actual()
         if rol not in ['sep_admin', 'director']:
             flash("No tienes permisos para acceder a esta página", "error")
             return redirect(url_for('inicio.inicio'))
@@ -40,7 +46,7 @@ def sep_admin_requerido(f):
     """Decorador para rutas que solo pueden acceder administradores SEP"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('rol') != 'sep_admin':
+        if rol_actual() != 'sep_admin':
             flash("No tienes permisos para acceder a esta página", "error")
             return redirect(url_for('inicio.inicio'))
         return f(*args, **kwargs)
@@ -50,7 +56,7 @@ def director_requerido(f):
     """Decorador para rutas que solo pueden acceder directores"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('rol') != 'director':
+        if rol_actual() != 'director':
             flash("No tienes permisos para acceder a esta página", "error")
             return redirect(url_for('inicio.inicio'))
         return f(*args, **kwargs)
@@ -64,7 +70,7 @@ def roles_requeridos(*roles_permitidos):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            rol = session.get('rol')
+            rol = rol_actual()
             if rol not in roles_permitidos:
                 flash("No tienes permisos para acceder a esta página", "error")
                 return redirect(url_for('inicio.inicio'))
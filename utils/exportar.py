@@ -0,0 +1,316 @@
+"""
+Exportaciones CSV/XLSX en streaming.
+
+Las filas llegan de un generador de models/ (cursor del lado del servidor,
+ver database.recorrer_consulta) y el archivo se escribe por bloques mientras
+se envía: la memoria del worker no depende del número de filas.
+
+    filas = recorrer_inscripciones(escuela_id, filtros)
+    return respuesta_exportacion(filas, COLUMNAS_INSCRIPCIONES, 'inscripciones', formato)
+
+Las columnas son pares (campo, encabezado).
+"""
+from flask import Response, stream_with_context
+from psycopg2 import DatabaseError
+from models.database import Registro
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain
+from operator import itemgetter
+from xml.sax.saxutils import escape
+import csv
+import io
+import re
+import zipfile
+
+FORMATOS = ('csv', 'xlsx')
+FILAS_POR_BLOQUE = 500          # filas escritas antes de enviar un bloque
+XLSX_FILAS_POR_HOJA = 1048575   # límite de Excel (1,048,576) menos el encabezado
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Caracteres de control que XML 1.0 no admite, y los que además hay que escapar
+_RE_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RE_XML_ESPECIALES = re.compile('[&<>\x00-\x08\x0b\x0c\x0e-\x1f]')
+_XLSX_NUMEROS = frozenset((int, float, Decimal))
+
+
+def formato_solicitado(args):
+    """'csv' o 'xlsx' según ?formato= (csv por defecto)"""
+    formato = args.get('formato', 'csv').lower()
+    return formato if formato in FORMATOS else 'csv'
+
+
+# Tipos que csv.writer ya escribe bien (None -> vacío); el texto pasa por _texto_csv
+_CSV_DIRECTOS = frozenset((int, float, Decimal, type(None)))
+# Texto que una hoja de cálculo interpretaría como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _extractor(campos, fila):
+    """
+    Función fila -> tupla con los valores de `campos`. Con filas Registro se
+    toman por posición de la tupla subyacente, sin un __getitem__ por celda.
+    """
+    if isinstance(fila, Registro) and len(campos) > 1:
+        posiciones = itemgetter(*[fila._indices[campo] for campo in campos])
+        return lambda f: posiciones(Registro.values(f))
+    return lambda f: tuple(f[campo] for campo in campos)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if valor.__class__ is str:
+        return valor
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    return str(valor)
+
+
+# ===== CSV =====
+
+def _texto_csv(valor):
+    texto = _texto(valor)
+    return "'" + texto if texto.startswith(_INICIO_FORMULA) else texto
+
+
+def _generar_csv(filas, columnas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel abra el UTF-8 con acentos
+    buffer.write('\ufeff')
+    escritor.writerow([encabezado for _, encabezado in columnas])
+    campos = [campo for campo, _ in columnas]
+
+    valores = None
+    pendientes = 0
+    for fila in filas:
+        if valores is None:
+            valores = _extractor(campos, fila)
+        escritor.writerow([v if v.__class__ in _CSV_DIRECTOS else _texto_csv(v) for v in valores(fila)])
+        pendientes += 1
+        if pendientes >= FILAS_POR_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    yield buffer.getvalue().encode('utf-8')
+
+
+# ===== XLSX =====
+
+class _Tubo:
+    """Destino de zipfile sin seek: acumula lo escrito hasta que se envía"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _columna_excel(indice):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia, valor, estilo=''):
+    clase = valor.__class__
+    if clase in _XLSX_NUMEROS:
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    texto = valor if clase is str else _texto(valor)
+    if _RE_XML_ESPECIALES.search(texto):
+        texto = escape(_RE_NO_XML.sub('', texto))
+    return f'<c r="{referencia}" t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(numero, valores, letras, estilo=''):
+    # Las celdas vacías se omiten; cada celda lleva su referencia (A2, B2...)
+    celdas = ''.join(_celda(f'{letra}{numero}', valor, estilo)
+                     for letra, valor in zip(letras, valores) if valor is not None)
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+_XLSX_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{hojas}</Types>'
+)
+_XLSX_TIPO_HOJA = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{hojas}</sheets></workbook>'
+)
+_XLSX_LIBRO_HOJA = '<sheet name="{nombre}" sheetId="{n}" r:id="rId{n}"/>'
+_XLSX_LIBRO_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{hojas}<Relationship Id="rId{estilos}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_LIBRO_REL_HOJA = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+# Estilo 1: encabezado en negritas
+_XLSX_ESTILOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_XLSX_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_XLSX_HOJA_FIN = '</sheetData></worksheet>'
+
+
+def _generar_xlsx(filas, columnas, titulo):
+    """
+    Libro XLSX escrito al vuelo: cada hoja se comprime mientras se envía y
+    el libro (que solo lista las hojas) se agrega al final del ZIP. Más de
+    un millón de filas continúa en otra hoja.
+    """
+    tubo = _Tubo()
+    libro = zipfile.ZipFile(tubo, 'w', zipfile.ZIP_DEFLATED)
+    encabezados = [encabezado for _, encabezado in columnas]
+    campos = [campo for campo, _ in columnas]
+    letras = [_columna_excel(i) for i in range(len(columnas))]
+    filas = iter(filas)
+    valores = None
+
+    hojas = 0
+    hay_mas = True
+    while hay_mas:
+        hojas += 1
+        with libro.open(f'xl/worksheets/sheet{hojas}.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((_XLSX_HOJA_INICIO + _fila_xml(1, encabezados, letras, estilo=' s="1"')).encode('utf-8'))
+            hay_mas = False
+            bloque = []
+            for numero, fila in enumerate(filas, start=2):
+                if valores is None:
+                    valores = _extractor(campos, fila)
+                bloque.append(_fila_xml(numero, valores(fila), letras))
+                if len(bloque) >= FILAS_POR_BLOQUE:
+                    hoja.write(''.join(bloque).encode('utf-8'))
+                    bloque = []
+                    yield tubo.vaciar()
+                if numero > XLSX_FILAS_POR_HOJA:
+                    siguiente = next(filas, None)
+                    if siguiente is not None:
+                        filas = chain([siguiente], filas)
+                        hay_mas = True
+                    break
+            hoja.write((''.join(bloque) + _XLSX_HOJA_FIN).encode('utf-8'))
+        yield tubo.vaciar()
+
+    nombres = [titulo[:28] if hojas == 1 else f'{titulo[:24]} ({n})' for n in range(1, hojas + 1)]
+    libro.writestr('[Content_Types].xml', _XLSX_TIPOS.format(
+        hojas=''.join(_XLSX_TIPO_HOJA.format(n=n) for n in range(1, hojas + 1))))
+    libro.writestr('_rels/.rels', _XLSX_RELS)
+    libro.writestr('xl/workbook.xml', _XLSX_LIBRO.format(
+        hojas=''.join(_XLSX_LIBRO_HOJA.format(nombre=escape(nombre, {'"': '&quot;'}), n=n)
+                      for n, nombre in enumerate(nombres, start=1))))
+    libro.writestr('xl/_rels/workbook.xml.rels', _XLSX_LIBRO_RELS.format(
+        hojas=''.join(_XLSX_LIBRO_REL_HOJA.format(n=n) for n in range(1, hojas + 1)),
+        estilos=hojas + 1))
+    libro.writestr('xl/styles.xml', _XLSX_ESTILOS)
+    libro.close()
+    yield tubo.vaciar()
+
+
+# ===== RESPUESTA =====
+
+def _enviar(bloques, origen, nombre):
+    """
+    Si la BD falla a medio envío ya no hay forma de responder un error: se
+    registra y se corta. Al terminar (o si el cliente se desconecta) se
+    cierra el generador de filas para regresar su conexión al pool.
+    """
+    try:
+        yield from bloques
+    except DatabaseError as e:
+        print(f"⚠️ Exportación '{nombre}' interrumpida: {e}")
+    finally:
+        cerrar = getattr(origen, 'close', None)
+        if cerrar:
+            cerrar()
+
+
+def respuesta_exportacion(filas, columnas, nombre, formato='csv'):
+    """
+    Response en streaming con las filas como CSV o XLSX adjunto.
+    La primera fila se pide aquí, antes de responder: si la consulta falla
+    al abrir el cursor se retorna None y la ruta puede avisar al usuario
+    (y con el circuito abierto se responde la página degradada).
+    """
+    origen = filas = iter(filas)
+    try:
+        primera = next(filas, None)
+    except DatabaseError as e:
+        print(f"Error al iniciar la exportación '{nombre}': {e}")
+        return None
+    if primera is not None:
+        filas = chain([primera], filas)
+
+    if formato == 'xlsx':
+        bloques = _generar_xlsx(filas, columnas, nombre)
+    else:
+        bloques = _generar_csv(filas, columnas)
+
+    respuesta = Response(
+        stream_with_context(_enviar(bloques, origen, nombre)),
+        mimetype=MIMETYPES[formato]
+    )
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    # Que los proxies no acumulen la respuesta completa antes de enviarla
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -0,0 +1,71 @@
+"""
+Filtro de Bloom: conjunto probabilístico sin falsos negativos.
+Si un valor no está en el filtro, seguro nunca se agregó; si está, probablemente
+sí se agregó (se equivoca con probabilidad ~tasa_error) y hay que confirmarlo.
+"""
+import hashlib
+import math
+import threading
+
+
+class FiltroBloom:
+    """Filtro de Bloom sobre huellas SHA-256, con doble hashing para las k posiciones"""
+
+    def __init__(self, capacidad, tasa_error=0.01):
+        self.capacidad = max(1, int(capacidad))
+        self.tasa_error = tasa_error
+        self.num_bits = max(64, math.ceil(-self.capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacidad * math.log(2)))
+        self.elementos = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def huella(valor):
+        """SHA-256 del valor en UTF-8 (la misma que calcula PostgreSQL con sha256(convert_to(..., 'UTF8')))"""
+        return hashlib.sha256(valor.encode('utf-8')).digest()
+
+    def _posiciones(self, huella):
+        h1 = int.from_bytes(huella[:8], 'little')
+        h2 = int.from_bytes(huella[8:16], 'little') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def agregar_huella(self, huella):
+        """Agregar por huella; devuelve False si ya estaba (no cuenta dos veces)"""
+        with self._lock:
+            nuevo = False
+            bits = self._bits
+            for p in self._posiciones(huella):
+                mascara = 1 << (p & 7)
+                if not bits[p >> 3] & mascara:
+                    bits[p >> 3] |= mascara
+                    nuevo = True
+            if nuevo:
+                self.elementos += 1
+            return nuevo
+
+    def agregar(self, valor):
+        return self.agregar_huella(self.huella(valor))
+
+    def contiene_huella(self, huella):
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._posiciones(huella))
+
+    def __contains__(self, valor):
+        return self.contiene_huella(self.huella(valor))
+
+    @property
+    def saturado(self):
+        """Con más elementos que su capacidad la tasa de falsos positivos sube"""
+        return self.elementos > self.capacidad
+
+    def resumen(self):
+        k, m, n = self.num_hashes, self.num_bits, self.elementos
+        return {
+            'elementos': n,
+            'capacidad': self.capacidad,
+            'bytes': len(self._bits),
+            'hashes': k,
+            'tasa_falsos_positivos_estimada': round((1 - math.exp(-k * n / m)) ** k, 6),
+        }
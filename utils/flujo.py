@@ -0,0 +1,80 @@
+"""
+Páginas en streaming: la plantilla se envía por partes mientras recorre las
+filas, que llegan de un generador de models/ (cursor del lado del servidor).
+El encabezado de la página sale antes de consultar la lista y la memoria del
+worker no crece con el número de filas.
+
+    alumnos = FilasEnFlujo(recorrer_alumnos_por_grupo(grupo_id, escuela_id))
+    return plantilla_en_flujo('director_grupos_detalles.html', alumnos=alumnos, ...)
+
+En la plantilla las filas se recorren una sola vez: `{% if alumnos %}` mira la
+primera sin consumirla y `alumnos.leidas` cuenta las recorridas (después del
+{% for %}). No usar |length ni recorrerlas dos veces.
+"""
+from flask import Response, stream_template, get_flashed_messages
+from psycopg2 import DatabaseError
+from models.database import BaseDatosNoDisponible
+
+BLOQUE_HTML = 16 * 1024   # bytes acumulados antes de enviar un bloque
+
+
+class FilasEnFlujo:
+    """Filas de un generador para recorrer una sola vez desde la plantilla"""
+
+    def __init__(self, filas):
+        self._filas = self._recorrer(iter(filas))
+        self._mirada = []     # fila leída por __bool__ y aún no entregada
+        self._agotadas = False
+        self.leidas = 0
+
+    def _recorrer(self, filas):
+        """Punto de extensión: transformar las filas mientras pasan"""
+        return filas
+
+    def __bool__(self):
+        if not self._mirada and not self._agotadas:
+            try:
+                self._mirada.append(next(self._filas))
+            except StopIteration:
+                self._agotadas = True
+        return bool(self._mirada)
+
+    def __iter__(self):
+        if self._mirada:
+            self.leidas += 1
+            yield self._mirada.pop()
+        for fila in self._filas:
+            self.leidas += 1
+            yield fila
+        self._agotadas = True
+
+
+def _en_bloques(partes, nombre):
+    """
+    Juntar los fragmentos de Jinja en bloques de ~BLOQUE_HTML. Si la BD falla
+    a media página ya se envió el inicio: se registra y la página queda corta.
+    """
+    bloque = []
+    tamano = 0
+    try:
+        for parte in partes:
+            bloque.append(parte)
+            tamano += len(parte)
+            if tamano >= BLOQUE_HTML:
+                yield ''.join(bloque)
+                bloque = []
+                tamano = 0
+    except (DatabaseError, BaseDatosNoDisponible) as e:
+        print(f"⚠️ Página '{nombre}' interrumpida: {e}")
+    finally:
+        partes.close()
+    if bloque:
+        yield ''.join(bloque)
+
+
+def plantilla_en_flujo(nombre, **contexto):
+    """Response que renderiza `nombre` por partes (Flask stream_template)"""
+    # La cookie de sesión se escribe antes de enviar el cuerpo: los mensajes
+    # flash se sacan de la sesión ahora y la plantilla los lee de la petición
+    get_flashed_messages()
+    return Response(_en_bloques(stream_template(nombre, **contexto), nombre), mimetype='text/html')
@@ -0,0 +1,51 @@
+"""
+Filtros de los listados de inscripciones tomados de la URL (?status=&grado=&municipio=&desde=&hasta=)
+"""
+from datetime import datetime
+
+ESTADOS_INSCRIPCION = ('pendiente', 'en_revision', 'aceptado', 'rechazado')
+
+
+def filtros_inscripciones(args):
+    """
+    Retorna (filtros, filtros_url): los valores ya validados para el modelo y
+    los mismos como texto para volver a armar enlaces (filtros, páginas).
+    Los valores inválidos se ignoran.
+    """
+    filtros = {}
+
+    status = args.get('status', '').strip()
+    if status in ESTADOS_INSCRIPCION:
+        filtros['status'] = status
+
+    grado = args.get('grado', '').strip()
+    if grado.isdigit():
+        filtros['grado'] = int(grado)
+
+    municipio = args.get('municipio', '').strip()
+    if municipio:
+        filtros['municipio'] = municipio[:150]
+
+    for campo in ('desde', 'hasta'):
+        valor = args.get(campo, '').strip()
+        if valor:
+            try:
+                filtros[campo] = datetime.strptime(valor, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+
+    filtros_url = {
+        campo: valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+        for campo, valor in filtros.items()
+    }
+    return filtros, filtros_url
+
+
+def total_de_pagina_unica(pagina):
+    """
+    Si no hay más páginas el total exacto es el tamaño de esta; si no, None.
+    Con una PaginaInscripciones se llama después de recorrerla.
+    """
+    if pagina.anterior or pagina.siguiente:
+        return None
+    return {'total': pagina.leidas, 'exacto': True}
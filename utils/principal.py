@@ -0,0 +1,51 @@
+"""
+Principal de la petición: el usuario en sesión junto con su registro de tutor
+y la escuela que dirige, resueltos en una sola consulta (cacheada unos
+segundos por usuario) antes de atender la petición.
+
+Las rutas y los decoradores lo leen de aquí en lugar de volver a consultar
+tutor o escuela:
+
+    tutor = tutor_actual()
+    escuela = escuela_actual()
+"""
+from flask import g, session, request
+from models.database import BaseDatosNoDisponible
+from models.usuario_model import obtener_principal
+
+
+def cargar_principal():
+    """before_request: resolver el principal de la sesión (si la hay)"""
+    g.principal = None
+    usuario_id = session.get('usuario_id')
+    if usuario_id is None or request.endpoint == 'static':
+        return
+    try:
+        g.principal = obtener_principal(usuario_id)
+    except BaseDatosNoDisponible:
+        # Las rutas que sí necesiten la BD responderán 503 por su cuenta
+        g.principal = None
+
+
+def principal_actual():
+    return g.get('principal')
+
+
+def rol_actual():
+    """Rol según la BD; el de la sesión si no se pudo cargar el principal"""
+    principal = principal_actual()
+    return principal['rol'] if principal else session.get('rol')
+
+
+def tutor_actual():
+    principal = principal_actual()
+    return principal['tutor'] if principal else None
+
+
+def escuela_actual():
+    principal = principal_actual()
+    return principal['escuela'] if principal else None
+
+
+def init_app(app):
+    app.before_request(cargar_principal)
@@ -0,0 +1,46 @@
+"""
+Reparto de alumnos en los grupos de un grado: llena los lugares libres
+equilibrando tamaño, sexo y edad sin tocar a los ya colocados.
+
+Por cada sexo los alumnos se recorren del mayor al menor y cada uno va al
+grupo con menos alumnos de su sexo en proporción a su cupo (después, al menos
+lleno). Así los alumnos de edades seguidas caen en grupos distintos y cada
+grupo recibe de todas las edades; cada sexo queda repartido según el cupo.
+"""
+import heapq
+from collections import defaultdict
+
+
+def repartir(alumnos, grupos):
+    """
+    alumnos: [(inscripcion_id, sexo, fecha_nacimiento)] en orden de prioridad;
+    si no caben todos se quedan sin lugar los últimos.
+    grupos: [{'grupo_id', 'cupo', 'inscritos', 'por_sexo': {sexo: n}}] con la
+    composición actual (se actualiza al repartir).
+    Retorna (asignaciones [(inscripcion_id, grupo_id)], sin_lugar [inscripcion_id]).
+    """
+    libres = sum(max(0, g['cupo'] - g['inscritos']) for g in grupos)
+    colocar, sin_lugar = alumnos[:libres], [a[0] for a in alumnos[libres:]]
+
+    por_sexo = defaultdict(list)
+    for inscripcion_id, sexo, fecha_nacimiento in colocar:
+        por_sexo[sexo or '-'].append((fecha_nacimiento, inscripcion_id))
+
+    asignaciones = []
+    # El sexo con más alumnos primero: el otro ajusta con los lugares que quedan
+    for sexo, lista in sorted(por_sexo.items(), key=lambda par: -len(par[1])):
+        lista.sort()
+        monton = [
+            (g['por_sexo'].get(sexo, 0) / g['cupo'], g['inscritos'] / g['cupo'], g['grupo_id'], i)
+            for i, g in enumerate(grupos) if g['inscritos'] < g['cupo']
+        ]
+        heapq.heapify(monton)
+        for _, inscripcion_id in lista:
+            _, _, grupo_id, i = heapq.heappop(monton)
+            g = grupos[i]
+            g['inscritos'] += 1
+            g['por_sexo'][sexo] = g['por_sexo'].get(sexo, 0) + 1
+            asignaciones.append((inscripcion_id, grupo_id))
+            if g['inscritos'] < g['cupo']:
+                heapq.heappush(monton, (g['por_sexo'][sexo] / g['cupo'], g['inscritos'] / g['cupo'], grupo_id, i))
+    return asignaciones, sin_lugar